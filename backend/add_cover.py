@@ -10,14 +10,10 @@ Usage:
 
 import os
 import sys
-import shutil
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app import models
-
-# Ensure storage directory exists
-COVERS_DIR = os.path.join(os.path.dirname(__file__), "storage", "covers")
-os.makedirs(COVERS_DIR, exist_ok=True)
+from app.services.blob_store import put_file
 
 
 def list_stories(db: Session):
@@ -58,14 +54,8 @@ def add_cover(db: Session, story_id: int, image_path: str):
         print(f"Error: Unsupported image format. Use PNG, JPG, GIF, or WEBP.")
         return False
     
-    # Create safe filename based on story title
-    safe_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in story.title)
-    safe_title = safe_title.replace(" ", "_").lower()
-    cover_filename = f"{story.id}_{safe_title}{ext}"
-    cover_path = os.path.join(COVERS_DIR, cover_filename)
-    
-    # Copy image to covers directory
-    shutil.copy2(image_path, cover_path)
+    # Copy image to the blob store (a no-op if it's already there)
+    cover_path = put_file(image_path, ext)
     
     # Update story in database
     story.cover_image_url = cover_path
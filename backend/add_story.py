@@ -9,67 +9,42 @@ Or run interactively:
 """
 import os
 import sys
-import shutil
 import argparse
-from datetime import datetime
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine, Base, ensure_columns
 from app.models import Story
+from app.services.blob_store import hash_file, blob_path
+from app.services.pdf_linearize import store_linearized
+from app.services.pdf_metadata import read_pdf_metadata, extract_many
+from app.services.story_pages import index_pdf_story
+from app.services.taxonomy import THEME_IDS, AGE_GROUP_IDS
 
 # Create tables if they don't exist
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
-# Available themes
-THEMES = [
-    "adventure",
-    "fantasy", 
-    "animals",
-    "friendship",
-    "nature",
-    "space",
-    "fairy-tales",
-    "bedtime"
-]
-
-# Available age groups
-AGE_GROUPS = ["3-5", "6-8", "9-12"]
-
-
-def copy_pdf_to_storage(source_path: str) -> str:
-    """Copy PDF to storage folder and return new path."""
-    storage_dir = "storage/pdfs"
-    os.makedirs(storage_dir, exist_ok=True)
-    
-    # Get filename and create unique name
-    original_name = os.path.basename(source_path)
-    name_without_ext = os.path.splitext(original_name)[0]
-    
-    # Clean the filename
-    safe_name = "".join(c if c.isalnum() or c in " -_" else "_" for c in name_without_ext)
-    safe_name = safe_name.replace(" ", "_")
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_filename = f"{safe_name}_{timestamp}.pdf"
-    dest_path = os.path.join(storage_dir, new_filename)
-    
-    # Copy the file
-    shutil.copy2(source_path, dest_path)
+# Available themes and age groups
+THEMES = THEME_IDS
+AGE_GROUPS = AGE_GROUP_IDS
+
+
+def copy_pdf_to_storage(source_path: str, digest: str = None):
+    """
+    Store a linearized copy of the PDF in the blob store (a no-op if it's
+    already there); returns (its path, whether it's linearized).
+    """
+    dest_path, linearized = store_linearized(source_path, digest)
     print(f"  Copied PDF to: {dest_path}")
     
-    return dest_path
+    return dest_path, linearized
 
 
-def count_pdf_pages(pdf_path: str) -> int:
-    """Try to count PDF pages (returns default if library not available)."""
+def find_existing_story(stored_path: str):
+    """The story already using this stored PDF, if any."""
+    db = SessionLocal()
     try:
-        # Try using PyPDF2 if available
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except ImportError:
-        # Default page count if PyPDF2 not installed
-        return 10
-    except Exception:
-        return 10
+        return db.query(Story).filter(Story.pdf_url == stored_path).first()
+    finally:
+        db.close()
 
 
 def add_story(
@@ -88,11 +63,24 @@ def add_story(
         print(f"Error: File not found: {pdf_path}")
         return False
     
-    # Copy PDF to storage
-    stored_path = copy_pdf_to_storage(pdf_path)
+    # The same PDF is only added once, whatever it's called: checked before
+    # storing it (the file as served) and after (the file as dropped, whose
+    # stored copy is the linearized one)
+    digest, _ = hash_file(pdf_path)
+    existing = find_existing_story(blob_path(digest, ".pdf"))
+    if not existing:
+        # Copy PDF to storage, rewritten for fast web view
+        stored_path, linearized = copy_pdf_to_storage(pdf_path, digest)
+        existing = find_existing_story(stored_path)
+    if existing:
+        print(f"Already in the library: {existing.title} (ID {existing.id})")
+        return False
     
-    # Count pages
-    page_count = count_pdf_pages(pdf_path)
+    # Count pages and read the text, in a worker process with time and memory limits
+    meta = extract_many([pdf_path], with_pages=True)[pdf_path]
+    page_count = meta["page_count"] or 10
+    if meta["error"]:
+        print(f"  Couldn't read the PDF's details ({meta['error']}); page count set to {page_count}")
     
     # Create database entry
     db = SessionLocal()
@@ -103,6 +91,7 @@ def add_story(
             author=author,
             description=description or f"A wonderful story for children ages {age_group}.",
             pdf_url=stored_path,
+            pdf_linearized=linearized,
             page_count=page_count,
             age_group=age_group,
             theme=theme,
@@ -111,12 +100,14 @@ def add_story(
             cover_image_url=f"/storage/covers/{theme}.jpg"
         )
         db.add(story)
+        index_pdf_story(db, story, meta["pages"])
         db.commit()
         
         print(f"\n  Story added successfully!")
         print(f"  ID: {story.id}")
         print(f"  Title: {story.title}")
         print(f"  Pages: {page_count}")
+        print(f"  Linearized: {linearized}")
         print(f"  Theme: {theme}")
         print(f"  Age Group: {age_group}")
         
@@ -143,8 +134,11 @@ def interactive_mode():
         print(f"Error: File not found: {pdf_path}")
         return
     
-    # Get title (default from filename)
-    default_title = os.path.splitext(os.path.basename(pdf_path))[0]
+    # Get title (default from the PDF's own title, else the filename)
+    meta = read_pdf_metadata(pdf_path)
+    if meta["first_page_text"]:
+        print(f"First page: {' '.join(meta['first_page_text'].split())[:100]}")
+    default_title = meta["title"] or os.path.splitext(os.path.basename(pdf_path))[0]
     title = input(f"Title [{default_title}]: ").strip() or default_title
     
     # Get description
@@ -171,7 +165,8 @@ def interactive_mode():
     is_featured = input("Featured story? (y/n) [n]: ").strip().lower() == 'y'
     
     # Author
-    author = input("Author [StoryLand]: ").strip() or "StoryLand"
+    default_author = meta["author"] or "StoryLand"
+    author = input(f"Author [{default_author}]: ").strip() or default_author
     
     # Confirm
     print("\n" + "-"*40)
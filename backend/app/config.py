@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,19 @@ class Settings(BaseSettings):
     
     # Gemini AI
     gemini_api_key: str = ""
+    gemini_model: str = "gemini-pro"
+    
+    # Story generation provider: "gemini" or "stub" (deterministic, offline).
+    # Empty means gemini when an API key is set, otherwise stub.
+    story_provider: str = ""
+    story_provider_concurrency: int = 4  # calls in flight per process; more fail fast
+    story_provider_timeout_seconds: float = 60.0  # per call, or per chunk when streaming
+    story_provider_retries: int = 2
+    story_provider_backoff_seconds: float = 1.0
+    story_provider_breaker_failures: int = 5  # consecutive failures that open the circuit
+    story_provider_breaker_reset_seconds: float = 30.0
+    stub_provider_latency_seconds: float = 1.0  # before the first page
+    stub_provider_page_seconds: float = 0.2  # between pages
     
     # OpenAI (for DALL-E image generation)
     openai_api_key: str = ""
@@ -30,6 +44,54 @@ class Settings(BaseSettings):
     # Frontend
     frontend_url: str = "http://localhost:3000"
     
+    # Response cache for the public story endpoints
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 1024
+    response_cache_ttl_seconds: float = 30.0
+    response_cache_stale_seconds: float = 300.0  # serve stale while refreshing
+    response_cache_version_check_seconds: float = 1.0
+    
+    # Cache-Control for the public catalog endpoints (browsers and CDNs)
+    catalog_cache_control: str = "public, max-age=30, s-maxage=60, stale-while-revalidate=300"
+    
+    # Buffered read_count increments
+    read_count_flush_seconds: float = 5.0
+    read_count_max_pending: int = 10000
+    
+    # Background story generation jobs
+    generation_workers: int = 2
+    generation_poll_seconds: float = 5.0  # also the heartbeat interval for running jobs
+    generation_stale_seconds: float = 60.0  # running job without a heartbeat this long is requeued
+    generation_max_attempts: int = 3
+    
+    # PDF rendering process pool
+    pdf_render_workers: Optional[int] = None  # None: one per CPU core; 0: render inline
+    pdf_render_max_queue: int = 32  # renders accepted at once (queued + running)
+    pdf_render_submit_timeout_seconds: float = 30.0
+    
+    # Where rendered story PDFs go: "local" (the blob store) or "cloudinary".
+    # Empty means cloudinary when it's configured, otherwise local.
+    pdf_storage: str = ""
+    
+    # PDF metadata extraction at import (services/pdf_metadata.py)
+    pdf_metadata_workers: Optional[int] = None  # None: one per CPU core; 0: read inline
+    pdf_metadata_timeout_seconds: float = 60.0  # per file
+    pdf_metadata_max_memory_mb: int = 512  # per worker process
+    
+    # Content-addressed store for local PDFs and covers (services/blob_store.py)
+    blob_storage_dir: str = "storage/blobs"
+    
+    # Long stories: outline first, then page ranges written in parallel
+    generation_chunked_min_pages: int = 12
+    generation_chunk_pages: int = 4
+    generation_chunk_parallelism: int = 3
+    
+    # Reuse of previously generated stories for identical requests
+    generation_cache_enabled: bool = True
+    generation_cache_ttl_seconds: float = 30 * 24 * 3600.0
+    generation_cache_max_entries: int = 5000
+    generation_cache_max_bytes: int = 2 * 1024 ** 3  # total size of the cached stories' PDFs
+    
     # Environment
     environment: str = "development"  # development or production
     
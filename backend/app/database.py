@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
@@ -13,6 +13,52 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Columns added to tables that existing databases already have
+# (create_all only creates missing tables), as {table: {column: DDL}}
+ADDED_COLUMNS = {
+    "stories": {
+        "rating_count": "INTEGER DEFAULT 0",
+        "rating_sum": "FLOAT DEFAULT 0",
+        "pdf_linearized": "BOOLEAN",
+    },
+    "imported_files": {
+        "error": "TEXT",
+    },
+    "generation_jobs": {
+        "cache_key": "VARCHAR(64)",
+        "timings": "JSON",
+        "worker_id": "VARCHAR(32)",
+    },
+}
+
+
+def missing_columns() -> list:
+    """(table, column) pairs from ADDED_COLUMNS the database doesn't have yet"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table, columns in ADDED_COLUMNS.items():
+        if table not in tables:
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table)}
+        missing.extend((table, name) for name in columns if name not in existing)
+    return missing
+
+
+def ensure_columns():
+    """
+    Bring an existing database up to date after create_all: add the
+    columns in ADDED_COLUMNS and any indexes declared since its tables
+    were created. Run at API and script startup, before the first query.
+    """
+    with engine.begin() as conn:
+        for table, name in missing_columns():
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ADDED_COLUMNS[table][name]}"))
+            print(f"  Added column {table}.{name}")
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
 
 def get_db():
     db = SessionLocal()
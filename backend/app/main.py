@@ -3,18 +3,25 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 from app.routes import stories, users
-from app.database import engine, Base
+from app.database import engine, Base, ensure_columns
 from app.config import get_settings
+from app.services.read_counter import read_counter
+from app.services.response_cache import story_cache
+from app.services.generation_jobs import generation_queue
+from app.services.story_providers import get_provider
+from app.services.pdf_renderer import pdf_renderer
 
 settings = get_settings()
 
-# Create database tables
+# Create database tables, and add columns newer than existing ones
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 # Create storage directories (for local development)
 if settings.environment == "development":
     os.makedirs("storage/pdfs", exist_ok=True)
     os.makedirs("storage/covers", exist_ok=True)
+    os.makedirs(settings.blob_storage_dir, exist_ok=True)
 
 app = FastAPI(
     title="Kids Story Library API",
@@ -54,6 +61,20 @@ app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(stories.router, prefix="/stories", tags=["Stories"])
 
 
+@app.on_event("startup")
+def start_background_writers():
+    pdf_renderer.start()  # first: its workers are forked from this process
+    read_counter.start()
+    generation_queue.start()
+
+
+@app.on_event("shutdown")
+def flush_background_writers():
+    generation_queue.stop()
+    pdf_renderer.shutdown()
+    read_counter.stop()
+
+
 @app.get("/")
 def root():
     return {
@@ -68,6 +89,18 @@ def health_check():
     return {"status": "healthy", "message": "API is running smoothly!"}
 
 
+@app.get("/metrics")
+def metrics():
+    """In-process counters for the read-count buffer, caches and story generation"""
+    return {
+        "read_counter": read_counter.stats(),
+        "response_cache": story_cache.stats(),
+        "generation_queue": generation_queue.stats(),
+        "story_provider": get_provider().stats(),
+        "pdf_renderer": pdf_renderer.stats(),
+    }
+
+
 @app.post("/update-pdfs")
 def update_pdf_urls(pdf_links: dict):
     """
@@ -1,5 +1,8 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Float
-from sqlalchemy.orm import relationship
+import os
+import re
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Float, Index, JSON, case, delete, event, func, inspect, insert, select, update
+from sqlalchemy.orm import relationship, Session
+from collections import Counter
 from datetime import datetime
 from app.database import Base
 
@@ -32,18 +35,37 @@ class Story(Base):
     description = Column(Text)
     cover_image_url = Column(String(500))
     pdf_url = Column(String(500))
+    pdf_linearized = Column(Boolean, nullable=True)  # fast web view; None: not checked yet
     page_count = Column(Integer, default=10)
     age_group = Column(String(50))  # 3-5, 6-8, 9-12
     theme = Column(String(100))  # adventure, fantasy, animals, etc.
     is_premium = Column(Boolean, default=False)
     is_featured = Column(Boolean, default=False)
     read_count = Column(Integer, default=0)
+    rating_count = Column(Integer, default=0)  # maintained by rate_story
+    rating_sum = Column(Float, default=0.0)  # maintained by rate_story
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     favorites = relationship("Favorite", back_populates="story")
     ratings = relationship("Rating", back_populates="story")
+    
+    # Catalog listing: every filter combination sorted by (created_at, id)
+    __table_args__ = (
+        Index("ix_stories_created_at_id", "created_at", "id"),
+        Index("ix_stories_theme_created_at", "theme", "created_at", "id"),
+        Index("ix_stories_age_group_created_at", "age_group", "created_at", "id"),
+        Index("ix_stories_theme_age_group_created_at", "theme", "age_group", "created_at", "id"),
+        Index("ix_stories_featured_created_at", "is_featured", "created_at", "id"),
+    )
+    
+    @property
+    def average_rating(self):
+        """Mean rating from the denormalized aggregates (None if unrated)"""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
 
 
 class Favorite(Base):
@@ -56,6 +78,11 @@ class Favorite(Base):
     
     user = relationship("User", back_populates="favorites")
     story = relationship("Story", back_populates="favorites")
+    
+    __table_args__ = (
+        Index("ix_favorites_user_story", "user_id", "story_id", unique=True),
+        Index("ix_favorites_story_id", "story_id"),
+    )
 
 
 class Rating(Base):
@@ -70,3 +97,397 @@ class Rating(Base):
     
     user = relationship("User", back_populates="ratings")
     story = relationship("Story", back_populates="ratings")
+    
+    __table_args__ = (
+        Index("ix_ratings_user_story", "user_id", "story_id", unique=True),
+        Index("ix_ratings_story_created_at", "story_id", "created_at"),
+    )
+
+
+class StorySearchDocument(Base):
+    """Searchable text for a story (see services/search.py)"""
+    __tablename__ = "story_search_documents"
+    
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    title = Column(String(255))
+    description = Column(Text)
+    body = Column(Text)  # generated content or text extracted from the PDF
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StoryPage(Base):
+    """One page of a story's text, for the reader (see services/story_pages.py)"""
+    __tablename__ = "story_pages"
+    
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    number = Column(Integer, primary_key=True)  # from 1
+    text = Column(Text, nullable=False, default="")
+    illustrations = Column(JSON)  # illustration notes on the page, without brackets
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StoryFacetCount(Base):
+    """Story count per (theme, age_group), kept in step with the stories table"""
+    __tablename__ = "story_facet_counts"
+    
+    theme = Column(String(100), primary_key=True)  # "" for stories without one
+    age_group = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class CatalogVersion(Base):
+    """Single-row counter bumped whenever catalog-visible story data changes"""
+    __tablename__ = "catalog_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Blob(Base):
+    """A content-addressed file under storage/blobs (see services/blob_store.py)"""
+    __tablename__ = "blobs"
+    
+    sha256 = Column(String(64), primary_key=True)  # of the file as it was added
+    path = Column(String(500), nullable=False, unique=True)
+    size_bytes = Column(BigInteger, default=0, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)  # story pdf_url / cover_image_url pointing here
+    created_at = Column(DateTime, default=datetime.utcnow)
+    unreferenced_at = Column(DateTime)  # when ref_count last dropped to 0
+
+
+class ImportedFile(Base):
+    """A PDF seen by the importers, as it was when last scanned (see services/pdf_import.py)"""
+    __tablename__ = "imported_files"
+    
+    path = Column(String(500), primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    status = Column(String(20), nullable=False)  # imported, duplicate, skipped
+    error = Column(Text)  # why the PDF's metadata couldn't be read, if it couldn't
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="SET NULL"))
+    scanned_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GenerationJob(Base):
+    """A queued AI story generation (see services/generation_jobs.py)"""
+    __tablename__ = "generation_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex, handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(20), default="queued", nullable=False)  # queued, running, done, failed
+    title = Column(String(255), nullable=False)
+    age_group = Column(String(50), nullable=False)
+    theme = Column(String(100), nullable=False)
+    page_count = Column(Integer, default=10)
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="SET NULL"), nullable=True)
+    cache_key = Column(String(64), nullable=True)  # None when the request opted out of the cache
+    timings = Column(JSON)  # seconds per LLM call (see ai_story_generator.write_story)
+    error = Column(Text)
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # refreshed while a worker holds the job
+    worker_id = Column(String(32))  # the claim of whoever holds the job, new each time it's claimed
+    finished_at = Column(DateTime)
+    
+    story = relationship("Story")
+    
+    # The worker sweep picks up the oldest queued / stalled running jobs
+    __table_args__ = (
+        Index("ix_generation_jobs_status_created_at", "status", "created_at"),
+    )
+
+
+class GenerationCacheEntry(Base):
+    """A generated story reusable for identical requests (see services/generation_cache.py)"""
+    __tablename__ = "generation_cache"
+    
+    key = Column(String(64), primary_key=True)  # sha256 of the normalized request
+    story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), nullable=False)
+    size_bytes = Column(Integer, default=0, nullable=False)  # size of the story's PDF
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    
+    story = relationship("Story")
+    
+    # Expiry by age, eviction least recently used first
+    __table_args__ = (
+        Index("ix_generation_cache_created_at", "created_at"),
+        Index("ix_generation_cache_last_used_at", "last_used_at"),
+    )
+
+
+# Story columns whose changes don't alter what the catalog shows
+UNTRACKED_STORY_COLUMNS = {"read_count", "updated_at", "pdf_linearized"}
+
+
+def get_catalog_version(session) -> int:
+    """Read the current catalog version (0 if nothing has changed yet)"""
+    version = session.connection().execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).scalar()
+    return version or 0
+
+
+def get_catalog_state(session):
+    """(version, updated_at) of the catalog; (0, None) before any change"""
+    row = session.connection().execute(
+        select(CatalogVersion.version, CatalogVersion.updated_at).where(CatalogVersion.id == 1)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def bump_catalog_version(session):
+    """
+    Bump the catalog version inside the session's current transaction.
+    
+    Story inserts/updates/deletes made through the ORM do this automatically;
+    call it directly after bulk statements such as query(Story).delete().
+    """
+    if session.info.get("catalog_version_bumped"):
+        return
+    conn = session.connection()
+    result = conn.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(CatalogVersion).values(id=1, version=1, updated_at=datetime.utcnow()))
+    session.info["catalog_version_bumped"] = True
+    session.info["catalog_version"] = get_catalog_version(session)
+
+
+def _facet_key(theme, age_group):
+    return (theme or "", age_group or "")
+
+
+def apply_facet_deltas(session, deltas):
+    """Add per-(theme, age_group) count deltas in the current transaction"""
+    conn = session.connection()
+    for (theme, age_group), delta in deltas.items():
+        if not delta:
+            continue
+        result = conn.execute(
+            update(StoryFacetCount)
+            .where(StoryFacetCount.theme == theme, StoryFacetCount.age_group == age_group)
+            .values(count=StoryFacetCount.count + delta)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(StoryFacetCount).values(theme=theme, age_group=age_group, count=delta))
+
+
+def rebuild_story_facets(session):
+    """
+    Recompute facet counts from the stories table.
+    
+    ORM changes keep them current automatically; call this after bulk
+    statements such as query(Story).delete(), or to backfill.
+    """
+    conn = session.connection()
+    conn.execute(delete(StoryFacetCount))
+    rows = conn.execute(
+        select(Story.theme, Story.age_group, func.count(Story.id))
+        .group_by(Story.theme, Story.age_group)
+    ).all()
+    deltas = Counter()
+    for theme, age_group, count in rows:
+        deltas[_facet_key(theme, age_group)] += count
+    apply_facet_deltas(session, deltas)
+
+
+def _committed_facet_key(session, story):
+    """(theme, age_group) as last flushed, ignoring pending changes"""
+    return _facet_key(*_committed_values(session, story, ("theme", "age_group")))
+
+
+def _committed_values(session, story, keys):
+    """Story column values as last flushed, ignoring pending changes"""
+    state = inspect(story)
+    values = []
+    for key in keys:
+        history = state.attrs[key].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.unchanged:
+            values.append(history.unchanged[0])
+        elif history.added:
+            # Set on an expired instance: the old value was never loaded
+            row = session.connection().execute(
+                select(*(getattr(Story, k) for k in keys)).where(Story.id == story.id)
+            ).first()
+            return tuple(row) if row else (None,) * len(keys)
+        else:
+            values.append(getattr(story, key))
+    return tuple(values)
+
+
+# Story columns copied to its search document (see services/search.py)
+SEARCH_DOCUMENT_COLUMNS = ("title", "description")
+
+
+def _story_content_changed(story) -> bool:
+    state = inspect(story)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in UNTRACKED_STORY_COLUMNS and attr.key in state.mapper.columns
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def track_story_changes(session, flush_context, instances):
+    """
+    Record changed story ids, keep facet counts current, refresh the
+    search documents of retitled stories and bump the catalog version
+    for this flush.
+    """
+    changed = set()
+    facets = Counter()
+    touched = False
+    documents = []
+    
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Story):
+                facets[_facet_key(obj.theme, obj.age_group)] += 1
+                touched = True
+        for obj in session.deleted:
+            if isinstance(obj, Story):
+                facets[_committed_facet_key(session, obj)] -= 1
+                changed.add(obj.id)
+                touched = True
+        for obj in session.dirty:
+            if isinstance(obj, Story) and _story_content_changed(obj):
+                old_key = _committed_facet_key(session, obj)
+                new_key = _facet_key(obj.theme, obj.age_group)
+                if old_key != new_key:
+                    facets[old_key] -= 1
+                    facets[new_key] += 1
+                changed.add(obj.id)
+                touched = True
+                state = inspect(obj)
+                if any(state.attrs[key].history.has_changes() for key in SEARCH_DOCUMENT_COLUMNS):
+                    # Stories never indexed have no document; index_story adds one
+                    document = session.get(StorySearchDocument, obj.id)
+                    if document is not None:
+                        document.title, document.description = obj.title, obj.description
+                        document.updated_at = datetime.utcnow()
+                        documents.append(document)
+    
+    if documents:
+        session.info.setdefault("reindexed_documents", []).extend(documents)
+    if touched:
+        session.info.setdefault("changed_story_ids", set()).update(changed)
+        apply_facet_deltas(session, facets)
+        bump_catalog_version(session)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _reindex_story_documents(session, flush_context):
+    """Push the search documents refreshed by track_story_changes to the search index"""
+    documents = session.info.pop("reindexed_documents", None)
+    if not documents:
+        return
+    from app.services.search import get_backend  # it imports this module
+    backend = get_backend(session)
+    for document in documents:
+        backend.upsert(session, document)
+
+
+@event.listens_for(Session, "after_commit")
+def _reset_catalog_bump(session):
+    session.info.pop("catalog_version_bumped", None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_story_changes(session):
+    session.info.pop("catalog_version_bumped", None)
+    session.info.pop("catalog_version", None)
+    session.info.pop("changed_story_ids", None)
+    session.info.pop("reindexed_documents", None)
+
+
+# ==================== Blob reference counts ====================
+
+# Story columns that may point at a content-addressed blob
+STORY_FILE_COLUMNS = ("pdf_url", "cover_image_url")
+
+# <blob root>/ab/ab12...ef.pdf
+BLOB_PATH = re.compile(r"(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})\.\w+$")
+
+
+@event.listens_for(Session, "before_flush")
+def track_blob_references(session, flush_context, instances):
+    """Keep Blob.ref_count in step with the stories pointing at each blob"""
+    deltas = Counter()
+    
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Story):
+                for key in STORY_FILE_COLUMNS:
+                    deltas[getattr(obj, key)] += 1
+        for obj in session.deleted:
+            if isinstance(obj, Story):
+                for value in _committed_values(session, obj, STORY_FILE_COLUMNS):
+                    deltas[value] -= 1
+        for obj in session.dirty:
+            if not isinstance(obj, Story):
+                continue
+            state = inspect(obj)
+            changed = [key for key in STORY_FILE_COLUMNS if state.attrs[key].history.has_changes()]
+            if changed:
+                for key, old in zip(changed, _committed_values(session, obj, changed)):
+                    deltas[old] -= 1
+                    deltas[getattr(obj, key)] += 1
+    
+    apply_blob_deltas(session, deltas)
+
+
+def apply_blob_deltas(session, deltas):
+    """Add per-path reference deltas to blobs in the current transaction"""
+    conn = session.connection() if any(deltas.values()) else None
+    now = datetime.utcnow()
+    for path, delta in deltas.items():
+        match = BLOB_PATH.search(path.replace("\\", "/")) if path else None
+        if not delta or not match:
+            continue
+        result = conn.execute(
+            update(Blob)
+            .where(Blob.path == path)
+            .values(
+                ref_count=Blob.ref_count + delta,
+                unreferenced_at=case((Blob.ref_count + delta <= 0, now), else_=None)
+            )
+        )
+        if result.rowcount == 0 and delta > 0:
+            # First reference to a blob: register it
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            conn.execute(insert(Blob).values(
+                sha256=match.group(1), path=path, size_bytes=size, ref_count=delta, created_at=now
+            ))
+
+
+def rebuild_blob_refs(session):
+    """
+    Recompute blob reference counts from the stories table.
+    
+    ORM changes keep them current automatically; call this after bulk
+    statements such as query(Story).delete(), or to backfill.
+    """
+    conn = session.connection()
+    conn.execute(update(Blob).values(ref_count=0))
+    deltas = Counter()
+    for key in STORY_FILE_COLUMNS:
+        column = getattr(Story, key)
+        for path, count in conn.execute(select(column, func.count(Story.id)).group_by(column)):
+            deltas[path] += count
+    apply_blob_deltas(session, deltas)
+    conn.execute(
+        update(Blob)
+        .where(Blob.ref_count <= 0, Blob.unreferenced_at.is_(None))
+        .values(unreferenced_at=datetime.utcnow())
+    )
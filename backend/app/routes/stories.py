@@ -1,33 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, or_, func
 from typing import Optional, List
+from datetime import datetime
+import base64
+import json
 import os
 from app.database import get_db
 from app import models, schemas
 from app.auth import get_current_active_user, get_premium_user
-from app.services.ai_story_generator import generate_story_with_gemini
-from app.services.pdf_generator import create_story_pdf
+from app.config import get_settings
+from app.services.response_cache import story_cache, story_tag, LIST_TAG
+from app.services.read_counter import read_counter
+from app.services.search import search_stories as run_search
+from app.services.http_cache import make_etag, is_not_modified, not_modified, set_cache_headers
+from app.services import taxonomy
+from app.services.generation_jobs import create_job, generation_queue, stream_job
+from app.services.story_providers import get_provider
+from app.services.pdf_storage import rerender_story_pdf
+from app.services.ranged_files import RangedFileResponse
+from app.services.story_pages import get_pages, count_pages
 
+settings = get_settings()
 router = APIRouter()
 
+# Pages of text returned by GET /stories/{id}/pages
+DEFAULT_PAGES_PER_REQUEST = 5
+MAX_PAGES_PER_REQUEST = 20
+
+# Latest ratings returned by GET /stories/{id}/ratings
+RATINGS_SHOWN = 20
+
 
 def is_cloud_url(url: str) -> bool:
     """Check if URL is a cloud URL"""
     return url and url.startswith("http")
 
 
-@router.get("/", response_model=schemas.StoryListResponse)
-def get_stories(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(12, ge=1, le=50),
-    age_group: Optional[str] = None,
-    theme: Optional[str] = None,
-    featured_only: bool = False,
-    db: Session = Depends(get_db)
-):
-    """Get paginated list of stories"""
+def encode_cursor(story: models.Story) -> str:
+    """Encode a story's (created_at, id) sort key as an opaque cursor"""
+    raw = json.dumps([story.created_at.isoformat(), story.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor back into its (created_at, id) sort key"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, story_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(story_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def catalog_validators(db: Session, *key):
+    """
+    ETag/Last-Modified for a catalog-wide response, from the catalog
+    version the response cache polls (so no query of its own)
+    """
+    version, updated_at = story_cache.catalog_state(db)
+    return make_etag("catalog", version, *key), updated_at
+
+
+def story_last_modified(story) -> datetime:
+    # Rows from before updated_at existed have none
+    return story.updated_at or story.created_at
+
+
+def ratings_validators(db: Session, story_id: int):
+    """
+    ETag/Last-Modified for a story's ratings: rating changes update the
+    story's aggregates (and with them updated_at), and the ratings shown
+    carry their raters' names, so a rater's latest change counts too
+    """
+    story_updated_at = db.query(func.coalesce(models.Story.updated_at, models.Story.created_at))\
+        .filter(models.Story.id == story_id)\
+        .scalar()
+    shown = db.query(models.User.updated_at)\
+        .join(models.Rating, models.Rating.user_id == models.User.id)\
+        .filter(models.Rating.story_id == story_id)\
+        .order_by(models.Rating.created_at.desc())\
+        .limit(RATINGS_SHOWN)\
+        .subquery()
+    users_updated_at = db.query(func.max(shown.c.updated_at)).scalar()
+    last_modified = max(filter(None, (story_updated_at, users_updated_at)), default=None)
+    return make_etag("ratings", story_id, story_updated_at, users_updated_at), last_modified
+
+
+def load_story_list(
+    db: Session,
+    page: int,
+    page_size: int,
+    age_group: Optional[str],
+    theme: Optional[str],
+    featured_only: bool,
+    cursor: Optional[str]
+) -> schemas.StoryListResponse:
+    """Query one page of the catalog (uncached)"""
     query = db.query(models.Story)
     
     if age_group:
@@ -37,85 +107,229 @@ def get_stories(
     if featured_only:
         query = query.filter(models.Story.is_featured == True)
     
+    query = query.order_by(models.Story.created_at.desc(), models.Story.id.desc())
+    
+    if cursor is not None:
+        if cursor:
+            created_at, story_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                models.Story.created_at < created_at,
+                and_(models.Story.created_at == created_at, models.Story.id < story_id)
+            ))
+        
+        # Fetch one extra row to learn whether another page exists
+        stories = query.limit(page_size + 1).all()
+        next_cursor = encode_cursor(stories[page_size - 1]) if len(stories) > page_size else None
+        
+        return schemas.StoryListResponse.model_validate({
+            "stories": stories[:page_size],
+            "total": None,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor
+        })
+    
     total = query.count()
-    stories = query.order_by(models.Story.created_at.desc())\
-        .offset((page - 1) * page_size)\
+    stories = query.offset((page - 1) * page_size)\
         .limit(page_size)\
         .all()
     
-    # Calculate average ratings
-    story_responses = []
-    for story in stories:
-        avg_rating = db.query(func.avg(models.Rating.rating))\
-            .filter(models.Rating.story_id == story.id).scalar()
-        story_dict = schemas.StoryResponse.model_validate(story)
-        story_dict.average_rating = round(avg_rating, 1) if avg_rating else None
-        story_responses.append(story_dict)
-    
-    return {
-        "stories": story_responses,
+    return schemas.StoryListResponse.model_validate({
+        "stories": stories,
         "total": total,
         "page": page,
         "page_size": page_size
-    }
+    })
+
+
+def load_story(db: Session, story_id: int):
+    """Query a single story (uncached): (StoryResponse, last modified)"""
+    story = db.query(models.Story).filter(models.Story.id == story_id).first()
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return schemas.StoryResponse.model_validate(story), story_last_modified(story)
+
+
+@router.get("/", response_model=schemas.StoryListResponse)
+def get_stories(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(12, ge=1, le=50),
+    age_group: Optional[str] = None,
+    theme: Optional[str] = None,
+    featured_only: bool = False,
+    cursor: Optional[str] = None,
+    request: Request = None,
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get paginated list of stories.
+    
+    Pass `cursor` (empty for the first page, then each response's
+    `next_cursor`) for keyset pagination: no total count, and stable
+    results while new stories are added. Without it, the classic
+    page/page_size offset pagination is used.
+    """
+    # Normalize so equivalent requests share a cache entry
+    age_group = age_group or None
+    theme = theme or None
+    if cursor is not None:
+        page = 1
+    
+    key = ("stories", page, page_size, age_group, theme, featured_only, cursor)
+    
+    etag, last_modified = catalog_validators(db, *key)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, settings.catalog_cache_control)
+    set_cache_headers(response, etag, last_modified, settings.catalog_cache_control)
+    
+    return story_cache.get_or_load(
+        key,
+        lambda session: load_story_list(session, page, page_size, age_group, theme, featured_only, cursor),
+        db,
+        tags=(LIST_TAG,)
+    )
 
 
 @router.get("/featured", response_model=List[schemas.StoryResponse])
-def get_featured_stories(db: Session = Depends(get_db)):
+def get_featured_stories(
+    request: Request = None,
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
     """Get featured stories for homepage"""
-    stories = db.query(models.Story)\
-        .filter(models.Story.is_featured == True)\
-        .order_by(models.Story.created_at.desc())\
-        .limit(6)\
-        .all()
-    return stories
+    etag, last_modified = catalog_validators(db, "featured")
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, settings.catalog_cache_control)
+    set_cache_headers(response, etag, last_modified, settings.catalog_cache_control)
+    
+    def load(session: Session):
+        stories = session.query(models.Story)\
+            .filter(models.Story.is_featured == True)\
+            .order_by(models.Story.created_at.desc())\
+            .limit(6)\
+            .all()
+        return [schemas.StoryResponse.model_validate(story) for story in stories]
+    
+    return story_cache.get_or_load(("featured",), load, db, tags=(LIST_TAG,))
 
 
 @router.get("/themes")
 def get_available_themes():
     """Get list of available story themes"""
+    return {"themes": taxonomy.THEMES, "age_groups": taxonomy.AGE_GROUPS}
+
+
+def load_story_facets(db: Session) -> schemas.StoryFacetsResponse:
+    """Read the maintained facet counts (uncached)"""
+    rows = db.query(models.StoryFacetCount)\
+        .filter(models.StoryFacetCount.count > 0)\
+        .all()
+    
+    # Databases created before facet counts existed: backfill once
+    if not rows and db.query(models.Story.id).first():
+        models.rebuild_story_facets(db)
+        db.commit()
+        rows = db.query(models.StoryFacetCount)\
+            .filter(models.StoryFacetCount.count > 0)\
+            .all()
+    
+    themes, age_groups, cells = {}, {}, []
+    for row in rows:
+        if row.theme:
+            themes[row.theme] = themes.get(row.theme, 0) + row.count
+        if row.age_group:
+            age_groups[row.age_group] = age_groups.get(row.age_group, 0) + row.count
+        if row.theme and row.age_group:
+            cells.append({"theme": row.theme, "age_group": row.age_group, "count": row.count})
+    
+    return schemas.StoryFacetsResponse.model_validate({
+        "themes": [{"id": k, "count": v} for k, v in sorted(themes.items())],
+        "age_groups": [{"id": k, "count": v} for k, v in sorted(age_groups.items())],
+        "cells": sorted(cells, key=lambda cell: (cell["theme"], cell["age_group"])),
+        "total": sum(row.count for row in rows)
+    })
+
+
+@router.get("/facets", response_model=schemas.StoryFacetsResponse)
+def get_story_facets(db: Session = Depends(get_db)):
+    """Story counts per theme, per age group and per (theme, age group)"""
+    return story_cache.get_or_load(("facets",), load_story_facets, db, tags=(LIST_TAG,))
+
+
+@router.get("/search", response_model=schemas.StoryListResponse)
+def search_stories(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(12, ge=1, le=50),
+    age_group: Optional[str] = None,
+    theme: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Search stories by title, description and story text.
+    
+    Every word must match (as a prefix, so "drag" finds "dragon");
+    results are ranked with title matches above description and text.
+    """
+    story_ids = run_search(
+        db, q,
+        theme=theme,
+        age_group=age_group,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+    found = {}
+    if story_ids:
+        found = {
+            story.id: story
+            for story in db.query(models.Story).filter(models.Story.id.in_(story_ids))
+        }
+    
     return {
-        "themes": [
-            {"id": "adventure", "name": "Adventure", "emoji": "🏔️"},
-            {"id": "fantasy", "name": "Fantasy & Magic", "emoji": "🧙‍♂️"},
-            {"id": "animals", "name": "Animals", "emoji": "🐾"},
-            {"id": "friendship", "name": "Friendship", "emoji": "🤝"},
-            {"id": "nature", "name": "Nature & Environment", "emoji": "🌳"},
-            {"id": "space", "name": "Space & Science", "emoji": "🚀"},
-            {"id": "fairy-tales", "name": "Fairy Tales", "emoji": "👸"},
-            {"id": "bedtime", "name": "Bedtime Stories", "emoji": "🌙"},
-        ],
-        "age_groups": [
-            {"id": "3-5", "name": "Ages 3-5"},
-            {"id": "6-8", "name": "Ages 6-8"},
-            {"id": "9-12", "name": "Ages 9-12"},
-        ]
+        "stories": [found[story_id] for story_id in story_ids if story_id in found],
+        "total": None,
+        "page": page,
+        "page_size": page_size
     }
 
 
 @router.get("/{story_id}", response_model=schemas.StoryResponse)
-def get_story(story_id: int, db: Session = Depends(get_db)):
-    """Get a single story by ID"""
-    story = db.query(models.Story).filter(models.Story.id == story_id).first()
-    if not story:
-        raise HTTPException(status_code=404, detail="Story not found")
+def get_story(
+    story_id: int,
+    request: Request = None,
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a single story by ID.
+    
+    Validators follow the story's updated_at, which read_count changes
+    don't touch, so a revalidated copy may show a slightly older read_count.
+    """
+    # Validators come from the cached entry, so a cache hit needs no query
+    story, last_modified = story_cache.get_or_load(
+        ("story", story_id),
+        lambda session: load_story(session, story_id),
+        db,
+        tags=(story_tag(story_id),)
+    )
     
-    # Increment read count
-    story.read_count += 1
-    db.commit()
+    # Increment read count (buffered, written in batches)
+    read_counter.increment(story_id)
     
-    # Get average rating
-    avg_rating = db.query(func.avg(models.Rating.rating))\
-        .filter(models.Rating.story_id == story.id).scalar()
+    etag = make_etag("story", story_id, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, settings.catalog_cache_control)
+    set_cache_headers(response, etag, last_modified, settings.catalog_cache_control)
     
-    response = schemas.StoryResponse.model_validate(story)
-    response.average_rating = round(avg_rating, 1) if avg_rating else None
-    return response
+    return story
 
 
 @router.get("/{story_id}/view")
 def view_story_pdf(
     story_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """View story PDF in browser (no login required for free stories)"""
@@ -126,28 +340,22 @@ def view_story_pdf(
     if not story.pdf_url:
         raise HTTPException(status_code=404, detail="PDF not available")
     
-    # Increment read count
-    story.read_count += 1
-    db.commit()
+    # Increment read count (buffered, written in batches); a PDF viewer's
+    # follow-up range requests for the same read aren't counted again
+    if not is_continuation(request):
+        read_counter.increment(story_id)
     
     # If cloud URL, redirect to it
     if is_cloud_url(story.pdf_url):
         return RedirectResponse(url=story.pdf_url)
     
-    # Local file
-    if not os.path.exists(story.pdf_url):
-        raise HTTPException(status_code=404, detail="PDF file not found")
-    
-    return FileResponse(
-        story.pdf_url,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "inline"}
-    )
+    return local_pdf_response(db, story, request, {"Content-Disposition": "inline"})
 
 
 @router.get("/{story_id}/download")
 def download_story_pdf(
     story_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Download story PDF"""
@@ -165,21 +373,76 @@ def download_story_pdf(
     if is_cloud_url(story.pdf_url):
         return RedirectResponse(url=story.pdf_url)
     
-    # Local file
-    if not os.path.exists(story.pdf_url):
-        raise HTTPException(status_code=404, detail="PDF file not found")
-    
-    return FileResponse(
-        story.pdf_url,
-        media_type="application/pdf",
-        filename=f"{safe_title}.pdf",
-        headers={"Content-Disposition": f"attachment; filename={safe_title}.pdf"}
+    return local_pdf_response(
+        db, story, request, {"Content-Disposition": f"attachment; filename={safe_title}.pdf"}
     )
 
 
+@router.get("/{story_id}/pages", response_model=schemas.StoryPagesResponse)
+def get_story_pages(
+    story_id: int,
+    from_: int = Query(1, alias="from", ge=1),
+    to: Optional[int] = Query(None, ge=1),
+    request: Request = None,
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Text and illustration notes for pages from..to of a story (at most
+    MAX_PAGES_PER_REQUEST at a time), so the reader can start without the PDF.
+    """
+    if to is None:
+        to = from_ + DEFAULT_PAGES_PER_REQUEST - 1
+    if to < from_:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    to = min(to, from_ + MAX_PAGES_PER_REQUEST - 1)
+    
+    total_pages = count_pages(db, story_id)
+    if not total_pages:
+        if not db.query(models.Story.id).filter(models.Story.id == story_id).first():
+            raise HTTPException(status_code=404, detail="Story not found")
+        raise HTTPException(status_code=404, detail="Page text not available")
+    
+    pages = get_pages(db, story_id, from_, to)
+    last_modified = max((page.updated_at for page in pages), default=None)
+    etag = make_etag("pages", story_id, from_, to, total_pages, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, settings.catalog_cache_control)
+    set_cache_headers(response, etag, last_modified, settings.catalog_cache_control)
+    
+    return {
+        "story_id": story_id,
+        "total_pages": total_pages,
+        "pages": pages,
+        "next_from": to + 1 if to < total_pages else None
+    }
+
+
+def is_continuation(request: Request) -> bool:
+    """A Range request for anything but the start of the file"""
+    value = request.headers.get("range", "").replace(" ", "").lower()
+    return bool(value) and not value.startswith("bytes=0-")
+
+
+def local_pdf_response(db: Session, story: models.Story, request: Request, headers: dict):
+    """
+    Serve a story's local PDF file, with byte-range support. If the file is
+    gone but the story was generated here, it's re-rendered in memory and
+    sent without touching disk.
+    """
+    if os.path.exists(story.pdf_url):
+        return RangedFileResponse(story.pdf_url, request, media_type="application/pdf", headers=headers)
+    
+    data = rerender_story_pdf(db, story)
+    if data is None:
+        raise HTTPException(status_code=404, detail="PDF file not found")
+    return Response(content=data, media_type="application/pdf", headers=headers)
+
+
 @router.get("/{story_id}/cover")
 def get_story_cover(
     story_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get story cover image"""
@@ -209,50 +472,101 @@ def get_story_cover(
     }
     media_type = media_types.get(ext, 'image/png')
     
-    return FileResponse(
+    return RangedFileResponse(
         story.cover_image_url,
+        request,
         media_type=media_type
     )
 
 
-@router.post("/generate", response_model=schemas.StoryResponse)
-async def generate_story(
+@router.post("/generate", response_model=schemas.GenerationJobResponse, status_code=202)
+def generate_story(
     request: schemas.StoryGenerateRequest,
-    background_tasks: BackgroundTasks,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_premium_user)
 ):
-    """Generate a new story using AI (premium feature)"""
-    # Generate story content
-    story_content = await generate_story_with_gemini(
-        title=request.title,
-        age_group=request.age_group,
-        theme=request.theme,
-        page_count=request.page_count
-    )
-    
-    # Create PDF
-    pdf_path = create_story_pdf(
-        title=request.title,
-        content=story_content,
-        page_count=request.page_count
-    )
-    
-    # Save to database
-    new_story = models.Story(
-        title=request.title,
-        description=story_content[:200] + "...",
-        pdf_url=pdf_path,
-        page_count=request.page_count,
-        age_group=request.age_group,
-        theme=request.theme,
-        is_premium=True
-    )
-    db.add(new_story)
+    """
+    Queue a new AI story (premium feature).
+    
+    Returns the job straight away; poll GET /stories/jobs/{job_id} for the story.
+    An identical earlier request is answered from the generation cache with
+    a finished job (200) unless use_cache is false.
+    """
+    job = create_job(db, current_user, request)
+    if job.status == "done":
+        response.status_code = 200
+    else:
+        check_provider_available()
     db.commit()
-    db.refresh(new_story)
-    
-    return new_story
+    db.refresh(job)
+    if job.status != "done":
+        generation_queue.notify()
+    return job
+
+
+@router.post("/generate/stream")
+def generate_story_stream(
+    request: schemas.StoryGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_premium_user)
+):
+    """
+    Generate a new AI story, streamed as Server-Sent Events (premium feature).
+    
+    Events: "job" (the job id, for polling if the connection drops), one
+    "page" per story page as soon as it's written, then "done" with the
+    saved story, or "error". Cached stories replay their pages at once.
+    """
+    job = create_job(db, current_user, request, streaming=True)
+    if job.status != "done":
+        check_provider_available()
+    db.commit()
+    job_id = job.id
+    
+    def events():
+        yield sse_event("job", {"job_id": job_id})
+        # Runs in Starlette's threadpool: a sync generator keeps the LLM
+        # stream and PDF rendering off the event loop
+        for name, data in stream_job(job_id):
+            if name == "done":
+                data = {
+                    "job_id": job_id,
+                    "story": schemas.StoryResponse.model_validate(data).model_dump(mode="json")
+                }
+            yield sse_event(name, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def check_provider_available():
+    """Refuse new generations while the provider's circuit breaker is open"""
+    if get_provider().breaker.state == "open":
+        raise HTTPException(
+            status_code=503,
+            detail="Story generation is temporarily unavailable. Please try again shortly."
+        )
+
+
+def sse_event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.GenerationJobResponse)
+def get_generation_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Status of a story generation job (and the story, once done)"""
+    job = db.get(models.GenerationJob, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @router.post("/{story_id}/favorite")
@@ -303,7 +617,11 @@ def rate_story(
         .filter(models.Rating.story_id == story_id)\
         .first()
     
+    # Keep the denormalized aggregates in step within the same transaction.
+    # SQL expressions (not Python arithmetic) so concurrent raters don't
+    # overwrite each other's increments.
     if existing:
+        story.rating_sum = models.Story.rating_sum + (rating.rating - existing.rating)
         existing.rating = rating.rating
         existing.comment = rating.comment
         db.commit()
@@ -317,18 +635,30 @@ def rate_story(
         comment=rating.comment
     )
     db.add(new_rating)
+    story.rating_count = models.Story.rating_count + 1
+    story.rating_sum = models.Story.rating_sum + rating.rating
     db.commit()
     db.refresh(new_rating)
     return new_rating
 
 
 @router.get("/{story_id}/ratings", response_model=List[schemas.RatingResponse])
-def get_story_ratings(story_id: int, db: Session = Depends(get_db)):
+def get_story_ratings(
+    story_id: int,
+    request: Request = None,
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
     """Get all ratings for a story"""
+    etag, last_modified = ratings_validators(db, story_id)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, settings.catalog_cache_control)
+    set_cache_headers(response, etag, last_modified, settings.catalog_cache_control)
+    
     ratings = db.query(models.Rating)\
         .filter(models.Rating.story_id == story_id)\
         .order_by(models.Rating.created_at.desc())\
-        .limit(20)\
+        .limit(RATINGS_SHOWN)\
         .all()
     
     response = []
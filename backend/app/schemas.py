@@ -55,6 +55,7 @@ class StoryGenerateRequest(BaseModel):
     age_group: str  # 3-5, 6-8, 9-12
     theme: str  # adventure, fantasy, animals, friendship, etc.
     page_count: int = 10
+    use_cache: bool = True  # False always generates a new story
 
 
 class StoryResponse(StoryBase):
@@ -73,11 +74,64 @@ class StoryResponse(StoryBase):
         from_attributes = True
 
 
+class GenerationJobResponse(BaseModel):
+    id: str
+    status: str  # queued, running, done, failed
+    title: str
+    age_group: str
+    theme: str
+    page_count: int
+    error: Optional[str] = None
+    timings: Optional[dict] = None  # seconds spent per LLM call
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    story: Optional[StoryResponse] = None  # set once the job is done
+    
+    class Config:
+        from_attributes = True
+
+
+class StoryPageResponse(BaseModel):
+    number: int
+    text: str
+    illustrations: List[str] = []  # illustration notes, without brackets
+    
+    class Config:
+        from_attributes = True
+
+
+class StoryPagesResponse(BaseModel):
+    story_id: int
+    total_pages: int
+    pages: List[StoryPageResponse]
+    next_from: Optional[int] = None  # first page of the next chunk, if any
+
+
 class StoryListResponse(BaseModel):
     stories: List[StoryResponse]
-    total: int
+    total: Optional[int] = None  # not computed in cursor mode
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # set in cursor mode when more stories exist
+
+
+class FacetCount(BaseModel):
+    id: str
+    count: int
+
+
+class FacetCell(BaseModel):
+    theme: str
+    age_group: str
+    count: int
+
+
+class StoryFacetsResponse(BaseModel):
+    themes: List[FacetCount]
+    age_groups: List[FacetCount]
+    cells: List[FacetCell]
+    total: int
 
 
 # ==================== Rating Schemas ====================
@@ -1,17 +1,61 @@
-import google.generativeai as genai
+"""
+Story text generation: builds the prompt and hands it to the configured
+provider (see story_providers.py).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
 from app.config import get_settings
+from app.services.pdf_generator import parse_story_pages
+from app.services.story_providers import get_provider, ProviderError
 
 settings = get_settings()
 
+# Bump whenever the prompts change, so cached stories written from the
+# old prompts aren't reused (see generation_cache.py)
+PROMPT_VERSION = 2
+
+AGE_DESCRIPTIONS = {
+    "3-5": "very young children (ages 3-5). Use simple words, short sentences, and lots of repetition. Focus on basic emotions and simple concepts.",
+    "6-8": "early readers (ages 6-8). Use engaging vocabulary, simple plot structures, and relatable characters. Include some dialogue.",
+    "9-12": "middle-grade readers (ages 9-12). Use richer vocabulary, more complex plots, and character development. Include meaningful themes."
+}
+
+# Calls made for a page range before giving up on it coming back short
+CHUNK_ATTEMPTS = 2
+
+
+def write_story(
+    title: str,
+    age_group: str,
+    theme: str,
+    page_count: int = 10
+):
+    """
+    Generate a story the fastest way for its length.
+    
+    Stories of generation_chunked_min_pages pages or more are written as an
+    outline plus page ranges in parallel (generate_story_chunked); shorter
+    ones in a single call.
+    
+    Returns:
+        (story text, timings) where timings records how long each call took
+    """
+    if page_count >= settings.generation_chunked_min_pages:
+        return generate_story_chunked(title, age_group, theme, page_count)
+    
+    started = time.perf_counter()
+    text = generate_story_text(title, age_group, theme, page_count)
+    return text, {"mode": "single", "total_seconds": round(time.perf_counter() - started, 3)}
+
 
-async def generate_story_with_gemini(
+def generate_story_text(
     title: str,
     age_group: str,
     theme: str,
     page_count: int = 10
 ) -> str:
     """
-    Generate a children's story using Google Gemini AI.
+    Generate a children's story with the configured provider.
     
     Args:
         title: The story title
@@ -21,19 +65,104 @@ async def generate_story_with_gemini(
     
     Returns:
         Generated story text
+    
+    Raises:
+        ProviderError: the provider failed, timed out or is unavailable
     """
-    # Configure Gemini
-    genai.configure(api_key=settings.gemini_api_key)
-    model = genai.GenerativeModel('gemini-pro')
+    prompt = build_story_prompt(title, age_group, theme, page_count)
+    return get_provider().generate(prompt, page_count)
+
+
+def stream_story_text(
+    title: str,
+    age_group: str,
+    theme: str,
+    page_count: int = 10
+):
+    """
+    Generate a story like generate_story_text, yielding the text in chunks
+    as the provider produces it.
+    """
+    prompt = build_story_prompt(title, age_group, theme, page_count)
+    yield from get_provider().stream(prompt, page_count)
+
+
+def generate_story_chunked(
+    title: str,
+    age_group: str,
+    theme: str,
+    page_count: int,
+    chunk_pages: int = None,
+    parallelism: int = None
+):
+    """
+    Generate a long story as a short outline followed by page ranges
+    written concurrently from it, stitched back into "--- Page X ---" form.
     
-    # Build the prompt
-    age_descriptions = {
-        "3-5": "very young children (ages 3-5). Use simple words, short sentences, and lots of repetition. Focus on basic emotions and simple concepts.",
-        "6-8": "early readers (ages 6-8). Use engaging vocabulary, simple plot structures, and relatable characters. Include some dialogue.",
-        "9-12": "middle-grade readers (ages 9-12). Use richer vocabulary, more complex plots, and character development. Include meaningful themes."
-    }
+    Returns:
+        (story text, timings) with the outline's and each range's duration
+    """
+    chunk_pages = chunk_pages or settings.generation_chunk_pages
+    parallelism = parallelism or settings.generation_chunk_parallelism
+    provider = get_provider()
+    started = time.perf_counter()
+    
+    outline = provider.generate(
+        build_outline_prompt(title, age_group, theme, page_count), page_count, wait=provider.timeout
+    )
+    outline_seconds = time.perf_counter() - started
     
-    age_desc = age_descriptions.get(age_group, age_descriptions["6-8"])
+    ranges = [
+        (first, min(first + chunk_pages - 1, page_count))
+        for first in range(1, page_count + 1, chunk_pages)
+    ]
+    
+    def write_range(page_range):
+        """(pages first..last, seconds taken, calls made)"""
+        first, last = page_range
+        expected = last - first + 1
+        chunk_started = time.perf_counter()
+        prompt = build_chunk_prompt(title, age_group, theme, page_count, outline, first, last)
+        for attempt in range(1, CHUNK_ATTEMPTS + 1):
+            # Queue for a provider slot rather than failing: the fan-out is ours
+            text = provider.generate(prompt, expected, wait=provider.timeout)
+            chunk = parse_story_pages(text)  # without any "--- The End ---"
+            # Short ranges would shift every later page's number
+            if len(chunk) >= expected:
+                break
+        else:
+            raise ProviderError(
+                f"{provider.name} wrote {len(chunk)} of pages {first}-{last} in {CHUNK_ATTEMPTS} attempts"
+            )
+        if len(chunk) > expected:
+            # The model split a page; keep the numbering we asked for
+            chunk = chunk[:expected - 1] + ["\n\n".join(chunk[expected - 1:])]
+        return chunk, time.perf_counter() - chunk_started, attempt
+    
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="story-chunk") as pool:
+        results = list(pool.map(write_range, ranges))
+    
+    pages = []
+    for chunk, _, _ in results:
+        pages.extend(chunk)
+    
+    story = "".join(f"--- Page {number} ---\n{page}\n\n" for number, page in enumerate(pages, 1))
+    timings = {
+        "mode": "chunked",
+        "outline_seconds": round(outline_seconds, 3),
+        "chunks": [
+            {"pages": f"{first}-{last}", "seconds": round(seconds, 3), "attempts": attempts}
+            for (first, last), (_, seconds, attempts) in zip(ranges, results)
+        ],
+        "parallelism": parallelism,
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    return story, timings
+
+
+def build_story_prompt(title: str, age_group: str, theme: str, page_count: int) -> str:
+    """The story-writing prompt sent to the model"""
+    age_desc = AGE_DESCRIPTIONS.get(age_group, AGE_DESCRIPTIONS["6-8"])
     
     prompt = f"""Write a captivating children's story with the following specifications:
 
@@ -59,65 +188,57 @@ FORMAT:
 - Include suggestions for illustrations in [brackets] at key moments
 
 Please write the complete story now:"""
+    return prompt
 
-    try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        # Fallback story for demo/testing
-        return generate_fallback_story(title, theme, page_count)
-
-
-def generate_fallback_story(title: str, theme: str, page_count: int) -> str:
-    """Generate a simple fallback story if AI is unavailable"""
-    fallback = f"""--- Page 1 ---
-{title}
 
-Once upon a time, in a magical land far away, there lived a curious little creature who loved {theme}.
+def build_outline_prompt(title: str, age_group: str, theme: str, page_count: int) -> str:
+    """Prompt for the one-line-per-page plan that chunked generation works from"""
+    age_desc = AGE_DESCRIPTIONS.get(age_group, AGE_DESCRIPTIONS["6-8"])
+    return f"""Plan a children's story with the following specifications:
 
-[Illustration: A whimsical landscape with colorful hills and a friendly creature]
-
-Every day, they would wake up with excitement, ready for new adventures.
-
---- Page 2 ---
-One morning, something special happened...
-
-The little creature discovered a hidden path that led to an extraordinary place.
-
-[Illustration: A mysterious, sparkling path through an enchanted forest]
-
-"What could be at the end of this path?" they wondered with wide, curious eyes.
-
---- Page 3 ---
-With courage in their heart, our hero set off on the adventure.
-
-Along the way, they met friendly companions who joined the journey.
-
-[Illustration: The creature making new friends]
+TITLE: "{title}"
+TARGET AUDIENCE: {age_desc}
+THEME: {theme}
+LENGTH: {page_count} pages
 
-Together, they were ready to face any challenge!
+Give the main characters (one line each, with a short description), then
+exactly {page_count} numbered lines, one per page, saying what happens on
+that page. The story needs a clear beginning, middle and end, and should
+finish with a satisfying conclusion and a gentle moral lesson.
 
-"""
-    
-    # Add more pages
-    for i in range(4, page_count + 1):
-        fallback += f"""--- Page {i} ---
-The adventure continued with more excitement and wonder.
+Write only the character list and the numbered plan."""
 
-Our friends learned valuable lessons about {theme} and friendship.
 
-[Illustration: Exciting scene from the adventure]
+def build_chunk_prompt(
+    title: str,
+    age_group: str,
+    theme: str,
+    page_count: int,
+    outline: str,
+    first: int,
+    last: int
+) -> str:
+    """Prompt for writing pages first..last of a planned story"""
+    age_desc = AGE_DESCRIPTIONS.get(age_group, AGE_DESCRIPTIONS["6-8"])
+    ending = (
+        'This is the end of the story: finish with a satisfying conclusion and a gentle moral lesson, then "--- The End ---".'
+        if last == page_count else
+        "Other writers are writing the other pages, so stop after page {last} without ending the story.".format(last=last)
+    )
+    return f"""You are writing pages {first} to {last} of a {page_count}-page children's story.
 
-"""
-    
-    fallback += """
---- The End ---
+TITLE: "{title}"
+TARGET AUDIENCE: {age_desc}
+THEME: {theme}
 
-And so, our hero returned home, forever changed by the amazing adventure.
+STORY PLAN:
+{outline.strip()}
 
-[Illustration: Happy ending scene with all characters together]
+Write pages {first} to {last} only, following the plan and keeping the characters consistent.
+{ending}
 
-The moral of the story: Every day holds the possibility for magic and wonder, if only we're brave enough to seek it.
-"""
-    
-    return fallback
+FORMAT:
+- Mark each page with "--- Page X ---", numbering from {first}
+- Each page should have approximately 150-250 words
+- Add dialogue and sensory details to bring the story to life
+- Include suggestions for illustrations in [brackets] at key moments"""
@@ -0,0 +1,151 @@
+"""
+Content-addressed storage for local files (story PDFs and covers).
+
+Every file is kept once, named after the SHA-256 of its bytes:
+    
+    storage/blobs/ab/ab12...ef.pdf
+
+so adding a file that's already stored is a lookup rather than a copy,
+and two stories using the same PDF or cover share one file. The blobs
+table counts the stories pointing at each blob (kept current by the
+before_flush listener in models.py); unreferenced blobs are removed by
+collect_garbage (manage_stories.py gc).
+
+Files are hashed while streaming, never read into memory whole, and
+written under a temporary name first so a blob path only ever holds
+complete content.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app.config import get_settings
+from app import models
+
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_root() -> str:
+    return settings.blob_storage_dir
+
+
+def hash_file(path: str):
+    """(sha256 hex digest, size in bytes) of a file, read in chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_path(digest: str, ext: str) -> str:
+    """Where the blob with this digest lives (forward slashes, as stored in the DB)"""
+    return "/".join((blob_root().replace("\\", "/").rstrip("/"), digest[:2], digest + ext.lower()))
+
+
+def put_file(source: str, ext: str = None, digest: str = None) -> str:
+    """
+    Store a file; returns its blob path. A no-op when the same content is
+    already stored. The source is copied, not moved or linked, so later
+    changes to it can't reach the stored blob.
+    """
+    if ext is None:
+        ext = os.path.splitext(source)[1]
+    if digest is None:
+        digest, _ = hash_file(source)
+    path = blob_path(digest, ext)
+    if os.path.exists(path):
+        return path
+    
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, open(source, "rb") as src:
+            shutil.copyfileobj(src, f, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def put_bytes(data: bytes, ext: str) -> str:
+    """Store in-memory content; returns its blob path"""
+    path = blob_path(hashlib.sha256(data).hexdigest(), ext)
+    if os.path.exists(path):
+        return path
+    
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def find_blob(db, digest: str):
+    """The stored blob with this digest that some story uses, or None"""
+    return db.query(models.Blob)\
+        .filter(models.Blob.sha256 == digest, models.Blob.ref_count > 0)\
+        .first()
+
+
+def collect_garbage(db, grace_seconds: float = 3600, dry_run: bool = False):
+    """
+    Delete blobs no story has used for grace_seconds, and files under the
+    blob root the blobs table doesn't know about that are at least as old
+    (an import that crashed before committing). The grace period keeps
+    files a running import has stored but not yet committed.
+    
+    Returns:
+        (files removed, bytes freed)
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    removed = freed = 0
+    
+    unreferenced = db.query(models.Blob)\
+        .filter(models.Blob.ref_count <= 0, models.Blob.unreferenced_at <= cutoff)\
+        .all()
+    for blob in unreferenced:
+        if os.path.exists(blob.path):
+            freed += os.path.getsize(blob.path)
+            if not dry_run:
+                os.remove(blob.path)
+        removed += 1
+        if not dry_run:
+            db.delete(blob)
+    
+    known = {path for (path,) in db.query(models.Blob.path)}
+    root = blob_root()
+    if os.path.isdir(root):
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = "/".join((directory.replace("\\", "/"), filename))
+                if path in known:
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime > time.time() - grace_seconds:
+                    continue
+                removed += 1
+                freed += stat.st_size
+                if not dry_run:
+                    os.remove(path)
+    
+    if not dry_run:
+        db.commit()
+    return removed, freed
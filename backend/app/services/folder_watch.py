@@ -0,0 +1,248 @@
+"""
+Watching a folder tree for new files.
+
+open_watcher returns a watcher whose wait() reports the files written
+to, or moved into, the tree:
+
+- InotifyWatcher (Linux): the kernel tells us as it happens; nothing is
+  scanned except a directory's contents when the directory itself is new
+- PollingWatcher: everywhere else, or when inotify can't be used (some
+  network and container file systems, or too many watches); the tree is
+  listed and stat'ed every poll_seconds
+
+Either way a reported file may still be being written (a polled one
+always; with inotify, a file written in several goes). Debouncer holds
+paths back until their size and mtime have stayed the same for
+settle_seconds and, given a complete() check, until it passes - a copy
+that stalls for longer than settle_seconds isn't taken for the whole
+file.
+
+Hidden directories (".name") and the excluded ones are left out, so
+tools can keep work files inside the tree without them being reported.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+READ_SIZE = 64 * 1024
+
+
+def walk_files(root: str, suffix: str, exclude=()):
+    """(path, stat) of every file under root ending in suffix"""
+    excluded = {os.path.normpath(path) for path in exclude}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith(".") and os.path.normpath(entry.path) not in excluded:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(suffix):
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue  # Gone while we looked
+
+
+class PollingWatcher:
+    """Reports files whose size or mtime changed between two listings of the tree"""
+    
+    mode = "polling"
+    
+    def __init__(self, root: str, suffix: str, exclude=(), poll_seconds: float = 5.0):
+        self.root = root
+        self.suffix = suffix
+        self.exclude = exclude
+        self.poll_seconds = poll_seconds
+        self.overflowed = False
+        self._next_poll = time.monotonic() + poll_seconds
+        self._seen = self._snapshot()
+    
+    def _snapshot(self) -> dict:
+        return {
+            path: (stat.st_size, stat.st_mtime_ns)
+            for path, stat in walk_files(self.root, self.suffix, self.exclude)
+        }
+    
+    def wait(self, timeout: float) -> list:
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        self._next_poll = time.monotonic() + self.poll_seconds
+        current = self._snapshot()
+        changed = [path for path, signature in current.items() if self._seen.get(path) != signature]
+        self._seen = current
+        return changed
+    
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Reports files as inotify sees them closed after writing, or moved in"""
+    
+    mode = "inotify"
+    
+    def __init__(self, root: str, suffix: str, exclude=()):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.suffix = suffix
+        self.excluded = {os.path.normpath(path) for path in exclude}
+        self.overflowed = False  # events were lost: the caller should rescan
+        self.watches = {}  # watch descriptor -> directory
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+    
+    def _watch_tree(self, root: str) -> list:
+        """Watch root and every directory below it; returns the files already there"""
+        files = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.watches[wd] = directory
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._included(entry.name, entry.path):
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(self.suffix):
+                    files.append(entry.path)
+        return files
+    
+    def _included(self, name: str, path: str) -> bool:
+        return not name.startswith(".") and os.path.normpath(path) not in self.excluded
+    
+    def wait(self, timeout: float) -> list:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0"))
+            offset += EVENT.size + length
+            
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)  # Its directory was deleted or moved away
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                # A new directory may already hold files by the time it's watched
+                if self._included(name, path):
+                    try:
+                        paths.extend(self._watch_tree(path))
+                    except OSError:
+                        self.overflowed = True  # Out of watches: fall back to a rescan
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and name.lower().endswith(self.suffix):
+                paths.append(path)  # Not on IN_CREATE: the writer may not be done
+        return paths
+    
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(root: str, suffix: str, exclude=(), poll: bool = False, poll_seconds: float = 5.0):
+    """An InotifyWatcher where possible (unless poll), a PollingWatcher otherwise"""
+    if not poll:
+        try:
+            return InotifyWatcher(root, suffix, exclude)
+        except (OSError, AttributeError):
+            pass  # Not Linux, no inotify in libc, or out of watches
+    return PollingWatcher(root, suffix, exclude, poll_seconds)
+
+
+class Debouncer:
+    """
+    Holds reported paths back until they stop changing (and look
+    complete, if complete is given: a function of the path). A file that
+    never looks complete is let through after incomplete_seconds without
+    a change, for the importer to deal with.
+    """
+    
+    def __init__(self, settle_seconds: float = 2.0, complete=None, incomplete_seconds: float = 60.0):
+        self.settle_seconds = settle_seconds
+        self.complete = complete
+        self.incomplete_seconds = incomplete_seconds
+        self.pending = {}  # path -> (time of last change, (size, mtime))
+    
+    def touch(self, path: str):
+        self.pending[path] = (time.monotonic(), _signature(path))
+    
+    def ready(self) -> list:
+        """Paths unchanged for settle_seconds; they leave the pending set"""
+        now = time.monotonic()
+        ready = []
+        for path, (changed_at, signature) in list(self.pending.items()):
+            if now - changed_at < self.settle_seconds:
+                continue
+            current = _signature(path)
+            if current is None:
+                del self.pending[path]  # Deleted (or moved away) before it settled
+            elif current != signature:
+                self.pending[path] = (now, current)  # Still being written
+            elif self.complete and now - changed_at < self.incomplete_seconds and not self.complete(path):
+                continue  # Stalled part way through; check again next time
+            else:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
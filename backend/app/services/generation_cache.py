@@ -0,0 +1,118 @@
+"""
+Content-addressed cache of generated stories.
+
+Identical generation requests (same normalized title, age group, theme
+and page count, for the same provider and prompt version) get the story
+that was already generated for them instead of another LLM call and PDF.
+
+Entries live in the generation_cache table, keyed by a SHA-256 of the
+normalized request. They expire after generation_cache_ttl_seconds, and
+the least recently used ones are evicted once the cache holds more than
+generation_cache_max_entries stories or generation_cache_max_bytes of
+PDFs. Evicting an entry only stops reuse; the story stays in the library.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.config import get_settings
+from app.models import GenerationCacheEntry, Story
+from app.services.ai_story_generator import PROMPT_VERSION
+
+settings = get_settings()
+
+
+def normalize_title(title: str) -> str:
+    return " ".join((title or "").casefold().split())
+
+
+def cache_key(title: str, age_group: str, theme: str, page_count: int, provider: str) -> str:
+    """SHA-256 of everything that determines the generated story"""
+    request = {
+        "title": normalize_title(title),
+        "age_group": age_group.strip(),
+        "theme": theme.strip().lower(),
+        "page_count": page_count,
+        "provider": provider,
+        "prompt_version": PROMPT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def lookup(db, key: str):
+    """The cached story for key, or None (expired or dangling entries count as misses)"""
+    entry = db.get(GenerationCacheEntry, key)
+    if entry is None:
+        return None
+    
+    story = db.get(Story, entry.story_id)
+    expired = entry.created_at < datetime.utcnow() - timedelta(seconds=settings.generation_cache_ttl_seconds)
+    if expired or story is None or not _pdf_exists(story):
+        db.delete(entry)
+        return None
+    
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    return story
+
+
+def store(db, key: str, story: Story, size_bytes: int = None):
+    """
+    Remember story as the result for key (in the caller's transaction), then
+    evict. size_bytes is the PDF's size, if known (it's looked up otherwise).
+    """
+    entry = db.get(GenerationCacheEntry, key)
+    if entry is None:
+        entry = GenerationCacheEntry(key=key, hits=0)
+        db.add(entry)
+    entry.story_id = story.id
+    entry.size_bytes = _pdf_size(story) if size_bytes is None else size_bytes
+    entry.created_at = entry.last_used_at = datetime.utcnow()
+    db.flush()
+    evict(db)
+
+
+def evict(db) -> int:
+    """Drop expired entries, then least recently used ones until within limits"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.generation_cache_ttl_seconds)
+    removed = db.query(GenerationCacheEntry)\
+        .filter(GenerationCacheEntry.created_at < cutoff)\
+        .delete(synchronize_session=False)
+    
+    count, total_bytes = db.query(
+        func.count(GenerationCacheEntry.key),
+        func.coalesce(func.sum(GenerationCacheEntry.size_bytes), 0)
+    ).one()
+    if count <= settings.generation_cache_max_entries and total_bytes <= settings.generation_cache_max_bytes:
+        return removed
+    
+    victims = []
+    oldest_first = db.query(GenerationCacheEntry.key, GenerationCacheEntry.size_bytes)\
+        .order_by(GenerationCacheEntry.last_used_at)
+    for key, size in oldest_first.yield_per(500):
+        if count <= settings.generation_cache_max_entries and total_bytes <= settings.generation_cache_max_bytes:
+            break
+        victims.append(key)
+        count -= 1
+        total_bytes -= size or 0
+    
+    if victims:
+        removed += db.query(GenerationCacheEntry)\
+            .filter(GenerationCacheEntry.key.in_(victims))\
+            .delete(synchronize_session=False)
+    return removed
+
+
+def _pdf_exists(story: Story) -> bool:
+    if not story.pdf_url:
+        return False
+    if story.pdf_url.startswith("http"):
+        return True
+    return os.path.exists(story.pdf_url)
+
+
+def _pdf_size(story: Story) -> int:
+    if story.pdf_url and not story.pdf_url.startswith("http") and os.path.exists(story.pdf_url):
+        return os.path.getsize(story.pdf_url)
+    return 0
@@ -0,0 +1,455 @@
+"""
+Background queue for AI story generation.
+
+POST /stories/generate only records a GenerationJob row and returns its id;
+the slow parts (the LLM call and PDF rendering) run on a small thread pool,
+off the event loop. The jobs table is the queue itself, so work survives a
+restart and every API process can take jobs from it:
+
+- a dispatcher thread claims queued jobs (oldest first) with a conditional
+  UPDATE, so two processes never run the same job
+- while a job runs, its heartbeat_at is refreshed every poll interval
+- a running job whose heartbeat has stopped (its process died) is put
+  back in the queue, up to generation_max_attempts times
+- every claim gets a new worker_id, and a job is only finished (or failed)
+  by the claim that still holds it: a worker whose job was put back in
+  the queue discards its story instead of saving a second one
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import GenerationJob, Story, StorySearchDocument
+from app.services import generation_cache
+from app.services.ai_story_generator import write_story, stream_story_text
+from app.services.pdf_generator import parse_story_pages, PageSplitter
+from app.services.pdf_storage import store_story_pdf
+from app.services.search import index_story
+from app.services.story_pages import store_generated_pages, get_pages, count_pages, page_content
+from app.services.story_providers import get_provider
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobLost(Exception):
+    """The job was taken from this worker (its heartbeat lapsed) before it finished"""
+
+
+def new_claim() -> str:
+    return uuid.uuid4().hex
+
+
+def create_job(db, user, request, streaming: bool = False) -> GenerationJob:
+    """
+    Record a job for a StoryGenerateRequest (caller commits).
+    
+    If the generation cache already has the story, the job is created
+    done. Otherwise streamed jobs start out claimed, since the request
+    runs them itself, and the rest are queued.
+    """
+    job = GenerationJob(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        status=QUEUED,
+        title=request.title,
+        age_group=request.age_group,
+        theme=request.theme,
+        page_count=request.page_count
+    )
+    if request.use_cache and settings.generation_cache_enabled:
+        job.cache_key = generation_cache.cache_key(
+            request.title, request.age_group, request.theme, request.page_count, get_provider().name
+        )
+    db.add(job)
+    
+    cached = generation_cache.lookup(db, job.cache_key) if job.cache_key else None
+    now = datetime.utcnow()
+    if cached:
+        job.status, job.story_id, job.started_at, job.finished_at = DONE, cached.id, now, now
+    elif streaming:
+        job.status, job.started_at, job.heartbeat_at, job.attempts = RUNNING, now, now, 1
+        job.worker_id = new_claim()
+    return job
+
+
+def run_job(db, job: GenerationJob) -> Story:
+    """Generate, render and save the story for a job, in the caller's transaction"""
+    # An identical job may have finished while this one was queued
+    cached = generation_cache.lookup(db, job.cache_key) if job.cache_key else None
+    if cached:
+        finish_job(db, job, cached)
+        return cached
+    
+    content, job.timings = write_story(
+        title=job.title,
+        age_group=job.age_group,
+        theme=job.theme,
+        page_count=job.page_count
+    )
+    logger.info("Generation job %s: %s", job.id, job.timings)
+    return save_story(db, job, content)
+
+
+def save_story(db, job: GenerationJob, content: str) -> Story:
+    """Render the PDF for a job's finished text, add the story and cache it"""
+    pdf_url, pdf_size = store_story_pdf(job.title, content, job.page_count)
+    
+    story = Story(
+        title=job.title,
+        description=content[:200] + "...",
+        pdf_url=pdf_url,
+        page_count=job.page_count,
+        age_group=job.age_group,
+        theme=job.theme,
+        is_premium=True
+    )
+    db.add(story)
+    index_story(db, story, content)
+    store_generated_pages(db, story, content)
+    db.flush()
+    
+    if job.cache_key:
+        generation_cache.store(db, job.cache_key, story, size_bytes=pdf_size)
+    finish_job(db, job, story)
+    return story
+
+
+def finish_job(db, job: GenerationJob, story: Story):
+    """
+    Mark the job done with its story, if this worker's claim still holds
+    it; raises JobLost otherwise, and the caller rolls back the story.
+    """
+    finished = db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job.id, GenerationJob.status == RUNNING,
+               GenerationJob.worker_id == job.worker_id)
+        .values(status=DONE, story_id=story.id, error=None, finished_at=datetime.utcnow())
+    ).rowcount
+    if not finished:
+        raise JobLost(f"Generation job {job.id} is no longer held by this worker")
+
+
+def stream_job(job_id: str):
+    """
+    Run a streamed job in the calling thread, yielding ("page", {...}) for
+    each page as soon as the model has finished it, then ("done", story) or
+    ("error", {...}). A job served from the cache replays the stored pages.
+    
+    If the consumer goes away mid-story (the client disconnected), the job
+    is handed back to the queue and finishes in the background.
+    """
+    db = SessionLocal()
+    finished = False
+    claim = None
+    try:
+        job = db.get(GenerationJob, job_id)
+        claim = job.worker_id
+        # The dispatcher keeps its heartbeat going while this request runs it
+        generation_queue.hold(job_id, claim)
+        if job.status == DONE:
+            finished = True
+            for number, page in enumerate(replay_pages(db, job.story_id), 1):
+                yield "page", {"page": number, "content": page}
+            yield "done", job.story
+            return
+        
+        splitter = PageSplitter()
+        parts, number = [], 0
+        chunks = stream_story_text(
+            title=job.title,
+            age_group=job.age_group,
+            theme=job.theme,
+            page_count=job.page_count
+        )
+        started, first_chunk_seconds = time.perf_counter(), None
+        for chunk in chunks:
+            if first_chunk_seconds is None:
+                first_chunk_seconds = round(time.perf_counter() - started, 3)
+            parts.append(chunk)
+            for page in splitter.feed(chunk):
+                number += 1
+                yield "page", {"page": number, "content": page}
+        for page in splitter.finish():
+            number += 1
+            yield "page", {"page": number, "content": page}
+        
+        job.timings = {
+            "mode": "stream",
+            "first_chunk_seconds": first_chunk_seconds,
+            "total_seconds": round(time.perf_counter() - started, 3),
+        }
+        story = save_story(db, job, "".join(parts))
+        db.commit()
+        finished = True
+        yield "done", story
+    except JobLost:
+        logger.warning("Streamed generation job %s was requeued while it ran; story discarded", job_id)
+        db.rollback()
+        finished = True
+        yield "error", {"job_id": job_id, "detail": "Story generation was restarted; poll the job for the story"}
+    except Exception as e:
+        logger.exception("Streamed generation job %s failed", job_id)
+        db.rollback()
+        fail_job(db, job_id, e, claim)
+        finished = True
+        yield "error", {"job_id": job_id, "detail": "Story generation failed"}
+    finally:
+        generation_queue.release(job_id)
+        if not finished:
+            requeue_job(db, job_id, claim)
+        db.close()
+
+
+def replay_pages(db, story_id: int) -> list:
+    """A finished story's pages, as stream_job would have sent them"""
+    pages = get_pages(db, story_id, 1, count_pages(db, story_id))
+    if pages:
+        return [page_content(page) for page in pages]
+    # Stories stored before their pages were (see manage_stories.py pages):
+    # the indexed text, which is cut off after MAX_BODY_CHARS
+    document = db.get(StorySearchDocument, story_id)
+    return parse_story_pages(document.body) if document and document.body else []
+
+
+def fail_job(db, job_id: str, error: Exception, claim: str):
+    """Mark a job failed, if the claim still holds it"""
+    db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == RUNNING, GenerationJob.worker_id == claim)
+        .values(status=FAILED, error=f"{error.__class__.__name__}: {error}"[:1000],
+                finished_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def requeue_job(db, job_id: str, claim: str):
+    """Give a running job back to the queue (e.g. its stream was abandoned)"""
+    db.rollback()
+    db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == RUNNING, GenerationJob.worker_id == claim)
+        .values(status=QUEUED)
+    )
+    db.commit()
+    generation_queue.notify()
+
+
+class GenerationQueue:
+    """Runs queued generation jobs on a bounded pool of worker threads"""
+    
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval: float = 5.0,
+        stale_after: float = 60.0,
+        max_attempts: int = 3
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        
+        self._executor = None
+        self._running = {}  # job id -> claim, for jobs held by this process's workers
+        self._streaming = {}  # job id -> claim, for jobs streamed by requests in this process
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.discarded = 0  # finished after being requeued, so not saved
+        self.last_job_seconds = None
+    
+    def notify(self):
+        """A job was queued: dispatch it now rather than at the next poll"""
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        self._wake.set()
+    
+    def hold(self, job_id: str, claim: str):
+        """
+        Heartbeat a job run outside the worker pool (a streamed one) until
+        release(), so it isn't taken for stalled and run a second time.
+        """
+        with self._lock:
+            self._streaming[job_id] = claim
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+    
+    def release(self, job_id: str):
+        with self._lock:
+            self._streaming.pop(job_id, None)
+    
+    def start(self):
+        """Start the dispatcher thread and worker pool"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="story-generation")
+            self._thread = threading.Thread(target=self._dispatch_loop, name="generation-dispatcher", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """
+        Stop taking new jobs. Jobs already running are left to finish; if
+        the process exits first they're requeued once their heartbeat lapses.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 5)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "streaming": len(self._streaming),
+                "completed": self.completed,
+                "failed": self.failed,
+                "requeued": self.requeued,
+                "discarded": self.discarded,
+                "last_job_seconds": self.last_job_seconds,
+            }
+    
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._heartbeat()
+                self._recover_stale()
+                self._dispatch()
+            except Exception:
+                logger.exception("Generation queue sweep failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+    
+    def _heartbeat(self):
+        with self._lock:
+            claims = list(self._running.values()) + list(self._streaming.values())
+        if not claims:
+            return
+        db = SessionLocal()
+        try:
+            # By claim: a job since requeued and claimed elsewhere isn't kept alive from here
+            db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.worker_id.in_(claims), GenerationJob.status == RUNNING)
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _recover_stale(self):
+        """Requeue (or give up on) running jobs whose worker has gone away"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        stale = (GenerationJob.status == RUNNING, GenerationJob.heartbeat_at < cutoff)
+        db = SessionLocal()
+        try:
+            failed = db.execute(
+                update(GenerationJob)
+                .where(*stale, GenerationJob.attempts >= self.max_attempts)
+                .values(status=FAILED, error="Generation was interrupted too many times",
+                        finished_at=datetime.utcnow())
+            ).rowcount
+            requeued = db.execute(
+                update(GenerationJob)
+                .where(*stale)
+                .values(status=QUEUED)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if failed or requeued:
+            logger.warning("Recovered stalled generation jobs: %d requeued, %d failed", requeued, failed)
+            with self._lock:
+                self.requeued += requeued
+                self.failed += failed
+    
+    def _dispatch(self):
+        with self._lock:
+            free = self.workers - len(self._running)
+        if free <= 0:
+            return
+        
+        db = SessionLocal()
+        try:
+            candidates = [
+                row[0] for row in db.query(GenerationJob.id)
+                .filter(GenerationJob.status == QUEUED)
+                .order_by(GenerationJob.created_at)
+                .limit(free)
+            ]
+            for job_id in candidates:
+                now = datetime.utcnow()
+                claim = new_claim()
+                # Conditional claim: another process may have taken it already
+                claimed = db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == job_id, GenerationJob.status == QUEUED)
+                    .values(status=RUNNING, started_at=now, heartbeat_at=now, worker_id=claim,
+                            attempts=GenerationJob.attempts + 1)
+                ).rowcount
+                db.commit()
+                if claimed:
+                    with self._lock:
+                        self._running[job_id] = claim
+                    self._executor.submit(self._run, job_id, claim)
+        finally:
+            db.close()
+    
+    def _run(self, job_id: str, claim: str):
+        started = time.perf_counter()
+        db = SessionLocal()
+        outcome = "failed"
+        try:
+            job = db.get(GenerationJob, job_id)
+            if job.worker_id != claim:
+                raise JobLost(f"Generation job {job_id} was claimed again before it started")
+            run_job(db, job)
+            db.commit()
+            outcome = "completed"
+        except JobLost:
+            logger.warning("Generation job %s was requeued while it ran; story discarded", job_id)
+            db.rollback()
+            outcome = "discarded"
+        except Exception as e:
+            logger.exception("Generation job %s failed", job_id)
+            db.rollback()
+            fail_job(db, job_id, e, claim)
+        finally:
+            db.close()
+            with self._lock:
+                self._running.pop(job_id, None)
+                self.last_job_seconds = time.perf_counter() - started
+                if outcome == "completed":
+                    self.completed += 1
+                elif outcome == "discarded":
+                    self.discarded += 1
+                else:
+                    self.failed += 1
+            self._wake.set()  # a worker is free: take the next queued job
+
+
+generation_queue = GenerationQueue(
+    workers=settings.generation_workers,
+    poll_interval=settings.generation_poll_seconds,
+    stale_after=settings.generation_stale_seconds,
+    max_attempts=settings.generation_max_attempts
+)
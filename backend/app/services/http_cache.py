@@ -0,0 +1,70 @@
+"""
+HTTP validators (ETag / Last-Modified) and Cache-Control for public GETs.
+
+Handlers compute an ETag from something cheap (the catalog version, a
+story's updated_at) and check it before loading or serializing anything,
+answering 304 Not Modified when the client's copy is current.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that determine a response body"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """
+    Whether the client's cached copy is still current.
+    
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the client sent no ETag (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison, as required for If-None-Match
+        return any(tag.removeprefix("W/") == etag for tag in candidates)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
+    
+    return False
+
+
+def set_cache_headers(
+    response: Response,
+    etag: str,
+    last_modified: datetime = None,
+    cache_control: str = None
+):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
+
+
+def not_modified(etag: str, last_modified: datetime = None, cache_control: str = None) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag, last_modified, cache_control)
+    return response
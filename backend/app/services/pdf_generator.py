@@ -1,46 +1,55 @@
 from fpdf import FPDF
-import os
 import re
 from datetime import datetime
+from functools import lru_cache
+
+PAGE_MARKER = re.compile(r'---\s*Page\s*\d+\s*---', re.IGNORECASE)
+# Closes a story; a marker, not text of its last page
+END_MARKER = re.compile(r'---\s*The End\s*---', re.IGNORECASE)
+
+
+# Unicode characters with ASCII equivalents, applied in one str.translate pass
+ASCII_REPLACEMENTS = str.maketrans({
+    '\u2014': '--',    # em-dash
+    '\u2013': '-',     # en-dash
+    '\u2018': "'",     # left single quote
+    '\u2019': "'",     # right single quote
+    '\u201c': '"',     # left double quote
+    '\u201d': '"',     # right double quote
+    '\u2026': '...',   # ellipsis
+    '\u2022': '*',     # bullet
+    '\u00a0': ' ',     # non-breaking space
+    '\u2003': ' ',     # em space
+    '\u2002': ' ',     # en space
+    '\u00b7': '*',     # middle dot
+    '\u2212': '-',     # minus sign
+    '\u00d7': 'x',     # multiplication sign
+    '\u00f7': '/',     # division sign
+    '\u2032': "'",     # prime
+    '\u2033': '"',     # double prime
+    '\u00ae': '(R)',   # registered trademark
+    '\u00a9': '(C)',   # copyright
+    '\u2122': '(TM)',  # trademark
+})
+
+# Anything the core PDF fonts can't encode (emojis, other scripts)
+NON_LATIN1 = re.compile('[^\x00-\xff]')
 
 
 def sanitize_text(text: str) -> str:
     """
     Replace Unicode characters with ASCII equivalents for PDF compatibility.
     """
-    replacements = {
-        '\u2014': '--',    # em-dash
-        '\u2013': '-',     # en-dash
-        '\u2018': "'",     # left single quote
-        '\u2019': "'",     # right single quote
-        '\u201c': '"',     # left double quote
-        '\u201d': '"',     # right double quote
-        '\u2026': '...',   # ellipsis
-        '\u2022': '*',     # bullet
-        '\u00a0': ' ',     # non-breaking space
-        '\u2003': ' ',     # em space
-        '\u2002': ' ',     # en space
-        '\u00b7': '*',     # middle dot
-        '\u2212': '-',     # minus sign
-        '\u00d7': 'x',     # multiplication sign
-        '\u00f7': '/',     # division sign
-        '\u2032': "'",     # prime
-        '\u2033': '"',     # double prime
-        '\u00ae': '(R)',   # registered trademark
-        '\u00a9': '(C)',   # copyright
-        '\u2122': '(TM)',  # trademark
-    }
-    
-    for unicode_char, ascii_char in replacements.items():
-        text = text.replace(unicode_char, ascii_char)
-    
-    # Remove emojis and other non-BMP characters
-    text = ''.join(char for char in text if ord(char) < 0x10000)
-    
-    # Remove any remaining non-latin1 characters (replace with ?)
-    text = text.encode('latin-1', errors='ignore').decode('latin-1')
-    
-    return text
+    if text.isascii():
+        return text
+    return _sanitize_unicode(text)
+
+
+@lru_cache(maxsize=1024)
+def _sanitize_unicode(text: str) -> str:
+    text = text.translate(ASCII_REPLACEMENTS)
+    # Drop emojis and any other remaining non-latin1 characters
+    return NON_LATIN1.sub('', text)
 
 
 class StoryPDF(FPDF):
@@ -49,13 +58,14 @@ class StoryPDF(FPDF):
     def __init__(self, title: str):
         super().__init__()
         self.story_title = title
+        self.header_title = sanitize_text(title)  # Drawn on every page
         self.set_auto_page_break(auto=True, margin=20)
     
     def header(self):
         """Add header to each page"""
         self.set_font("Helvetica", "I", 10)
         self.set_text_color(150, 150, 150)
-        self.cell(0, 10, sanitize_text(self.story_title), align="C")
+        self.cell(0, 10, self.header_title, align="C")
         self.ln(15)
     
     def footer(self):
@@ -112,30 +122,45 @@ class StoryPDF(FPDF):
         self.set_font("Helvetica", "", 14)
         self.set_text_color(50, 50, 50)
         
-        # Process content - handle illustration notes
-        lines = content.split("\n")
-        for line in lines:
+        # Lay out each paragraph (consecutive lines) with a single multi_cell;
+        # illustration notes get their own style
+        paragraph = []
+        for line in content.split("\n"):
             line = line.strip()
+            if line and not (line.startswith("[") and line.endswith("]")):
+                paragraph.append(line)
+                continue
+            
+            if paragraph:
+                self.add_paragraph(paragraph)
+                paragraph = []
             if not line:
                 self.ln(5)
                 continue
             
-            # Check for illustration notes
-            if line.startswith("[") and line.endswith("]"):
-                self.set_font("Helvetica", "I", 11)
-                self.set_text_color(100, 150, 100)
-                self.multi_cell(0, 8, sanitize_text(line))
-                self.set_font("Helvetica", "", 14)
-                self.set_text_color(50, 50, 50)
-                self.ln(5)
-            else:
-                self.multi_cell(0, 8, sanitize_text(line))
-                self.ln(3)
+            self.set_font("Helvetica", "I", 11)
+            self.set_text_color(100, 150, 100)
+            self.multi_cell(0, 8, sanitize_text(line))
+            self.set_font("Helvetica", "", 14)
+            self.set_text_color(50, 50, 50)
+            self.ln(5)
+        
+        if paragraph:
+            self.add_paragraph(paragraph)
+    
+    def add_paragraph(self, lines: list):
+        """Lines of body text, keeping their line breaks"""
+        self.multi_cell(0, 8, sanitize_text("\n".join(lines)))
+        self.ln(3)
 
 
 def create_story_pdf(title: str, content: str, page_count: int = 10) -> str:
     """
-    Create a PDF from story content.
+    Create a PDF from story content in the local storage directory.
+    
+    Rendering is CPU-bound; request handlers and scripts should go through
+    pdf_storage.store_story_pdf, which renders in a worker process and
+    saves to the configured storage backend.
     
     Args:
         title: Story title
@@ -145,17 +170,17 @@ def create_story_pdf(title: str, content: str, page_count: int = 10) -> str:
     Returns:
         Path to the generated PDF file
     """
-    # Create output directory if it doesn't exist
-    output_dir = "storage/pdfs"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Generate filename
-    safe_title = re.sub(r'[^\w\s-]', '', title).strip().replace(' ', '_')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_title}_{timestamp}.pdf"
-    output_path = os.path.join(output_dir, filename)
-    
-    # Create PDF
+    from app.services.pdf_storage import build_pdf_storage, pdf_filename
+    return build_pdf_storage("local").save(pdf_filename(title), render_story_pdf_bytes(title, content))
+
+
+def render_story_pdf_bytes(title: str, content: str) -> bytes:
+    """Render a story PDF in memory"""
+    return bytes(build_story_pdf(title, content).output())
+
+
+def build_story_pdf(title: str, content: str) -> StoryPDF:
+    """Lay out the title page and story pages"""
     pdf = StoryPDF(title)
     
     # Add title page
@@ -168,21 +193,20 @@ def create_story_pdf(title: str, content: str, page_count: int = 10) -> str:
         if page_content.strip():
             pdf.add_story_page(page_content, page_num=i)
     
-    # Save PDF
-    pdf.output(output_path)
-    
-    return output_path
+    return pdf
 
 
 def parse_story_pages(content: str) -> list:
     """
     Parse story content into individual pages.
     
-    Looks for markers like "--- Page X ---" or similar patterns.
+    Looks for markers like "--- Page X ---" or similar patterns, and drops
+    the closing "--- The End ---".
     """
+    content = END_MARKER.sub("", content)
+    
     # Try to split by page markers
-    page_pattern = r'---\s*Page\s*\d+\s*---'
-    pages = re.split(page_pattern, content, flags=re.IGNORECASE)
+    pages = PAGE_MARKER.split(content)
     
     # Filter out empty pages
     pages = [p.strip() for p in pages if p.strip()]
@@ -206,6 +230,45 @@ def parse_story_pages(content: str) -> list:
     return pages
 
 
+class PageSplitter:
+    """
+    Incremental parse_story_pages for text that arrives in chunks.
+    
+    feed() returns the pages completed by a chunk (a page is complete once
+    the next page marker has arrived); finish() returns the rest. Together
+    they yield the same pages parse_story_pages would for the whole text.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+    
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        pages = []
+        # Markers can straddle chunks, so only split on ones fully received
+        match = PAGE_MARKER.search(self.buffer)
+        while match:
+            page = END_MARKER.sub("", self.buffer[:match.start()]).strip()
+            if page:
+                pages.append(page)
+            self.buffer = self.buffer[match.end():]
+            match = PAGE_MARKER.search(self.buffer)
+        self.emitted += len(pages)
+        return pages
+    
+    def finish(self) -> list:
+        if not self.emitted:
+            # Nothing split off yet: same fallbacks as parse_story_pages
+            pages = parse_story_pages(self.buffer)
+        else:
+            rest = END_MARKER.sub("", self.buffer).strip()
+            pages = [rest] if rest else []
+        self.buffer = ""
+        self.emitted += len(pages)
+        return pages
+
+
 def create_sample_stories():
     """Create sample story PDFs for the library"""
     sample_stories = [
@@ -255,9 +318,7 @@ From that night on, Twinkle knew that even the smallest light can make a big dif
         }
     ]
     
-    created_files = []
-    for story in sample_stories:
-        path = create_story_pdf(story["title"], story["content"])
-        created_files.append(path)
-    
-    return created_files
+    from app.services.pdf_storage import store_story_pdfs
+    return store_story_pdfs(
+        [(story["title"], story["content"]) for story in sample_stories]
+    )
@@ -0,0 +1,341 @@
+"""
+Incremental scanning for the PDF importers (import_pdfs.py,
+manage_stories.py import and the watch_storage.py daemon).
+
+The imported_files table is a manifest of every PDF under the storage
+folder as it was last scanned: size, mtime and content hash, and what
+the import did with it. A rescan only lists and stats the files; those
+whose size and mtime still match the manifest aren't opened at all, so
+only new and changed files get hashed and checked against the library.
+
+The importers add their stories and the manifest rows in one
+transaction, so a failed import leaves both as they were.
+"""
+import os
+from datetime import datetime
+from app import models
+from app.services.blob_store import blob_root, hash_file
+from app.services.folder_watch import walk_files
+from app.services.pdf_linearize import store_linearized
+from app.services.pdf_metadata import extract_many
+from app.services.story_pages import index_pdf_story
+from app.services.taxonomy import detect_theme, detect_age_group
+
+IMPORTED = "imported"
+DUPLICATE = "duplicate"
+SKIPPED = "skipped"  # left out by the importer's own rules
+
+# Stay under SQLite's limit on bound parameters
+IN_CHUNK = 500
+
+# Bytes at the end of a PDF searched for %%EOF (some writers add junk after it)
+EOF_WINDOW = 1024
+
+
+class ScannedFile:
+    """A new or changed PDF found by scan_pdfs"""
+    
+    def __init__(self, path: str, size: int, mtime_ns: int, sha256: str = None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        self.duplicate_of = None  # why it isn't imported, for duplicates
+        self.status = None  # unset files (e.g. failed imports) are retried next scan
+        self.story_id = None
+        self.error = None  # metadata the importer couldn't read
+
+
+class ImportScan:
+    """What changed under the storage folder since the last import"""
+    
+    def __init__(self):
+        self.new = []  # ScannedFile to import
+        self.duplicates = []  # ScannedFile whose content is already in the library
+        self.removed = []  # manifest paths that are gone
+        self.unchanged = 0
+        self.known = set()  # manifest paths among the files looked at
+        self.changed = []  # ScannedFile not classified yet
+    
+    def print_diff(self):
+        for f in self.new:
+            print(f"  + {f.path}")
+        for f in self.duplicates:
+            print(f"  = {f.path} ({f.duplicate_of})")
+        for path in self.removed:
+            print(f"  - {path}")
+        print(
+            f"\n  New: {len(self.new)} | Duplicates: {len(self.duplicates)} | "
+            f"Removed: {len(self.removed)} | Unchanged: {self.unchanged}"
+        )
+
+
+def walk_pdfs(root: str):
+    """(path, stat) of every PDF under root, leaving out the blob store"""
+    return walk_files(root, ".pdf", exclude=[blob_root()])
+
+
+def looks_complete(path: str) -> bool:
+    """Whether a PDF ends like one (with %%EOF), i.e. isn't half copied"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - EOF_WINDOW))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def scan_pdfs(db, root: str) -> ImportScan:
+    """
+    Compare the PDFs under root with the manifest. New and changed files
+    are hashed and sorted into those to import and those whose content
+    (or path, for stories from before the blob store) is already in the
+    library. Reads only; nothing is written.
+    """
+    scan = ImportScan()
+    manifest = _manifest_rows(db.query(
+        models.ImportedFile.path,
+        models.ImportedFile.size_bytes,
+        models.ImportedFile.mtime_ns,
+        models.ImportedFile.story_id
+    ))
+    seen = set()
+    for path, stat in walk_pdfs(root):
+        seen.add(path)
+        _compare(scan, manifest, path, stat)
+    scan.removed = sorted(set(manifest) - seen)
+    _classify(db, scan)
+    return scan
+
+
+def scan_files(db, paths) -> ImportScan:
+    """
+    scan_pdfs for just these files (say, reported by a folder watcher),
+    without walking the tree. Missing files are ignored.
+    """
+    scan = ImportScan()
+    paths = list(dict.fromkeys(paths))
+    manifest = {}
+    for i in range(0, len(paths), IN_CHUNK):
+        manifest.update(_manifest_rows(
+            db.query(
+                models.ImportedFile.path,
+                models.ImportedFile.size_bytes,
+                models.ImportedFile.mtime_ns,
+                models.ImportedFile.story_id
+            ).filter(models.ImportedFile.path.in_(paths[i:i + IN_CHUNK]))
+        ))
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        _compare(scan, manifest, path, stat)
+    _classify(db, scan)
+    return scan
+
+
+def _manifest_rows(rows) -> dict:
+    """{path: (size, mtime_ns, story_id)}"""
+    return {path: (size, mtime_ns, story_id) for path, size, mtime_ns, story_id in rows}
+
+
+def _compare(scan: ImportScan, manifest: dict, path: str, stat):
+    """Count a file as unchanged, or queue it on scan.changed for _classify"""
+    known = manifest.get(path)
+    if known:
+        scan.known.add(path)
+    if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        scan.unchanged += 1
+    else:
+        f = ScannedFile(path, stat.st_size, stat.st_mtime_ns)
+        f.story_id = known[2] if known else None
+        scan.changed.append(f)
+
+
+def _classify(db, scan: ImportScan):
+    """Hash the changed files and sort them into scan.new and scan.duplicates"""
+    changed, scan.changed = [], scan.changed
+    for f in scan.changed:
+        try:
+            f.sha256, _ = hash_file(f.path)
+        except OSError:
+            continue  # Gone since it was listed
+        changed.append(f)
+    scan.changed = []
+    # Stories deleted since (without SQLite enforcing ON DELETE SET NULL)
+    live = _existing_stories(db, [f.story_id for f in changed if f.story_id])
+    for f in changed:
+        if f.story_id not in live:
+            f.story_id = None
+    digests = [f.sha256 for f in changed]
+    # Stored blobs, and imported files (whose blob is named after the
+    # linearized copy, not the file itself)
+    in_library = _referenced_digests(db, digests) | _imported_digests(db, digests)
+    legacy_paths = _story_paths(db, [f.path for f in changed])
+    
+    batch = {}
+    for f in sorted(changed, key=lambda f: f.path):
+        if f.story_id:
+            # Edited after its import: the story keeps the PDF it has
+            f.duplicate_of = f"changed since it was imported as story {f.story_id}"
+            f.status = IMPORTED
+            scan.duplicates.append(f)
+            continue
+        if f.sha256 in in_library:
+            f.duplicate_of = "same PDF already imported"
+        elif f.path in legacy_paths:
+            f.duplicate_of = "already imported"
+        elif f.sha256 in batch:
+            f.duplicate_of = f"same PDF as {batch[f.sha256]}"
+        else:
+            batch[f.sha256] = f.path
+            scan.new.append(f)
+            continue
+        f.status = DUPLICATE
+        scan.duplicates.append(f)
+
+
+def title_from_filename(path: str) -> str:
+    """A story title from a PDF's file name"""
+    title = os.path.splitext(os.path.basename(path))[0]
+    # Clean up title (replace underscores with spaces)
+    return title.replace("_", " ").replace("-", " ").strip()
+
+
+def import_new_files(db, scan: ImportScan, workers: int = None) -> list:
+    """
+    Add a story for each of scan.new, in the caller's transaction (which
+    should then save_scan and commit); returns the new stories.
+    
+    The title comes from the file name, theme and age group from the
+    title; page count, author and page text from the PDF (read across
+    worker processes). A linearized copy of the PDF goes in the blob store.
+    A file whose stored copy turns out to be in the library already
+    moves to scan.duplicates.
+    """
+    stories = []
+    # Page counts, text etc. for all new files at once, across worker processes
+    metadata = extract_many((f.path for f in scan.new), workers=workers, with_pages=True)
+    
+    for f in list(scan.new):
+        title = title_from_filename(f.path)
+        
+        # Detect theme and age group
+        theme = detect_theme(title)
+        age_group = detect_age_group(title)
+        
+        # Count pages
+        meta = metadata[f.path]
+        page_count = meta["page_count"] or 10
+        f.error = meta["error"]
+        
+        # Store a copy rewritten for fast web view (page 1 shows before
+        # the rest arrives); the dropped file is left as it is
+        stored_path, linearized = store_linearized(f.path, f.sha256)
+        existing = db.query(models.Story.id).filter(models.Story.pdf_url == stored_path).first()
+        if existing:
+            f.duplicate_of, f.status = f"same PDF as story {existing[0]}", DUPLICATE
+            scan.new.remove(f)
+            scan.duplicates.append(f)
+            print(f"  [SKIP] {os.path.basename(f.path)} ({f.duplicate_of})")
+            continue
+        
+        # Create story entry
+        story = models.Story(
+            title=title,
+            author=meta["author"] or "StoryLand",
+            description=f"A wonderful {theme} story for children ages {age_group}.",
+            pdf_url=stored_path,
+            pdf_linearized=linearized,
+            page_count=page_count,
+            age_group=age_group,
+            theme=theme,
+            is_premium=False,
+            is_featured=True,
+            cover_image_url=f"/storage/covers/{theme}.jpg"
+        )
+        db.add(story)
+        index_pdf_story(db, story, meta["pages"])
+        f.status, f.story_id = IMPORTED, story.id
+        
+        print(f"  [ADD] {title}")
+        print(f"        Theme: {theme}, Age: {age_group}, Pages: {page_count}, Linearized: {linearized}")
+        if f.error:
+            print(f"        Couldn't read the PDF's details ({f.error}); page count set to {page_count}")
+        stories.append(story)
+    return stories
+
+
+def _referenced_digests(db, digests) -> set:
+    found = set()
+    for i in range(0, len(digests), IN_CHUNK):
+        found.update(
+            row[0] for row in db.query(models.Blob.sha256).filter(
+                models.Blob.sha256.in_(digests[i:i + IN_CHUNK]),
+                models.Blob.ref_count > 0
+            )
+        )
+    return found
+
+
+def _existing_stories(db, story_ids) -> set:
+    found = set()
+    for i in range(0, len(story_ids), IN_CHUNK):
+        found.update(
+            row[0] for row in db.query(models.Story.id)
+            .filter(models.Story.id.in_(story_ids[i:i + IN_CHUNK]))
+        )
+    return found
+
+
+def _imported_digests(db, digests) -> set:
+    found = set()
+    for i in range(0, len(digests), IN_CHUNK):
+        found.update(
+            row[0] for row in db.query(models.ImportedFile.sha256)
+            .join(models.Story, models.Story.id == models.ImportedFile.story_id)
+            .filter(
+                models.ImportedFile.sha256.in_(digests[i:i + IN_CHUNK]),
+                models.ImportedFile.status == IMPORTED
+            )
+        )
+    return found
+
+
+def _story_paths(db, paths) -> set:
+    found = set()
+    for i in range(0, len(paths), IN_CHUNK):
+        found.update(
+            row[0] for row in db.query(models.Story.pdf_url)
+            .filter(models.Story.pdf_url.in_(paths[i:i + IN_CHUNK]))
+        )
+    return found
+
+
+def save_scan(db, scan: ImportScan):
+    """Record the scanned files in the manifest, in the caller's transaction"""
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for f in scan.new + scan.duplicates:
+        if f.status is None:
+            continue
+        row = {
+            "path": f.path,
+            "size_bytes": f.size,
+            "mtime_ns": f.mtime_ns,
+            "sha256": f.sha256,
+            "status": f.status,
+            "story_id": f.story_id,
+            "error": f.error,
+            "scanned_at": now,
+        }
+        (updates if f.path in scan.known else inserts).append(row)
+    if inserts:
+        db.bulk_insert_mappings(models.ImportedFile, inserts)
+    if updates:
+        db.bulk_update_mappings(models.ImportedFile, updates)
+    for i in range(0, len(scan.removed), IN_CHUNK):
+        db.query(models.ImportedFile)\
+            .filter(models.ImportedFile.path.in_(scan.removed[i:i + IN_CHUNK]))\
+            .delete(synchronize_session=False)
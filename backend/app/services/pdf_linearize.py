@@ -0,0 +1,95 @@
+"""
+PDF linearization ("fast web view").
+
+A linearized PDF starts with everything needed to show page 1, so a
+browser viewer fetching byte ranges can display it long before the whole
+file has arrived. Imported PDFs are stored in that form at ingest
+(store_linearized), using pikepdf when it's installed or the qpdf command
+line tool otherwise. Story.pdf_linearized records the outcome.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from app.services.blob_store import blob_root, put_file
+
+# The linearization dictionary must be the first object in the file
+LINEARIZED_MARKER = b"/Linearized"
+HEADER_BYTES = 1024
+
+
+def is_linearized(pdf_path: str) -> bool:
+    try:
+        with open(pdf_path, "rb") as f:
+            return LINEARIZED_MARKER in f.read(HEADER_BYTES)
+    except OSError:
+        return False
+
+
+def linearize_pdf(pdf_path: str, timeout: float = 600) -> bool:
+    """
+    Rewrite a PDF into linearized form, atomically replacing the original.
+    Returns whether the file is now linearized; on any failure the original
+    is left untouched.
+    """
+    if is_linearized(pdf_path):
+        return True
+    
+    tmp_path = pdf_path + ".linearizing"
+    try:
+        if not _write_linearized(pdf_path, tmp_path, timeout) or not is_linearized(tmp_path):
+            return False
+        os.replace(tmp_path, pdf_path)
+        return True
+    except Exception:
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def store_linearized(source: str, digest: str = None, timeout: float = 600):
+    """
+    Put a PDF in the blob store in linearized form; returns (blob path,
+    whether it's linearized). The linearized copy is written to a
+    temporary file and stored under its own hash: a blob is never
+    rewritten, so its content always matches its name. The source is
+    left as it is, and stored unchanged (digest is its hash, if known)
+    when it can't be linearized.
+    """
+    if is_linearized(source):
+        return put_file(source, ".pdf", digest), True
+    
+    os.makedirs(blob_root(), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=blob_root(), suffix=".linearizing")
+    os.close(fd)
+    try:
+        if _write_linearized(source, tmp_path, timeout) and is_linearized(tmp_path):
+            return put_file(tmp_path, ".pdf"), True
+    except Exception:
+        pass
+    finally:
+        os.remove(tmp_path)
+    return put_file(source, ".pdf", digest), False
+
+
+def _write_linearized(pdf_path: str, output_path: str, timeout: float) -> bool:
+    try:
+        import pikepdf
+    except ImportError:
+        pikepdf = None
+    if pikepdf is not None:
+        with pikepdf.open(pdf_path) as pdf:
+            pdf.save(output_path, linearize=True)
+        return True
+    
+    qpdf = shutil.which("qpdf")
+    if not qpdf:
+        return False
+    result = subprocess.run(
+        [qpdf, "--linearize", pdf_path, output_path],
+        capture_output=True,
+        timeout=timeout
+    )
+    # 3 means it succeeded with warnings (common with scanned books)
+    return result.returncode in (0, 3)
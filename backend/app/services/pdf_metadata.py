@@ -0,0 +1,208 @@
+"""
+PDF metadata for imports: page count, title, author and the first
+page's text, read without loading the whole file; and, for the reader
+and search, the text of each page (see story_pages.pages_to_extract).
+
+Given a path, PyPDF2's PdfReader reads the entire file into memory, and
+len(reader.pages) then builds an object for every page. Scanned books
+run to hundreds of MB, so here the reader gets an open file instead and
+only what's needed is read: the xref and trailer, the document info,
+the page tree's /Count and the first page.
+
+extract_many reads many files across a process pool. Each file gets a
+time limit and each worker process a memory limit (both Unix only), and
+a file that can't be read comes back with an error message instead of a
+guessed page count. Page text is extracted in the same workers, under
+the same limits, so importers never parse a PDF in their own process.
+"""
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.config import get_settings
+from app.services.story_pages import pages_to_extract
+
+settings = get_settings()
+
+# Page attributes a page can inherit from its parents in the page tree
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+MAX_FIRST_PAGE_CHARS = 2000
+
+MB = 1024 * 1024
+
+
+def read_pdf_metadata(path: str, with_pages: bool = False) -> dict:
+    """
+    {"path", "page_count", "title", "author", "first_page_text", "pages",
+    "error"} for one PDF. page_count is None and error says why when the
+    file can't be read; pages (the text of each page) is only read
+    with_pages, and is [] if the pages can't be.
+    """
+    result = empty_metadata(path)
+    try:
+        from PyPDF2 import PdfReader
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            if reader.is_encrypted and not reader.decrypt(""):
+                raise ValueError("encrypted with a password")
+            pages = reader.trailer["/Root"].get_object()["/Pages"].get_object()
+            result["page_count"] = int(pages["/Count"])
+            
+            info = reader.metadata
+            if info:
+                result["title"] = _clean(info.title)
+                result["author"] = _clean(info.author)
+            
+            if with_pages:
+                result["pages"] = read_page_texts(reader, pages_to_extract(result["page_count"]))
+            if result["pages"]:
+                result["first_page_text"] = result["pages"][0].strip()[:MAX_FIRST_PAGE_CHARS]
+            else:
+                page = first_page(reader, pages)
+                if page is not None:
+                    result["first_page_text"] = (page.extract_text() or "").strip()[:MAX_FIRST_PAGE_CHARS]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def empty_metadata(path: str, error: str = None) -> dict:
+    return {
+        "path": path,
+        "page_count": None,
+        "title": None,
+        "author": None,
+        "first_page_text": "",
+        "pages": [],
+        "error": error,
+    }
+
+
+def read_page_texts(reader, max_pages: int) -> list:
+    """Text of each of the first max_pages pages ([] if they can't be read)"""
+    try:
+        return [page.extract_text() or "" for page in reader.pages[:max_pages]]
+    except Exception:
+        return []
+
+
+def first_page(reader, node):
+    """
+    Page 1, found by following the first kid down the page tree, without
+    visiting (or building objects for) any other page.
+    """
+    from PyPDF2 import PageObject
+    from PyPDF2.generic import IndirectObject, NameObject
+    inherited = {}
+    reference = None
+    while node.get("/Type", "/Pages") == "/Pages":
+        for key in INHERITABLE:
+            if key in node:
+                inherited[key] = node[key]
+        kids = node.get("/Kids")
+        if not kids:
+            return None
+        reference = kids[0]
+        node = reference.get_object()
+    
+    page = PageObject(reader, reference if isinstance(reference, IndirectObject) else None)
+    page.update(node)
+    for key, value in inherited.items():
+        if key not in page:
+            page[NameObject(key)] = value
+    return page
+
+
+def _clean(value):
+    value = str(value).strip() if value else ""
+    return value or None
+
+
+# ==================== Worker pool ====================
+
+class MetadataTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise MetadataTimeout("took longer than pdf_metadata_timeout_seconds")
+
+
+def read_with_time_limit(path: str, timeout: float, with_pages: bool = False) -> dict:
+    """read_pdf_metadata, interrupted after timeout seconds where signals allow it"""
+    timed = timeout and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return read_pdf_metadata(path, with_pages)
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def limit_memory(max_mb: int):
+    """
+    Worker initializer: cap the process's address space at max_mb above
+    what it already uses, so a pathological file raises MemoryError (and
+    is recorded as failed) instead of exhausting the machine.
+    """
+    try:
+        import resource
+    except ImportError:
+        return  # Windows
+    limit = max_mb * MB
+    try:
+        with open("/proc/self/statm") as f:
+            limit += int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        pass
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def extract_many(paths, workers: int = None, timeout: float = None, max_memory_mb: int = None,
+                 with_pages: bool = False) -> dict:
+    """
+    read_pdf_metadata for many files, in parallel; returns {path: metadata}.
+    
+    workers defaults to pdf_metadata_workers (None: one per CPU core; 0:
+    read in this process, without the memory limit). A single file is
+    read in a worker process too.
+    """
+    paths = list(dict.fromkeys(paths))
+    if workers is None:
+        workers = settings.pdf_metadata_workers
+    if timeout is None:
+        timeout = settings.pdf_metadata_timeout_seconds
+    if max_memory_mb is None:
+        max_memory_mb = settings.pdf_metadata_max_memory_mb
+    
+    if workers == 0 or not paths:
+        return {path: read_with_time_limit(path, timeout, with_pages) for path in paths}
+    
+    # fork on Linux: spawn would re-run the calling script's __main__ in
+    # every worker (see pdf_renderer.py)
+    method = "fork" if sys.platform.startswith("linux") else "spawn"
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=min(workers or os.cpu_count() or 1, len(paths)),
+        mp_context=multiprocessing.get_context(method),
+        initializer=limit_memory,
+        initargs=(max_memory_mb,)
+    ) as pool:
+        futures = {pool.submit(read_with_time_limit, path, timeout, with_pages): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # The worker itself died (killed, or memory ran out outside Python)
+                results[path] = empty_metadata(path, f"worker failed: {type(e).__name__}")
+    return {path: results[path] for path in paths}
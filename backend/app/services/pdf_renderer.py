@@ -0,0 +1,182 @@
+"""
+Process-pool PDF rendering.
+
+fpdf2 layout is pure-Python CPU work, so rendering on request or worker
+threads only contends for the GIL. PdfRenderService runs it in a pool of
+worker processes instead, so renders scale across cores:
+
+- at most max_queue renders are accepted at once (queued + running);
+  past that, submit waits up to its timeout and then raises RenderQueueFull
+- every render reports its own duration, exposed through stats()
+- with workers set to 0, renders run inline (no subprocesses)
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.config import get_settings
+from app.services.pdf_generator import create_story_pdf, render_story_pdf_bytes
+
+settings = get_settings()
+
+
+class RenderQueueFull(Exception):
+    """Too many renders already queued"""
+
+
+def _render(title: str, content: str, page_count: int, as_bytes: bool):
+    """Runs in a worker process: (path or bytes, seconds spent rendering)"""
+    started = time.perf_counter()
+    if as_bytes:
+        result = render_story_pdf_bytes(title, content)
+    else:
+        result = create_story_pdf(title, content, page_count)
+    return result, time.perf_counter() - started
+
+
+class PdfRenderService:
+    """Bounded queue of PDF renders executed on a process pool"""
+    
+    def __init__(self, workers: int = None, max_queue: int = 32, submit_timeout: float = 30.0):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue
+        self.submit_timeout = submit_timeout
+        
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        
+        self.queued = 0  # accepted and not yet finished
+        self.rendered = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_render_seconds = 0.0
+        self.last_render_seconds = None
+        self.max_render_seconds = 0.0
+    
+    def submit(
+        self,
+        title: str,
+        content: str,
+        page_count: int = 10,
+        as_bytes: bool = False,
+        timeout: float = None
+    ) -> Future:
+        """
+        Queue a render; the future resolves to the PDF's path (or its bytes).
+        
+        Waits up to timeout seconds (default submit_timeout; -1 waits
+        forever) for room in the queue.
+        """
+        timeout = self.submit_timeout if timeout is None else timeout
+        acquired = self._slots.acquire() if timeout < 0 else self._slots.acquire(timeout=timeout)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise RenderQueueFull(f"{self.max_queue} PDF renders already queued")
+        with self._lock:
+            self.queued += 1
+        
+        result = Future()
+        try:
+            if self.workers:
+                inner = self._get_pool().submit(_render, title, content, page_count, as_bytes)
+            else:
+                inner = Future()
+                try:
+                    inner.set_result(_render(title, content, page_count, as_bytes))
+                except Exception as e:
+                    inner.set_exception(e)
+        except Exception:
+            self._finished(None)
+            raise
+        inner.add_done_callback(lambda done: self._complete(done, result))
+        return result
+    
+    def render(self, title: str, content: str, page_count: int = 10, as_bytes: bool = False):
+        """Render and wait for the result"""
+        return self.submit(title, content, page_count, as_bytes).result()
+    
+    def render_many(self, stories, as_bytes: bool = False) -> list:
+        """
+        Render (title, content) pairs across all workers, blocking while the
+        queue is full; results come back in order.
+        """
+        futures = [
+            self.submit(title, content, content.count("--- Page") or 10, as_bytes, timeout=-1)
+            for title, content in stories
+        ]
+        return [future.result() for future in futures]
+    
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.rendered + self.failed
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "max_queue": self.max_queue,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_render_seconds": self.total_render_seconds / finished if finished else None,
+                "last_render_seconds": self.last_render_seconds,
+                "max_render_seconds": self.max_render_seconds,
+            }
+    
+    def start(self):
+        """
+        Launch the worker processes now. Call this before starting other
+        background threads, so the workers are forked from a quiet process.
+        """
+        if self.workers:
+            self._get_pool().submit(os.getpid).result()
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # fork on Linux: spawn would re-run the parent's __main__ in
+                # every worker (scripts create tables at import time). With
+                # fork, every worker is launched on the first submit.
+                method = "fork" if sys.platform.startswith("linux") else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self._pool
+    
+    def _complete(self, done: Future, result: Future):
+        error = done.exception()
+        if error is not None:
+            self._finished(None)
+            result.set_exception(error)
+            return
+        value, seconds = done.result()
+        self._finished(seconds)
+        result.set_result(value)
+    
+    def _finished(self, seconds):
+        with self._lock:
+            self.queued -= 1
+            if seconds is None:
+                self.failed += 1
+            else:
+                self.rendered += 1
+                self.total_render_seconds += seconds
+                self.last_render_seconds = seconds
+                self.max_render_seconds = max(self.max_render_seconds, seconds)
+        self._slots.release()
+
+
+pdf_renderer = PdfRenderService(
+    workers=settings.pdf_render_workers,
+    max_queue=settings.pdf_render_max_queue,
+    submit_timeout=settings.pdf_render_submit_timeout_seconds
+)
@@ -0,0 +1,119 @@
+"""
+Where rendered story PDFs are kept.
+
+Stories are rendered to bytes in memory (see pdf_renderer.py) and handed
+to a storage backend, which returns the value stored in Story.pdf_url:
+
+- local: a file in the content-addressed blob store, served by the API
+  (development)
+- cloudinary: uploaded straight from memory, no temp file; the URL is
+  a public Cloudinary link
+
+The pdf_storage setting picks the backend; left empty, Cloudinary is used
+when it's configured and local files otherwise.
+"""
+import io
+import re
+from datetime import datetime
+from app.config import get_settings
+from app.services.blob_store import put_bytes
+from app.services.pdf_renderer import pdf_renderer
+
+settings = get_settings()
+
+
+def pdf_filename(title: str) -> str:
+    """<title>_<timestamp>.pdf, safe for file systems and URLs"""
+    safe_title = re.sub(r'[^\w\s-]', '', title).strip().replace(' ', '_')
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{safe_title}_{timestamp}.pdf"
+
+
+class LocalPdfStorage:
+    """PDFs as local files, in the content-addressed blob store"""
+    
+    name = "local"
+    
+    def save(self, filename: str, data: bytes) -> str:
+        """Store data (named by its hash, not filename); returns the blob's path"""
+        return put_bytes(data, ".pdf")
+
+
+class CloudinaryPdfStorage:
+    """PDFs uploaded to Cloudinary as raw files, straight from memory"""
+    
+    name = "cloudinary"
+    
+    def __init__(self, folder: str = "kids-library/pdfs"):
+        self.folder = folder
+    
+    def save(self, filename: str, data: bytes) -> str:
+        """Upload data; returns its secure URL"""
+        import cloudinary.uploader
+        from app.services.cloudinary_service import is_cloudinary_configured
+        if not is_cloudinary_configured():
+            raise RuntimeError("PDF storage is cloudinary, but Cloudinary isn't configured")
+        
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data),
+            resource_type="raw",
+            public_id=filename,
+            folder=self.folder,
+            overwrite=True
+        )
+        return result["secure_url"]
+
+
+def build_pdf_storage(name: str = None):
+    """The configured storage backend"""
+    if not name:
+        name = settings.pdf_storage
+    if not name:
+        cloud = settings.cloudinary_cloud_name and settings.cloudinary_api_key
+        name = "cloudinary" if cloud else "local"
+    
+    if name == "local":
+        return LocalPdfStorage()
+    if name == "cloudinary":
+        return CloudinaryPdfStorage()
+    raise ValueError(f"Unknown PDF storage: {name}")
+
+
+pdf_storage = build_pdf_storage()
+
+
+def store_story_pdf(title: str, content: str, page_count: int = 10):
+    """
+    Render a story (on the render pool) and save it to the configured
+    storage without touching the local disk in between.
+    
+    Returns:
+        (pdf_url, size in bytes)
+    """
+    data = pdf_renderer.render(title, content, page_count, as_bytes=True)
+    return pdf_storage.save(pdf_filename(title), data), len(data)
+
+
+def store_story_pdfs(stories) -> list:
+    """store_story_pdf for (title, content) pairs, rendered across all workers"""
+    pdfs = pdf_renderer.render_many(stories, as_bytes=True)
+    return [
+        pdf_storage.save(pdf_filename(title), data)
+        for (title, _), data in zip(stories, pdfs)
+    ]
+
+
+def rerender_story_pdf(db, story):
+    """
+    PDF bytes rebuilt from a generated story's indexed text, for when its
+    local file is gone (local disks don't survive a restart on most hosts).
+    None when the text isn't a complete generated story.
+    """
+    from app.models import StorySearchDocument
+    from app.services.pdf_generator import PAGE_MARKER
+    from app.services.search import MAX_BODY_CHARS
+    document = db.get(StorySearchDocument, story.id)
+    body = document.body if document else None
+    if not body or len(body) >= MAX_BODY_CHARS or not PAGE_MARKER.search(body):
+        return None  # extracted PDF text, or cut short by the index
+    return pdf_renderer.render(story.title, body, story.page_count or 10, as_bytes=True)
@@ -0,0 +1,214 @@
+"""
+File responses with HTTP Range support (RFC 9110, section 14).
+
+RangedFileResponse serves a local file the way a static file server
+would, so browsers' PDF viewers can fetch just the byte ranges they need
+and interrupted downloads can resume:
+
+- Accept-Ranges, ETag and Last-Modified on every response
+- 304 Not Modified for current If-None-Match / If-Modified-Since
+- Range: one range answers 206 with Content-Range, several answer 206
+  multipart/byteranges; unsatisfiable ranges answer 416
+- If-Range: ranges are only honoured while the file is unchanged
+
+The bytes go out in chunks read off the event loop. A server that offers
+the ASGI zero-copy send extension gets the file to os.sendfile instead,
+but neither uvicorn nor gunicorn with uvicorn workers (what run.py and
+the Procfile use) does, so on the supported servers that path is unused:
+put a static file server in front of storage/ if PDF traffic needs
+sendfile.
+"""
+import os
+import re
+import uuid
+from datetime import datetime
+from mimetypes import guess_type
+import anyio
+from fastapi import Request
+from starlette.responses import Response
+from app.services.http_cache import make_etag, http_date, is_not_modified
+
+RANGE_SPEC = re.compile(r"^(\d*)-(\d*)$")
+
+# Not offered by uvicorn (see above)
+ZERO_COPY = "http.response.zerocopysend"
+
+
+def parse_range(header: str, size: int):
+    """
+    Byte ranges (start, end inclusive) requested by a Range header, sorted
+    with overlapping and adjacent ones merged.
+    
+    None means the header should be ignored (missing, malformed or not in
+    bytes); [] means none of the ranges can be satisfied.
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+    
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC.match(spec.strip())
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last n bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = min(int(last), size - 1) if last else size - 1
+        if start < size:
+            ranges.append((start, end))
+    
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Whether Range may be honoured: no If-Range, or one naming the current file"""
+    value = request.headers.get("if-range")
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"'):
+        return value == etag  # Strong comparison; weak tags never match
+    return value == http_date(last_modified)
+
+
+class RangedFileResponse(Response):
+    """A local file, whole or in byte ranges, as the request asks"""
+    
+    chunk_size = 64 * 1024
+    max_ranges = 16  # More than this (after merging) and the whole file is sent
+    
+    def __init__(
+        self,
+        path: str,
+        request: Request,
+        media_type: str = None,
+        headers: dict = None,
+        stat_result: os.stat_result = None
+    ):
+        self.path = path
+        self.media_type = media_type or guess_type(path)[0] or "application/octet-stream"
+        self.background = None
+        self.boundary = None
+        self.parts = []  # (part header bytes, start, end)
+        
+        stat = stat_result or os.stat(path)
+        size = stat.st_size
+        last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
+        etag = make_etag("file", stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        
+        headers = dict(headers or {})
+        headers.update({
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": http_date(last_modified),
+        })
+        
+        if is_not_modified(request, etag, last_modified):
+            self.status_code = 304
+            self.init_headers(headers)
+            return
+        
+        ranges = None
+        if request.method in ("GET", "HEAD") and if_range_matches(request, etag, last_modified):
+            ranges = parse_range(request.headers.get("range"), size)
+        if ranges is not None and len(ranges) > self.max_ranges:
+            ranges = None
+        
+        if ranges is None:
+            self.status_code = 200
+            headers["content-length"] = str(size)
+            if size:
+                self.parts = [(b"", 0, size - 1)]
+        elif not ranges:
+            self.status_code = 416
+            headers["content-range"] = f"bytes */{size}"
+            headers["content-length"] = "0"
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            headers["content-length"] = str(end - start + 1)
+            self.parts = [(b"", start, end)]
+        else:
+            self.status_code = 206
+            self.boundary = uuid.uuid4().hex
+            length = 0
+            for start, end in ranges:
+                part_header = (
+                    f"\r\n--{self.boundary}\r\n"
+                    f"Content-Type: {self.media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((part_header, start, end))
+                length += len(part_header) + end - start + 1
+            length += len(self.closing_boundary)
+            headers["content-length"] = str(length)
+            headers["content-type"] = f"multipart/byteranges; boundary={self.boundary}"
+        
+        self.init_headers(headers)
+    
+    @property
+    def closing_boundary(self) -> bytes:
+        return f"\r\n--{self.boundary}--\r\n".encode("latin-1") if self.boundary else b""
+    
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD" or not self.parts:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        zero_copy = ZERO_COPY in scope.get("extensions", {})
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for part_header, start, end in self.parts:
+                if part_header:
+                    await send({"type": "http.response.body", "body": part_header, "more_body": True})
+                if zero_copy:
+                    await send({
+                        "type": ZERO_COPY,
+                        "file": file,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True,
+                    })
+                else:
+                    await self.send_chunks(file, start, end, send)
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+        await send({"type": "http.response.body", "body": self.closing_boundary, "more_body": False})
+    
+    async def send_chunks(self, file, start: int, end: int, send):
+        position = start
+        while position <= end:
+            count = min(self.chunk_size, end - position + 1)
+            chunk = await anyio.to_thread.run_sync(read_at, file, position, count)
+            if not chunk:
+                break  # The file shrank underneath us
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            position += len(chunk)
+
+
+def read_at(file, offset: int, count: int) -> bytes:
+    file.seek(offset)
+    return file.read(count)
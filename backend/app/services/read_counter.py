@@ -0,0 +1,139 @@
+"""
+Write-behind buffer for story read counts.
+
+Reads only bump an in-memory counter per story; a background thread folds
+the pending counts into the database every few seconds with one batched
+UPDATE ... SET read_count = read_count + n, and once more on shutdown.
+"""
+import logging
+import threading
+import time
+from sqlalchemy import bindparam, update
+from app.config import get_settings
+from app.database import engine
+from app.models import Story
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+stories_table = Story.__table__
+
+# One row per story per flush, run as an executemany
+increment_stmt = update(stories_table)\
+    .where(stories_table.c.id == bindparam("story_id"))\
+    .values(
+        read_count=stories_table.c.read_count + bindparam("n"),
+        # Reads aren't content changes; keep onupdate from firing
+        updated_at=stories_table.c.updated_at
+    )
+
+
+class ReadCountBuffer:
+    """Aggregates read_count increments per story and flushes them in batches"""
+    
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 10000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending  # distinct stories held between flushes
+        
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_increments = 0
+        self.dropped_increments = 0
+        self.last_flush_seconds = None
+        self.max_flush_seconds = 0.0
+    
+    def increment(self, story_id: int, count: int = 1):
+        """Record reads of a story; never touches the database"""
+        with self._lock:
+            self._add(story_id, count)
+    
+    def flush(self) -> int:
+        """Write all pending increments; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            
+            # Sorted so concurrent flushers lock rows in the same order
+            params = [{"story_id": story_id, "n": n} for story_id, n in sorted(batch.items())]
+            
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(increment_stmt, params)
+            except Exception:
+                logger.exception("Flushing %d read counts failed", len(batch))
+                with self._lock:
+                    self.failed_flushes += 1
+                    # Put them back for the next attempt (dropping any overflow)
+                    for story_id, n in batch.items():
+                        self._add(story_id, n)
+                return 0
+            elapsed = time.perf_counter() - started
+            
+            written = sum(batch.values())
+            with self._lock:
+                self.flushes += 1
+                self.flushed_increments += written
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            return written
+    
+    def start(self):
+        """Start the periodic flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="read-count-flusher", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the flush thread and write whatever is still pending"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._pending:
+                lost = sum(self._pending.values())
+                self.dropped_increments += lost
+                self._pending = {}
+                logger.error("Dropped %d read counts at shutdown", lost)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_stories": len(self._pending),
+                "pending_increments": sum(self._pending.values()),
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "flushed_increments": self.flushed_increments,
+                "dropped_increments": self.dropped_increments,
+                "last_flush_seconds": self.last_flush_seconds,
+                "max_flush_seconds": self.max_flush_seconds,
+            }
+    
+    def _add(self, story_id: int, count: int):
+        # Caller holds self._lock
+        if story_id not in self._pending and len(self._pending) >= self.max_pending:
+            self.dropped_increments += count
+            return
+        self._pending[story_id] = self._pending.get(story_id, 0) + count
+    
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+read_counter = ReadCountBuffer(
+    flush_interval=settings.read_count_flush_seconds,
+    max_pending=settings.read_count_max_pending
+)
@@ -0,0 +1,202 @@
+"""
+In-process read-through cache for the public story endpoints.
+
+Entries are evicted LRU once the cache is full and expire after a TTL.
+Expired entries can still be served for a grace period while a background
+thread reloads them (stale-while-revalidate), so a slow database doesn't
+stall the homepage.
+
+Invalidation:
+- Story changes committed in this process drop the affected detail entries
+  and every listing entry as soon as the transaction commits.
+- Changes from other workers or the admin scripts bump the shared catalog
+  version (see models.bump_catalog_version); each process polls it and
+  clears its cache when it moves.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import get_catalog_state
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LIST_TAG = "list"
+
+
+def story_tag(story_id: int) -> str:
+    return f"story:{story_id}"
+
+
+class ResponseCache:
+    """Bounded LRU/TTL cache with tag invalidation and stale-while-revalidate"""
+    
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 30.0,
+        stale_ttl: float = 300.0,
+        version_check_interval: float = 1.0,
+        enabled: bool = True
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.version_check_interval = version_check_interval
+        self.enabled = enabled
+        
+        self._entries = OrderedDict()  # key -> (value, stored_at, tags)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._generation = 0  # bumped on every invalidation
+        self._version = None
+        self._updated_at = None  # when the catalog version last moved
+        self._version_checked_at = 0.0
+        
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    def get_or_load(self, key, loader, db, tags=()):
+        """
+        Return the cached value for key, calling loader(db) on a miss.
+        
+        Exceptions from the loader propagate and nothing is cached.
+        """
+        if not self.enabled:
+            return loader(db)
+        
+        self._sync_version(db)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                value, stored_at, _ = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(key, loader, tags, self._generation),
+                            daemon=True
+                        ).start()
+                    return value
+            self.misses += 1
+            generation = self._generation
+        
+        value = loader(db)
+        self._store(key, value, tags, generation)
+        return value
+    
+    def invalidate(self, tags):
+        """Drop every entry carrying any of the given tags"""
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (_, _, t) in self._entries.items() if tags & t]:
+                del self._entries[key]
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def catalog_state(self, db):
+        """
+        (version, updated_at) of the catalog as last polled, for validators:
+        at most version_check_interval old, and the version the cached
+        entries belong to. Only reads the database when a poll is due.
+        """
+        if not self.enabled:
+            return get_catalog_state(db)
+        self._sync_version(db)
+        with self._lock:
+            return self._version, self._updated_at
+    
+    def note_local_version(self, version: int):
+        """
+        Adopt a version bumped by this process's own commit, so the next
+        poll doesn't clear entries the commit already invalidated precisely.
+        """
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "version": self._version,
+            }
+    
+    def _store(self, key, value, tags, generation):
+        with self._lock:
+            # An invalidation raced with the load; the value may already be stale
+            if generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic(), set(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _refresh(self, key, loader, tags, generation):
+        db = SessionLocal()
+        try:
+            self._store(key, loader(db), tags, generation)
+        except Exception:
+            # Keep serving the stale copy; the next miss will surface the error
+            logger.exception("Background refresh failed for %r", key)
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(key)
+    
+    def _sync_version(self, db):
+        """Clear the cache if another process changed the catalog"""
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+        version, self._updated_at = get_catalog_state(db)
+        if version != self._version:
+            if self._version is not None:
+                self.clear()
+            self._version = version
+
+
+story_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl=settings.response_cache_ttl_seconds,
+    stale_ttl=settings.response_cache_stale_seconds,
+    version_check_interval=settings.response_cache_version_check_seconds,
+    enabled=settings.response_cache_enabled
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_stories(session):
+    version = session.info.pop("catalog_version", None)
+    changed = session.info.pop("changed_story_ids", None)
+    if changed is None:
+        return
+    tags = {LIST_TAG}
+    tags.update(story_tag(story_id) for story_id in changed if story_id is not None)
+    story_cache.invalidate(tags)
+    if version is not None:
+        story_cache.note_local_version(version)
@@ -0,0 +1,371 @@
+"""
+Full-text search over story titles, descriptions and PDF text.
+
+The searchable text lives in story_search_documents (one row per story).
+On top of it each database gets the best index it supports:
+- SQLite: an FTS5 virtual table (story_search) keyed by story id
+- PostgreSQL: a weighted tsvector expression with a GIN index
+- anything else, or SQLite without FTS5: an in-process inverted index
+
+Stories are indexed incrementally through index_story() when they're
+added, and their documents follow title and description edits made
+through the ORM (models.track_story_changes); rebuild_search_index()
+re-creates everything from scratch.
+"""
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, text
+from app import models
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Relative importance of matches in each field
+FIELD_WEIGHTS = {"title": 10.0, "description": 5.0, "body": 1.0}
+
+# How much PDF text to index per story
+MAX_PDF_PAGES = 10
+MAX_BODY_CHARS = 50000
+
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'C')"
+)
+
+_backend_by_engine = {}
+_backend_lock = threading.Lock()
+
+
+def tokenize(value: str) -> list:
+    return TOKEN_PATTERN.findall((value or "").lower())
+
+
+def extract_pdf_text(pdf_path: str, max_pages: int = MAX_PDF_PAGES) -> str:
+    """Text of the first few pages of a PDF ('' if it can't be read)"""
+    try:
+        from PyPDF2 import PdfReader
+        # An open file, not a path: PdfReader would read the whole PDF into memory
+        with open(pdf_path, "rb") as f:
+            reader = PdfReader(f)
+            parts = []
+            for page in reader.pages[:max_pages]:
+                parts.append(page.extract_text() or "")
+        return "\n".join(parts)[:MAX_BODY_CHARS]
+    except Exception:
+        return ""
+
+
+# ==================== Backends ====================
+
+class FTS5Backend:
+    """SQLite FTS5 table whose rowid is the story id"""
+    
+    name = "fts5"
+    
+    def setup(self, conn):
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'story_search'"
+        )).first()
+        if exists:
+            return
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE story_search USING fts5("
+            "title, description, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        # Persistent ranking function, so ORDER BY rank is served by FTS5 itself
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS.values())
+        conn.execute(text(
+            f"INSERT INTO story_search (story_search, rank) VALUES ('rank', 'bm25({weights})')"
+        ))
+        # Upgrading an existing database: pick up already-indexed documents
+        conn.execute(text(
+            "INSERT INTO story_search (rowid, title, description, body) "
+            "SELECT story_id, title, description, body FROM story_search_documents"
+        ))
+    
+    def upsert(self, db, document):
+        db.execute(text("DELETE FROM story_search WHERE rowid = :id"), {"id": document.story_id})
+        db.execute(
+            text("INSERT INTO story_search (rowid, title, description, body) "
+                 "VALUES (:id, :title, :description, :body)"),
+            {"id": document.story_id, "title": document.title,
+             "description": document.description, "body": document.body}
+        )
+    
+    def remove(self, db, story_id):
+        db.execute(text("DELETE FROM story_search WHERE rowid = :id"), {"id": story_id})
+    
+    def clear(self, db):
+        db.execute(text("DELETE FROM story_search"))
+    
+    def search(self, db, terms, filters, limit, offset):
+        match = " ".join(f'"{term}"*' for term in terms)
+        where, params = _filter_sql(filters)
+        rows = db.execute(
+            text(
+                "SELECT story_search.rowid FROM story_search "
+                "JOIN stories ON stories.id = story_search.rowid "
+                f"WHERE story_search MATCH :match{where} "
+                "ORDER BY rank "
+                "LIMIT :limit OFFSET :offset"
+            ),
+            {"match": match, "limit": limit, "offset": offset, **params}
+        )
+        return [row[0] for row in rows]
+
+
+class PostgresBackend:
+    """tsvector over the documents table, served by a GIN expression index"""
+    
+    name = "postgres"
+    
+    def setup(self, conn):
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_story_search_documents_tsv "
+            f"ON story_search_documents USING gin (({PG_DOCUMENT}))"
+        ))
+    
+    def upsert(self, db, document):
+        pass  # The expression index follows the documents table
+    
+    def remove(self, db, story_id):
+        pass
+    
+    def clear(self, db):
+        pass
+    
+    def search(self, db, terms, filters, limit, offset):
+        query = " & ".join(f"{term}:*" for term in terms)
+        where, params = _filter_sql(filters)
+        rows = db.execute(
+            text(
+                "SELECT d.story_id FROM story_search_documents d "
+                "JOIN stories ON stories.id = d.story_id "
+                f"WHERE ({PG_DOCUMENT}) @@ to_tsquery('simple', :query){where} "
+                f"ORDER BY ts_rank(({PG_DOCUMENT}), to_tsquery('simple', :query)) DESC, d.story_id DESC "
+                "LIMIT :limit OFFSET :offset"
+            ),
+            {"query": query, "limit": limit, "offset": offset, **params}
+        )
+        return [row[0] for row in rows]
+
+
+class InMemoryBackend:
+    """
+    Pure-Python inverted index, rebuilt from the documents table whenever
+    another process has changed it.
+    """
+    
+    name = "memory"
+    check_interval = 5.0
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)  # token -> {story_id: weighted tf}
+        self._lengths = {}  # story_id -> weighted token count
+        self._signature = None
+        self._checked_at = 0.0
+    
+    def setup(self, conn):
+        pass
+    
+    def upsert(self, db, document):
+        with self._lock:
+            self._remove(document.story_id)
+            self._add(document)
+    
+    def remove(self, db, story_id):
+        with self._lock:
+            self._remove(story_id)
+    
+    def clear(self, db):
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._signature = None
+    
+    def search(self, db, terms, filters, limit, offset):
+        self._refresh(db)
+        with self._lock:
+            scores = None
+            total_docs = max(len(self._lengths), 1)
+            for term in terms:
+                # Prefix match: every indexed token starting with the term
+                matches = defaultdict(float)
+                for token, postings in self._postings.items():
+                    if token.startswith(term):
+                        idf = math.log(1 + total_docs / len(postings))
+                        for story_id, tf in postings.items():
+                            matches[story_id] += idf * tf / (1 + self._lengths[story_id] ** 0.5)
+                if scores is None:
+                    scores = dict(matches)
+                else:
+                    scores = {sid: s + matches[sid] for sid, s in scores.items() if sid in matches}
+            ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], -item[0]))
+        
+        ids = [story_id for story_id, _ in ranked]
+        if filters and ids:
+            query = db.query(models.Story.id).filter(models.Story.id.in_(ids))
+            for column, value in filters.items():
+                query = query.filter(getattr(models.Story, column) == value)
+            allowed = {row[0] for row in query}
+            ids = [story_id for story_id in ids if story_id in allowed]
+        return ids[offset:offset + limit]
+    
+    def _add(self, document):
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(document, field)):
+                postings = self._postings[token]
+                postings[document.story_id] = postings.get(document.story_id, 0.0) + weight
+                length += weight
+        self._lengths[document.story_id] = length
+    
+    def _remove(self, story_id):
+        if self._lengths.pop(story_id, None) is None:
+            return
+        for token in [t for t, postings in self._postings.items() if story_id in postings]:
+            del self._postings[token][story_id]
+            if not self._postings[token]:
+                del self._postings[token]
+    
+    def _refresh(self, db):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        signature = tuple(db.query(
+            func.count(models.StorySearchDocument.story_id),
+            func.max(models.StorySearchDocument.updated_at)
+        ).one())
+        if signature == self._signature:
+            return
+        documents = db.query(models.StorySearchDocument).all()
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            for document in documents:
+                self._add(document)
+            self._signature = signature
+
+
+def _filter_sql(filters):
+    where, params = "", {}
+    for column, value in (filters or {}).items():
+        where += f" AND stories.{column} = :{column}"
+        params[column] = value
+    return where, params
+
+
+def get_backend(db):
+    """Pick (and set up, once per engine) the best backend for this database"""
+    engine = db.get_bind()
+    backend = _backend_by_engine.get(engine)
+    if backend:
+        return backend
+    
+    with _backend_lock:
+        backend = _backend_by_engine.get(engine)
+        if backend:
+            return backend
+        
+        # Set up on the session's own connection: scripts often get here
+        # mid-transaction, and a second connection would block on SQLite
+        models.StorySearchDocument.__table__.create(db.connection(), checkfirst=True)
+        candidates = []
+        if engine.dialect.name == "sqlite":
+            candidates.append(FTS5Backend())
+        elif engine.dialect.name == "postgresql":
+            candidates.append(PostgresBackend())
+        candidates.append(InMemoryBackend())
+        
+        for candidate in candidates:
+            try:
+                with db.begin_nested():
+                    candidate.setup(db.connection())
+                backend = candidate
+                break
+            except Exception:
+                continue  # e.g. SQLite built without FTS5
+        
+        _backend_by_engine[engine] = backend
+        return backend
+
+
+# ==================== Public API ====================
+
+def index_story(db, story, body: str = None):
+    """
+    Add or refresh a story in the search index, in the caller's transaction.
+    
+    body is the story's full text (generated content or extracted PDF text);
+    when omitted, previously indexed text is kept.
+    """
+    backend = get_backend(db)
+    if story.id is None:
+        db.flush()
+    
+    document = db.get(models.StorySearchDocument, story.id)
+    if document is None:
+        document = models.StorySearchDocument(story_id=story.id, body="")
+        db.add(document)
+    document.title = story.title
+    document.description = story.description
+    if body is not None:
+        document.body = body[:MAX_BODY_CHARS]
+    document.updated_at = datetime.utcnow()
+    db.flush()
+    
+    backend.upsert(db, document)
+
+
+def remove_story(db, story_id: int):
+    """Drop a story from the search index, in the caller's transaction"""
+    backend = get_backend(db)
+    db.query(models.StorySearchDocument)\
+        .filter(models.StorySearchDocument.story_id == story_id)\
+        .delete(synchronize_session=False)
+    backend.remove(db, story_id)
+
+
+def search_stories(
+    db,
+    query: str,
+    theme: str = None,
+    age_group: str = None,
+    limit: int = 20,
+    offset: int = 0
+) -> list:
+    """
+    Ranked story ids matching every word of query (each as a prefix),
+    optionally restricted to a theme and/or age group.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    filters = {}
+    if theme:
+        filters["theme"] = theme
+    if age_group:
+        filters["age_group"] = age_group
+    return get_backend(db).search(db, terms, filters, limit, offset)
+
+
+def rebuild_search_index(db, with_pdf_text: bool = True) -> int:
+    """Re-index every story from scratch; returns how many were indexed"""
+    backend = get_backend(db)
+    db.query(models.StorySearchDocument).delete(synchronize_session=False)
+    backend.clear(db)
+    count = 0
+    for story in db.query(models.Story).order_by(models.Story.id):
+        body = ""
+        if with_pdf_text and story.pdf_url and not story.pdf_url.startswith("http"):
+            body = extract_pdf_text(story.pdf_url)
+        index_story(db, story, body)
+        count += 1
+    return count
@@ -0,0 +1,171 @@
+"""
+Per-page story text for the reader.
+
+Every story's text is stored page by page at ingest (story_pages), with
+its illustration notes (the "[...]" lines) split out:
+
+- generated stories: the pages parse_story_pages finds in the content
+- imported PDFs: the text extracted from each PDF page, unless there's
+  next to none (picture books and scans) or the book is too long to be
+  worth parsing page by page; those are only read as PDFs
+
+GET /stories/{id}/pages serves a few pages at a time from here, so the
+reader can show page 1 without downloading the whole PDF.
+"""
+from datetime import datetime
+from sqlalchemy import func
+from app import models
+from app.services.pdf_generator import PAGE_MARKER, parse_story_pages
+from app.services.search import index_story, MAX_PDF_PAGES, MAX_BODY_CHARS
+
+# Imported PDFs with more pages than this aren't stored page by page
+MAX_STORED_PAGES = 200
+
+# Less text than this per page, on average, is a picture book or a scan
+MIN_CHARS_PER_PAGE = 10
+
+# Stories whose PDFs rebuild_story_pages reads at once
+REBUILD_BATCH = 50
+
+
+def is_illustration(line: str) -> bool:
+    return line.startswith("[") and line.endswith("]")
+
+
+def split_illustrations(page: str):
+    """(text without illustration notes, [notes without their brackets])"""
+    lines, illustrations = [], []
+    for line in page.split("\n"):
+        stripped = line.strip()
+        if is_illustration(stripped):
+            illustrations.append(stripped[1:-1].strip())
+        else:
+            lines.append(line.rstrip())
+    text = "\n".join(lines).strip()
+    # Dropping a note can leave runs of blank lines behind
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text, illustrations
+
+
+def pages_to_extract(page_count: int) -> int:
+    """
+    How many pages of an imported PDF to extract the text of: one over
+    MAX_STORED_PAGES, to tell a long book, or only the MAX_PDF_PAGES
+    indexed for search when page_count already says it's longer.
+    """
+    return MAX_PDF_PAGES if (page_count or 0) > MAX_STORED_PAGES else MAX_STORED_PAGES + 1
+
+
+def readable_pages(pages: list, page_count: int = None) -> list:
+    """
+    A PDF's extracted pages, or [] if they're no use to the reader: the
+    pages endpoint then answers 404 and the reader shows the PDF instead
+    of blank pages. page_count is the whole book's, when known.
+    """
+    if len(pages) > MAX_STORED_PAGES or (page_count or 0) > MAX_STORED_PAGES:
+        return []
+    chars = sum(len("".join(page.split())) for page in pages)
+    return pages if chars >= MIN_CHARS_PER_PAGE * len(pages) else []
+
+
+def store_pages(db, story_id: int, pages: list):
+    """Replace a story's stored pages, in the caller's transaction"""
+    remove_pages(db, story_id)
+    now = datetime.utcnow()
+    rows = []
+    for number, page in enumerate(pages, 1):
+        text, illustrations = split_illustrations(page)
+        rows.append({
+            "story_id": story_id,
+            "number": number,
+            "text": text,
+            "illustrations": illustrations,
+            "updated_at": now,
+        })
+    if rows:
+        db.bulk_insert_mappings(models.StoryPage, rows)
+
+
+def store_generated_pages(db, story, content: str):
+    """Pages of a generated story's text"""
+    if story.id is None:
+        db.flush()
+    store_pages(db, story.id, parse_story_pages(content))
+
+
+def index_pdf_story(db, story, pages: list):
+    """
+    Store an imported PDF's pages (if readable_pages keeps them) and index
+    its text for search (the first MAX_PDF_PAGES pages, as extract_pdf_text
+    would). pages is the text of its first pages_to_extract pages, as
+    pdf_metadata.extract_many read it: the PDF isn't opened here.
+    """
+    index_story(db, story, "\n".join(pages[:MAX_PDF_PAGES])[:MAX_BODY_CHARS])
+    store_pages(db, story.id, readable_pages(pages, story.page_count))
+
+
+def remove_pages(db, story_id: int):
+    """Drop a story's stored pages, in the caller's transaction"""
+    db.query(models.StoryPage)\
+        .filter(models.StoryPage.story_id == story_id)\
+        .delete(synchronize_session=False)
+
+
+def get_pages(db, story_id: int, first: int, last: int) -> list:
+    """Stored pages first..last (inclusive) of a story"""
+    return db.query(models.StoryPage)\
+        .filter(
+            models.StoryPage.story_id == story_id,
+            models.StoryPage.number >= first,
+            models.StoryPage.number <= last
+        )\
+        .order_by(models.StoryPage.number)\
+        .all()
+
+
+def page_content(page) -> str:
+    """A stored page as story text again, its illustration notes back in brackets ahead of the text"""
+    return "\n".join([f"[{note}]" for note in page.illustrations] + [page.text]).strip()
+
+
+def count_pages(db, story_id: int) -> int:
+    return db.query(func.count(models.StoryPage.number))\
+        .filter(models.StoryPage.story_id == story_id)\
+        .scalar()
+
+
+def rebuild_story_pages(db, only_missing: bool = True) -> int:
+    """
+    Store pages for existing stories (from their indexed text for generated
+    ones, their local PDF otherwise); returns how many stories got pages.
+    """
+    with_pages = {
+        row[0] for row in db.query(models.StoryPage.story_id).distinct()
+    } if only_missing else set()
+    count = 0
+    pdf_stories = []
+    for story in db.query(models.Story).order_by(models.Story.id):
+        if story.id in with_pages:
+            continue
+        document = db.get(models.StorySearchDocument, story.id)
+        body = document.body if document else None
+        if body and PAGE_MARKER.search(body):
+            pages = parse_story_pages(body)  # Generated: the indexed text is the story
+            if pages:
+                store_pages(db, story.id, pages)
+                count += 1
+        elif story.pdf_url and not story.pdf_url.startswith("http"):
+            pdf_stories.append(story)
+    
+    # Local PDFs are read in metadata worker processes, a batch at a time
+    from app.services.pdf_metadata import extract_many  # it imports this module
+    for i in range(0, len(pdf_stories), REBUILD_BATCH):
+        batch = pdf_stories[i:i + REBUILD_BATCH]
+        metadata = extract_many({story.pdf_url for story in batch}, with_pages=True)
+        for story in batch:
+            pages = readable_pages(metadata[story.pdf_url]["pages"], story.page_count)
+            if pages:
+                store_pages(db, story.id, pages)
+                count += 1
+    return count
@@ -0,0 +1,394 @@
+"""
+Story-generation providers.
+
+A provider turns a prompt into story text, either all at once (generate)
+or in chunks as it's produced (stream). Each provider keeps one long-lived
+client, and is wrapped in a ResilientProvider that adds:
+
+- a concurrency limit (callers beyond it fail fast with ProviderBusy)
+- a timeout per call, and per chunk when streaming
+- retries with exponential backoff and jitter for transient errors
+- a circuit breaker: after enough consecutive failures, calls fail fast
+  with ProviderUnavailable until a cool-down has passed and a trial call
+  succeeds
+
+Providers:
+- gemini: Google Gemini through google-generativeai
+- stub: deterministic local text with configurable latency, for offline
+  development and load tests
+"""
+import hashlib
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Story generation failed"""
+    
+    retryable = False
+
+
+class ProviderTimeout(ProviderError):
+    retryable = True
+
+
+class ProviderBusy(ProviderError):
+    """Every concurrency slot is taken"""
+
+
+class ProviderUnavailable(ProviderError):
+    """The circuit breaker is open: the upstream has been failing"""
+
+
+# ==================== Providers ====================
+
+class GeminiProvider:
+    """Google Gemini, with one configured model reused for every call"""
+    
+    name = "gemini"
+    
+    def __init__(self, api_key: str, model_name: str = "gemini-pro"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+    
+    def generate(self, prompt: str, page_count: int) -> str:
+        return self.model.generate_content(prompt).text
+    
+    def stream(self, prompt: str, page_count: int):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+    
+    def is_retryable(self, error: Exception) -> bool:
+        from google.api_core import exceptions
+        return isinstance(error, (
+            exceptions.ServiceUnavailable,
+            exceptions.TooManyRequests,
+            exceptions.ResourceExhausted,
+            exceptions.DeadlineExceeded,
+            exceptions.InternalServerError,
+            exceptions.BadGateway,
+            exceptions.GatewayTimeout,
+            ConnectionError,
+        ))
+
+
+class StubProvider:
+    """
+    Deterministic offline provider: the same prompt always gives the same
+    story. Waits latency seconds before the first page and page_seconds
+    between pages, like a real model would.
+    """
+    
+    name = "stub"
+    
+    SENTENCES = [
+        "The morning sun peeked over the hills and painted everything gold.",
+        "A small voice whispered, \"Are you ready for an adventure?\"",
+        "They packed a snack, a map and a very brave heart.",
+        "The path twisted through tall grass that tickled their knees.",
+        "[Illustration: friends walking together down a winding path]",
+        "Something rustled in the bushes, and everyone held their breath.",
+        "It was only a tiny rabbit, who wanted to come along too.",
+        "\"Together we can do anything,\" they said with a smile.",
+        "The stars came out one by one, like little night lights.",
+        "[Illustration: a cozy campfire under a sky full of stars]",
+        "They learned that kindness makes every journey brighter.",
+        "At last it was time to go home, full of happy memories.",
+    ]
+    
+    def __init__(self, latency: float = 1.0, page_seconds: float = 0.2):
+        self.latency = latency
+        self.page_seconds = page_seconds
+    
+    def generate(self, prompt: str, page_count: int) -> str:
+        return "".join(self.stream(prompt, page_count))
+    
+    def stream(self, prompt: str, page_count: int):
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        time.sleep(self.latency)
+        for number in range(1, page_count + 1):
+            if number > 1:
+                time.sleep(self.page_seconds)
+            lines = rng.sample(self.SENTENCES, 4)
+            yield f"--- Page {number} ---\n" + "\n\n".join(lines) + "\n\n"
+        yield "--- The End ---\n"
+    
+    def is_retryable(self, error: Exception) -> bool:
+        return False
+
+
+# ==================== Resilience ====================
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `reset_after`"""
+    
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+    
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True  # let exactly one call probe the upstream
+                return True
+            return False
+    
+    def release_trial(self):
+        """The trial call never reached the upstream"""
+        with self._lock:
+            self.trial_running = False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class ResilientProvider:
+    """Concurrency limit, timeouts, retries and a circuit breaker around a provider"""
+    
+    def __init__(
+        self,
+        provider,
+        concurrency: int = 4,
+        timeout: float = 60.0,
+        retries: int = 2,
+        backoff: float = 1.0,
+        breaker: CircuitBreaker = None
+    ):
+        self.provider = provider
+        self.name = provider.name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        
+        self._slots = threading.BoundedSemaphore(concurrency)
+        # Calls run here so a hung upstream can be timed out; a timed-out call
+        # keeps its slot until it actually returns
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"provider-{self.name}")
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.rejected = 0
+    
+    def generate(self, prompt: str, page_count: int, wait: float = 0.0) -> str:
+        """
+        The provider's whole answer. wait is how long to queue for a free
+        concurrency slot before failing with ProviderBusy.
+        """
+        return self._with_retries(
+            lambda: self._call(self.provider.generate, prompt, page_count, wait=wait)
+        )
+    
+    def stream(self, prompt: str, page_count: int):
+        """
+        Yield chunks as the provider produces them. Failures before the
+        first chunk are retried; once text has been handed out they aren't.
+        """
+        chunks = self._with_retries(lambda: self._open_stream(prompt, page_count))
+        failed = False
+        try:
+            yield from chunks
+        except ProviderError:
+            failed = True
+            raise
+        finally:
+            if not failed:
+                self.breaker.record_success()
+    
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "provider": self.name,
+                "circuit": self.breaker.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "retried": self.retried,
+                "rejected": self.rejected,
+            }
+    
+    def _with_retries(self, attempt):
+        for number in range(self.retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise ProviderUnavailable(f"{self.name} is failing; not calling it for now")
+            try:
+                result = attempt()
+            except ProviderBusy:
+                self._count("rejected")
+                self.breaker.release_trial()
+                raise
+            except ProviderError as e:
+                self._count("failures")
+                self.breaker.record_failure()
+                if not e.retryable or number == self.retries:
+                    raise
+                self._count("retried")
+                delay = self.backoff * (2 ** number)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+            if not isinstance(result, _Stream):
+                self.breaker.record_success()
+            return result
+    
+    def _call(self, fn, *args, wait: float = 0.0):
+        """Run fn in a concurrency slot with a timeout, mapping errors to ProviderError"""
+        if not self._slots.acquire(timeout=wait):
+            raise ProviderBusy(f"{self.name} is at its concurrency limit")
+        self._count("calls")
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return self._result(future)
+    
+    def _open_stream(self, prompt, page_count):
+        if not self._slots.acquire(timeout=0):
+            raise ProviderBusy(f"{self.name} is at its concurrency limit")
+        self._count("calls")
+        stream = _Stream(self, self.provider.stream(prompt, page_count))
+        try:
+            stream.first = stream.next_chunk()  # Errors before any text can be retried
+        except BaseException:
+            stream.close()
+            raise
+        return stream
+    
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise ProviderTimeout(f"{self.name} didn't answer within {self.timeout:g}s")
+        except ProviderError:
+            raise
+        except Exception as e:
+            error = ProviderError(f"{self.name}: {e.__class__.__name__}: {e}")
+            error.retryable = self.provider.is_retryable(e)
+            raise error from e
+    
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+class _Stream:
+    """A provider stream holding a concurrency slot, read chunk by chunk under the timeout"""
+    
+    _DONE = object()
+    
+    def __init__(self, owner: ResilientProvider, iterator):
+        self.owner = owner
+        self.iterator = iterator
+        self.first = None
+        self.closed = False
+        self.pending = None  # the latest next() call on the provider's iterator
+    
+    def next_chunk(self):
+        self.pending = self.owner._executor.submit(next, self.iterator, self._DONE)
+        return self.owner._result(self.pending)
+    
+    def __iter__(self):
+        try:
+            chunk = self.first
+            while chunk is not self._DONE:
+                yield chunk
+                chunk = self.next_chunk()
+        except ProviderError:
+            self.owner._count("failures")
+            self.owner.breaker.record_failure()
+            raise
+        finally:
+            self.close()
+    
+    def close(self):
+        """Give the slot back, once no next() call is still running (as after a timeout)"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.pending is not None and not self.pending.done():
+            self.pending.add_done_callback(lambda _: self._release())
+        else:
+            self._release()
+    
+    def _release(self):
+        close = getattr(self.iterator, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+        self.owner._slots.release()
+
+
+# ==================== Configured provider ====================
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def build_provider(name: str = None) -> ResilientProvider:
+    """The configured provider, wrapped with the configured limits"""
+    name = name or settings.story_provider or ("gemini" if settings.gemini_api_key else "stub")
+    if name == "gemini":
+        provider = GeminiProvider(settings.gemini_api_key, settings.gemini_model)
+    elif name == "stub":
+        provider = StubProvider(
+            latency=settings.stub_provider_latency_seconds,
+            page_seconds=settings.stub_provider_page_seconds
+        )
+    else:
+        raise ValueError(f"Unknown story provider: {name}")
+    
+    return ResilientProvider(
+        provider,
+        concurrency=settings.story_provider_concurrency,
+        timeout=settings.story_provider_timeout_seconds,
+        retries=settings.story_provider_retries,
+        backoff=settings.story_provider_backoff_seconds,
+        breaker=CircuitBreaker(
+            threshold=settings.story_provider_breaker_failures,
+            reset_after=settings.story_provider_breaker_reset_seconds
+        )
+    )
+
+
+def get_provider() -> ResilientProvider:
+    """Process-wide provider, created on first use"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+    return _provider
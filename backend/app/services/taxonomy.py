@@ -0,0 +1,144 @@
+"""
+Story themes and age groups, and keyword-based classification into them.
+
+This is the one place the catalog's themes live: the /stories/themes
+endpoint, the PDF importers and the admin scripts all read from here.
+
+Every keyword of a taxonomy is compiled into a single alternation regex,
+so classifying a text is one pass over it regardless of how many keywords
+there are. Keywords match at the start of a word and may carry a suffix
+("friend" matches "friends" and "friendship", but "cat" doesn't match
+"education"). Each hit scores its keyword's weight for every category it
+belongs to; the highest score wins, with ties going to the category listed
+first.
+"""
+import re
+from bisect import bisect_right
+
+THEMES = [
+    {"id": "adventure", "name": "Adventure", "emoji": "🏔️"},
+    {"id": "fantasy", "name": "Fantasy & Magic", "emoji": "🧙‍♂️"},
+    {"id": "animals", "name": "Animals", "emoji": "🐾"},
+    {"id": "friendship", "name": "Friendship", "emoji": "🤝"},
+    {"id": "nature", "name": "Nature & Environment", "emoji": "🌳"},
+    {"id": "space", "name": "Space & Science", "emoji": "🚀"},
+    {"id": "fairy-tales", "name": "Fairy Tales", "emoji": "👸"},
+    {"id": "bedtime", "name": "Bedtime Stories", "emoji": "🌙"},
+]
+
+AGE_GROUPS = [
+    {"id": "3-5", "name": "Ages 3-5"},
+    {"id": "6-8", "name": "Ages 6-8"},
+    {"id": "9-12", "name": "Ages 9-12"},
+]
+
+THEME_IDS = [theme["id"] for theme in THEMES]
+AGE_GROUP_IDS = [age_group["id"] for age_group in AGE_GROUPS]
+
+DEFAULT_THEME = "adventure"
+DEFAULT_AGE_GROUP = "6-8"
+
+# Keywords per theme, in priority order (first listed wins ties)
+THEME_KEYWORDS = {
+    "adventure": ["adventure", "journey", "quest", "explore", "brave", "treasure", "pirate"],
+    "fantasy": ["magic", "wizard", "dragon", "fairy", "enchant", "spell", "pencil", "wand", "potion"],
+    "animals": ["animal", "lion", "bear", "cat", "dog", "rabbit", "bunny", "tiger", "elephant",
+                "roar", "paw", "leo", "owl", "fox", "wolf"],
+    "friendship": ["friend", "together", "share", "help", "kind", "team"],
+    "nature": ["garden", "tree", "forest", "flower", "nature", "plant", "butterfly", "bee"],
+    "space": ["space", "star", "moon", "rocket", "planet", "astronaut", "alien", "galaxy"],
+    "fairy-tales": ["princess", "prince", "castle", "kingdom", "queen", "king", "knight"],
+    "bedtime": ["sleep", "dream", "night", "bed", "moon", "sleepy", "goodnight", "cloud", "lullaby"],
+}
+
+# Age groups with tell-tale words; anything else is DEFAULT_AGE_GROUP
+AGE_KEYWORDS = {
+    "3-5": ["little", "baby", "tiny", "small", "first"],
+    "9-12": ["adventure", "mystery", "secret", "quest", "journey"],
+}
+
+
+class Taxonomy:
+    """Keyword classifier over an ordered set of categories"""
+    
+    def __init__(self, keywords: dict, default: str, whole_words: bool = True):
+        """
+        keywords maps each category to its keywords, either plain strings
+        (weight 1) or (keyword, weight) pairs. With whole_words off,
+        keywords also match inside words, like a plain substring test.
+        """
+        self.categories = list(keywords)
+        self.default = default
+        self._rank = {category: i for i, category in enumerate(self.categories)}
+        
+        # keyword -> [(category, weight), ...]; a keyword may sit in several categories
+        self._targets = {}
+        for category, entries in keywords.items():
+            for entry in entries:
+                keyword, weight = (entry, 1.0) if isinstance(entry, str) else entry
+                self._targets.setdefault(keyword.lower(), []).append((category, weight))
+        
+        # Longest first, so "sleepy" is preferred over "sleep" at the same position
+        alternation = "|".join(
+            re.escape(keyword) for keyword in sorted(self._targets, key=lambda k: (-len(k), k))
+        )
+        prefix = r"(?<!\w)" if whole_words else ""
+        self._pattern = re.compile(f"{prefix}({alternation})", re.IGNORECASE)
+    
+    def scores(self, text: str) -> dict:
+        """Score per matching category"""
+        scores = {}
+        for match in self._pattern.finditer(text or ""):
+            self._add(scores, match.group(1))
+        return scores
+    
+    def classify(self, text: str) -> str:
+        return self._best(self.scores(text))
+    
+    def classify_many(self, texts) -> list:
+        """
+        Classify many texts in one regex pass over all of them.
+        
+        Returns one category per text, in order.
+        """
+        texts = [text or "" for text in texts]
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        
+        # Texts are joined with a newline, which no keyword can span
+        per_text = [{} for _ in texts]
+        for match in self._pattern.finditer("\n".join(texts)):
+            index = bisect_right(starts, match.start()) - 1
+            self._add(per_text[index], match.group(1))
+        return [self._best(scores) for scores in per_text]
+    
+    def _add(self, scores: dict, keyword: str):
+        for category, weight in self._targets[keyword.lower()]:
+            scores[category] = scores.get(category, 0.0) + weight
+    
+    def _best(self, scores: dict) -> str:
+        if not scores:
+            return self.default
+        return min(scores, key=lambda category: (-scores[category], self._rank[category]))
+
+
+themes = Taxonomy(THEME_KEYWORDS, DEFAULT_THEME)
+age_groups = Taxonomy(AGE_KEYWORDS, DEFAULT_AGE_GROUP)
+
+
+def detect_theme(text: str) -> str:
+    """Best-matching theme for a title or text"""
+    return themes.classify(text)
+
+
+def detect_age_group(text: str) -> str:
+    """Best-matching age group for a title or text"""
+    return age_groups.classify(text)
+
+
+def classify_titles(titles) -> list:
+    """(theme, age_group) for each title, in order"""
+    titles = list(titles)
+    return list(zip(themes.classify_many(titles), age_groups.classify_many(titles)))
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark for story PDF rendering.
+
+Lays out synthetic 10-, 50- and 200-page stories in memory (no file I/O,
+no process pool) and reports the time per page, plus how fast
+sanitize_text gets through typical story lines.
+
+Usage:
+    python benchmark_pdf.py                  # 10, 50 and 200 pages
+    python benchmark_pdf.py --pages 20 100   # Other story lengths
+    python benchmark_pdf.py --repeat 5       # Best of 5 runs per length
+"""
+import time
+import argparse
+from app.services.pdf_generator import build_story_pdf, sanitize_text
+
+PARAGRAPHS = [
+    "The morning sun peeked over the hills and painted everything gold.",
+    "“Are you ready for an adventure?” whispered a small voice — it was Pip the rabbit.",
+    "[Illustration: friends walking together down a winding path]",
+    "They packed a snack, a map and a very brave heart… then off they went!",
+    "Something rustled in the bushes, and everyone held their breath. \U0001F430",
+    "It was only a tiny rabbit, who wanted to come along too.",
+]
+
+
+def build_story(page_count: int) -> str:
+    pages = []
+    for number in range(1, page_count + 1):
+        body = "\n\n".join(PARAGRAPHS[(number + i) % len(PARAGRAPHS)] for i in range(5))
+        pages.append(f"--- Page {number} ---\n{body}\n")
+    return "\n".join(pages) + "\n--- The End ---\n"
+
+
+def time_render(page_count: int, repeat: int) -> float:
+    """Best wall-clock seconds to lay out and serialize the story"""
+    content = build_story(page_count)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build_story_pdf(f"Benchmark Story — {page_count} pages", content).output()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_sanitize(lines: int = 100_000) -> float:
+    """Microseconds per sanitize_text call over a mix of ASCII and Unicode lines"""
+    sample = [f"{PARAGRAPHS[i % len(PARAGRAPHS)]} ({i})" for i in range(lines)]
+    started = time.perf_counter()
+    for line in sample:
+        sanitize_text(line)
+    return (time.perf_counter() - started) / lines * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark story PDF rendering")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200], help="Story lengths to render")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per length (the best one is reported)")
+    args = parser.parse_args()
+    
+    print(f"{'pages':>6} {'total ms':>10} {'ms/page':>9}")
+    for page_count in args.pages:
+        seconds = time_render(page_count, args.repeat)
+        print(f"{page_count:>6} {seconds * 1000:>10.1f} {seconds * 1000 / page_count:>9.2f}")
+    
+    print(f"\nsanitize_text: {time_sanitize():.2f} us/line")
+
+
+if __name__ == "__main__":
+    main()
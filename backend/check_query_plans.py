@@ -0,0 +1,257 @@
+"""
+Query-plan regression check for the hot API queries.
+
+Runs the story/user route handlers against a scratch database, captures
+every SQL statement they issue, and EXPLAINs each one. Fails (exit code 1)
+if any of them needs a full table scan or an unindexed sort.
+
+Usage:
+    python check_query_plans.py                         # Scratch SQLite database
+    python check_query_plans.py --database-url <url>    # Empty scratch Postgres database
+    python check_query_plans.py --create-indexes        # Add missing indexes to the configured database
+
+SQLite plans come from EXPLAIN QUERY PLAN. On Postgres the check runs with
+enable_seqscan off, so any Seq Scan left in the plan means no index can
+serve the query at all.
+"""
+import os
+import re
+import sys
+import json
+import tempfile
+import argparse
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, engine as app_engine
+from app import models, schemas
+from app.auth import authenticate_user, get_password_hash
+from app.routes import stories, users
+from app.services.response_cache import story_cache
+from app.services.read_counter import increment_stmt
+from app.services.search import index_story
+from app.services.story_pages import store_pages
+
+# Tables whose full scans we care about (story_facet_counts is read whole
+# on purpose: it holds one row per theme x age group)
+HOT_TABLES = {"stories", "ratings", "favorites", "users", "catalog_version", "generation_jobs", "story_pages"}
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+
+def seed(db):
+    """Minimal rows so every handler takes its normal path."""
+    user = models.User(
+        email="plans@storyland.com",
+        hashed_password=get_password_hash("plans"),
+        full_name="Plan Check"
+    )
+    db.add(user)
+    for i in range(3):
+        db.add(models.Story(
+            title=f"Plan Story {i}",
+            theme="adventure",
+            age_group="6-8",
+            is_featured=True,
+            pdf_url=f"storage/pdfs/plan_{i}.pdf"
+        ))
+    db.flush()
+    for story in db.query(models.Story):
+        index_story(db, story, "")
+        store_pages(db, story.id, ["Once upon a time", "[A castle]\nThe end"])
+    db.add(models.GenerationJob(
+        id="plan-job", user_id=user.id, title="Plan Job", age_group="6-8", theme="space", story_id=1
+    ))
+    db.commit()
+    return user
+
+
+def fake_request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+def get(handler, **params):
+    """Call a GET handler directly, as FastAPI would."""
+    return lambda db: handler(request=fake_request(), response=Response(), db=db, **params)
+
+
+def hot_queries(user):
+    """(name, callable(db)) for every request-path query we want indexed."""
+    list_params = dict(page=1, page_size=12, age_group=None, theme=None, featured_only=False, cursor=None)
+    first_page = stories.load_story_list
+    return [
+        ("list stories", get(stories.get_stories, **list_params)),
+        ("list by theme", get(stories.get_stories, **{**list_params, "theme": "adventure"})),
+        ("list by age group", get(stories.get_stories, **{**list_params, "age_group": "6-8"})),
+        ("list by theme and age", get(stories.get_stories, **{**list_params, "theme": "adventure", "age_group": "6-8"})),
+        ("list featured", get(stories.get_stories, **{**list_params, "featured_only": True})),
+        ("list by cursor", lambda db: get(
+            stories.get_stories,
+            **{**list_params, "page_size": 2, "theme": "adventure",
+               "cursor": first_page(db, 1, 2, None, "adventure", False, "").next_cursor}
+        )(db)),
+        ("featured", get(stories.get_featured_stories)),
+        ("facets", lambda db: stories.get_story_facets(db=db)),
+        ("search", lambda db: stories.search_stories(
+            q="plan sto", page=1, page_size=12, age_group=None, theme="adventure", db=db
+        )),
+        ("story detail", get(stories.get_story, story_id=1)),
+        ("story pages", get(stories.get_story_pages, story_id=1, from_=1, to=5)),
+        ("view pdf", lambda db: stories.view_story_pdf(story_id=1, request=fake_request(), db=db)),
+        ("rate story", lambda db: stories.rate_story(
+            story_id=1, rating=schemas.RatingCreate(story_id=1, rating=4), db=db, current_user=user
+        )),
+        ("re-rate story", lambda db: stories.rate_story(
+            story_id=1, rating=schemas.RatingCreate(story_id=1, rating=5), db=db, current_user=user
+        )),
+        ("story ratings", get(stories.get_story_ratings, story_id=1)),
+        ("generation job", lambda db: stories.get_generation_job(job_id="plan-job", db=db, current_user=user)),
+        ("toggle favorite", lambda db: stories.toggle_favorite(story_id=1, db=db, current_user=user)),
+        ("read count flush", lambda db: db.execute(increment_stmt, {"story_id": 1, "n": 1})),
+        ("login", lambda db: authenticate_user(db, user.email, "plans")),
+        ("register (email check)", lambda db: users.register(
+            schemas.UserCreate(email="new@storyland.com", password="x"), db
+        )),
+    ]
+
+
+def capture_statements(engine, fn):
+    """Run fn and return the (statement, parameters) it executed."""
+    captured = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    except HTTPException:
+        pass  # e.g. the PDF file itself doesn't exist; the queries already ran
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def explain_sqlite(conn, statement, parameters):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        match = SQLITE_FULL_SCAN.match(detail)
+        if match and match.group(1) in HOT_TABLES:
+            problems.append(f"full scan of {match.group(1)}")
+        if "TEMP B-TREE FOR ORDER BY" in detail:
+            problems.append("sort without index")
+    return [row[-1] for row in rows], problems
+
+
+def explain_postgres(conn, statement, parameters):
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, problems = [], []
+    
+    def walk(node, depth=0):
+        relation = node.get("Relation Name", "")
+        lines.append("  " * depth + f"{node['Node Type']} {relation}".strip())
+        if node["Node Type"] == "Seq Scan" and relation in HOT_TABLES:
+            problems.append(f"full scan of {relation}")
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+    
+    walk(plan[0]["Plan"])
+    return lines, problems
+
+
+def check_plans(database_url: str) -> bool:
+    engine = create_engine(database_url)
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        print(f"Unsupported database: {dialect}")
+        return False
+    
+    if "stories" in inspect(engine).get_table_names():
+        print("Refusing to run: the database already has tables. Use an empty scratch database.")
+        return False
+    
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    story_cache.enabled = False
+    explain = explain_sqlite if dialect == "sqlite" else explain_postgres
+    
+    print("\n" + "="*60)
+    print(f"   QUERY PLAN CHECK ({dialect})")
+    print("="*60 + "\n")
+    
+    failures = 0
+    db = Session()
+    try:
+        user = seed(db)
+        for name, query in hot_queries(user):
+            statements = capture_statements(engine, lambda: query(db))
+            db.commit()
+            
+            with engine.connect() as conn:
+                if dialect == "postgresql":
+                    conn.exec_driver_sql("SET enable_seqscan = off")
+                for statement, parameters in statements:
+                    if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                        continue
+                    plan, problems = explain(conn, statement, parameters)
+                    status = "FAIL" if problems else "ok"
+                    print(f"  [{status}] {name}: {' '.join(statement.split())[:90]}")
+                    for line in plan:
+                        print(f"         {line}")
+                    for problem in problems:
+                        print(f"         -> {problem}")
+                    failures += bool(problems)
+    finally:
+        db.close()
+        if dialect == "postgresql":
+            Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+    
+    print("\n" + "-"*60)
+    print(f"  {failures} statement(s) with full scans or unindexed sorts")
+    print("-"*60)
+    return failures == 0
+
+
+def create_missing_indexes():
+    """Create any model indexes an existing database doesn't have yet."""
+    existing_tables = set(inspect(app_engine).get_table_names())
+    Base.metadata.create_all(bind=app_engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for index in table.indexes:
+            try:
+                index.create(app_engine, checkfirst=True)
+                print(f"  {index.name}: ok")
+            except Exception as e:
+                # Usually duplicate (user_id, story_id) rows blocking a unique index
+                print(f"  {index.name}: FAILED ({e.__class__.__name__}: {str(e).splitlines()[0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check query plans of the hot API queries")
+    parser.add_argument("--database-url", help="Empty scratch database to run against (default: temporary SQLite)")
+    parser.add_argument("--create-indexes", action="store_true", help="Add missing indexes to the configured database")
+    args = parser.parse_args()
+    
+    if args.create_indexes:
+        create_missing_indexes()
+        return
+    
+    if args.database_url:
+        ok = check_plans(args.database_url)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = check_plans(f"sqlite:///{os.path.join(tmp, 'query_plans.db')}")
+    
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,111 +1,365 @@
 """
-Compress PDF files for web deployment.
+Compress the library's PDFs for web deployment.
 
-Your PDFs are too large (260-300MB each). This script will compress them.
+Scanned picture books can be hundreds of MB each. This rewrites every
+local story PDF with Ghostscript, in parallel (one file per worker
+process), trying quality presets from best to smallest and keeping the
+first result under the target size (or the smallest one if none fits).
+The compressed file goes into the blob store and the stories using the
+original are switched over to it in one commit; the original blob is
+then unused and removed by "manage_stories.py gc".
+
+A manifest (storage/compress_manifest.json) records what was done, keyed
+by content hash, so files that haven't changed since the last run are
+skipped without running Ghostscript again.
+
+Usage:
+    python compress_pdfs.py                     # Compress new/changed PDFs
+    python compress_pdfs.py --target-mb 5       # Target size per PDF (default: 10)
+    python compress_pdfs.py --presets ebook,screen
+    python compress_pdfs.py --workers 4         # Worker processes (default: one per CPU)
+    python compress_pdfs.py --force             # Ignore the manifest
 """
 
 import os
-import subprocess
+import sys
+import json
+import time
 import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.database import SessionLocal, engine, Base, ensure_columns
+from app.models import Story
+from app.services.blob_store import hash_file, put_file
+from app.services.pdf_linearize import linearize_pdf, is_linearized
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+ensure_columns()
+
+MANIFEST_PATH = os.path.join("storage", "compress_manifest.json")
+
+# Ghostscript -dPDFSETTINGS, best quality first
+PRESETS = ("printer", "ebook", "screen")
 
-INPUT_DIR = "storage/pdfs"
-OUTPUT_DIR = "storage/pdfs_compressed"
+GHOSTSCRIPT_NAMES = ("gs", "gswin64c", "gswin32c")
 
-def compress_with_ghostscript():
+PRESET_TIMEOUT = 600  # seconds for one Ghostscript run
+
+MB = 1024 * 1024
+
+
+def find_ghostscript():
+    """Path of the Ghostscript executable, or None"""
+    for name in GHOSTSCRIPT_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+# ==================== Manifest ====================
+
+def load_manifest() -> dict:
     """
-    Use Ghostscript to compress PDFs (if installed).
-    This is the best compression method.
+    {
+        "files": {path: {"size", "mtime_ns", "sha256"}},      # hash cache
+        "results": {source sha256: {"output", "preset", ...}},  # output None: no gain
+        "outputs": [sha256 of files this script wrote]
+    }
     """
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("files", {})
+    manifest.setdefault("results", {})
+    manifest.setdefault("outputs", [])
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    """Write the manifest atomically"""
+    directory = os.path.dirname(MANIFEST_PATH)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, MANIFEST_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def content_hash(manifest: dict, path: str) -> str:
+    """sha256 of a file, reused from the manifest while its size and mtime match"""
+    stat = os.stat(path)
+    cached = manifest["files"].get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["sha256"]
+    digest, _ = hash_file(path)
+    manifest["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    return digest
+
+
+# ==================== Compression (worker processes) ====================
+
+def run_ghostscript(gs: str, input_path: str, output_path: str, preset: str, timeout: float) -> bool:
+    result = subprocess.run([
+        gs,
+        '-sDEVICE=pdfwrite',
+        '-dCompatibilityLevel=1.4',
+        f'-dPDFSETTINGS=/{preset}',
+        '-dFastWebView=true',
+        '-dNOPAUSE',
+        '-dBATCH',
+        '-dQUIET',
+        f'-sOutputFile={output_path}',
+        input_path
+    ], capture_output=True, timeout=timeout)
+    return result.returncode == 0 and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+
+
+def compress_pdf(gs: str, input_path: str, work_dir: str, presets, target_bytes: int, timeout: float) -> dict:
+    """
+    Try each preset in order, stopping at the first output that is smaller
+    than the input and under target_bytes (else keeping the smallest);
+    returns the chosen output (None when no preset made the file smaller)
+    with its sizes and timing.
+    """
+    started = time.time()
+    input_size = os.path.getsize(input_path)
+    stem = os.path.join(work_dir, f"{os.getpid()}_{os.path.basename(input_path)}")
+    
+    outputs = []  # (size, preset, path)
+    for preset in presets:
+        output_path = f"{stem}.{preset}.pdf"
+        try:
+            ok = run_ghostscript(gs, input_path, output_path, preset, timeout)
+        except subprocess.TimeoutExpired:
+            ok = False
+        if not ok:
+            continue
+        size = os.path.getsize(output_path)
+        outputs.append((size, preset, output_path))
+        if size <= target_bytes and size < input_size:
+            break
     
-    for filename in os.listdir(INPUT_DIR):
-        if not filename.endswith('.pdf'):
+    best = None
+    if outputs:
+        fits = outputs[-1][0] <= target_bytes and outputs[-1][0] < input_size
+        best = outputs[-1] if fits else min(outputs)
+    for output in outputs:
+        if output is not best:
+            os.remove(output[2])
+    if best and best[0] >= input_size:
+        os.remove(best[2])
+        best = None
+    if best:
+        linearize_pdf(best[2])  # Ghostscript's own fast web view isn't always applied
+    
+    return {
+        "input_size": input_size,
+        "output": best[2] if best else None,
+        "output_size": os.path.getsize(best[2]) if best else input_size,
+        "preset": best[1] if best else None,
+        "tried": len(outputs),
+        "seconds": time.time() - started,
+    }
+
+
+# ==================== Library ====================
+
+def find_pdfs(db) -> dict:
+    """{path: [stories using it]} for the local story PDFs"""
+    paths = {}
+    for story in db.query(Story).filter(Story.pdf_url.isnot(None)):
+        if story.pdf_url.startswith("http") or not os.path.exists(story.pdf_url):
             continue
+        paths.setdefault(story.pdf_url, []).append(story)
+    return paths
+
+
+def swap_pdf(db, stories, new_path: str):
+    """Point every story using a PDF at its compressed copy, in one commit"""
+    linearized = is_linearized(new_path)
+    for story in stories:
+        story.pdf_url = new_path
+        story.pdf_linearized = linearized
+    db.commit()
+
+
+def compress_library(presets=PRESETS, target_mb: float = 10, workers: int = None, force: bool = False):
+    print("\n" + "="*50)
+    print("   COMPRESSING PDFs")
+    print("="*50 + "\n")
+    
+    gs = find_ghostscript()
+    if not gs:
+        show_instructions()
+        return False
+    
+    target_bytes = int(target_mb * MB)
+    manifest = load_manifest()
+    outputs = set(manifest["outputs"])
+    db = SessionLocal()
+    
+    try:
+        todo = {}  # source sha256 -> path
+        sources = {}  # path -> stories
+        reused = skipped = 0
+        library = find_pdfs(db)
+        for path, stories in library.items():
+            digest = content_hash(manifest, path)
+            result = manifest["results"].get(digest)
+            if digest in outputs or (result and not result["output"] and not force):
+                skipped += 1
+                continue
+            if result and result["output"] and os.path.exists(result["output"]) and not force:
+                # Compressed before (e.g. the stories were restored): just switch
+                swap_pdf(db, stories, result["output"])
+                print(f"  [REUSED] {path} -> {result['output']}")
+                reused += 1
+                continue
+            if digest in todo:
+                sources[todo[digest]].extend(stories)  # Same content under another path
+                continue
+            todo[digest] = path
+            sources[path] = stories
+        # Forget files the library no longer uses
+        manifest["files"] = {p: v for p, v in manifest["files"].items() if p in library}
+        save_manifest(manifest)
         
-        input_path = os.path.join(INPUT_DIR, filename)
-        output_path = os.path.join(OUTPUT_DIR, filename)
+        if not todo:
+            print(f"Nothing to do ({skipped} already compressed, {reused} reused)")
+            return True
         
-        input_size = os.path.getsize(input_path) / (1024 * 1024)
-        print(f"\nCompressing: {filename}")
-        print(f"  Original size: {input_size:.1f} MB")
+        print(f"Compressing {len(todo)} PDF(s) with {', '.join(presets)} (target {target_mb:g} MB)...\n")
+        started = time.time()
+        total_in = total_out = compressed = no_gain = failed = 0
         
-        # Try Ghostscript compression
-        try:
-            result = subprocess.run([
-                'gswin64c',  # or 'gs' on Linux/Mac
-                '-sDEVICE=pdfwrite',
-                '-dCompatibilityLevel=1.4',
-                '-dPDFSETTINGS=/ebook',  # Good quality for web
-                '-dNOPAUSE',
-                '-dBATCH',
-                '-dQUIET',
-                f'-sOutputFile={output_path}',
-                input_path
-            ], capture_output=True, timeout=300)
-            
-            if result.returncode == 0:
-                output_size = os.path.getsize(output_path) / (1024 * 1024)
-                reduction = (1 - output_size / input_size) * 100
-                print(f"  Compressed size: {output_size:.1f} MB ({reduction:.0f}% reduction)")
-            else:
-                print(f"  Ghostscript error: {result.stderr.decode()[:100]}")
+        os.makedirs("storage", exist_ok=True)
+        # Hidden, so importers and watch_storage.py don't take the outputs for new books
+        with tempfile.TemporaryDirectory(prefix=".compress_", dir="storage") as work_dir, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(compress_pdf, gs, path, work_dir, presets, target_bytes, PRESET_TIMEOUT): (digest, path)
+                for digest, path in todo.items()
+            }
+            for future in as_completed(futures):
+                digest, path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  [FAILED] {path}: {e}")
+                    continue
+                
+                input_mb = result["input_size"] / MB
+                throughput = input_mb / result["seconds"] if result["seconds"] else 0
+                total_in += result["input_size"]
+                
+                if result["output"]:
+                    new_path = put_file(result["output"], ".pdf")
+                    os.remove(result["output"])
+                    swap_pdf(db, sources[path], new_path)
+                    outputs.add(os.path.splitext(os.path.basename(new_path))[0])
+                    total_out += result["output_size"]
+                    compressed += 1
+                    print(
+                        f"  [OK] {path}\n"
+                        f"       {input_mb:.1f} MB -> {result['output_size'] / MB:.1f} MB "
+                        f"({result['preset']}) in {result['seconds']:.1f}s, {throughput:.1f} MB/s"
+                    )
+                elif result["tried"]:
+                    new_path = None
+                    total_out += result["input_size"]
+                    no_gain += 1
+                    print(f"  [NO GAIN] {path} ({input_mb:.1f} MB, {result['seconds']:.1f}s)")
+                else:
+                    total_out += result["input_size"]
+                    failed += 1
+                    print(f"  [FAILED] {path}: Ghostscript couldn't rewrite it")
+                    continue  # Nothing to remember: try again next run
                 
-        except FileNotFoundError:
-            print("  Ghostscript not found. Please install it or compress manually.")
-            print("  Download: https://ghostscript.com/releases/gsdnld.html")
-            return False
-        except Exception as e:
-            print(f"  Error: {e}")
-            return False
+                manifest["results"][digest] = {
+                    "source": path,
+                    "output": new_path,
+                    "preset": result["preset"],
+                    "input_size": result["input_size"],
+                    "output_size": result["output_size"],
+                }
+                manifest["outputs"] = sorted(outputs)
+                save_manifest(manifest)
+        
+        elapsed = time.time() - started
+        print("\n" + "-"*50)
+        print(f"  Compressed: {compressed} | No gain: {no_gain} | Failed: {failed} | Skipped: {skipped}")
+        print(f"  {total_in / MB:.1f} MB -> {total_out / MB:.1f} MB, saved {(total_in - total_out) / MB:.1f} MB")
+        print(f"  {elapsed:.1f}s, {total_in / MB / elapsed if elapsed else 0:.1f} MB/s overall")
+        print("-"*50)
+        if compressed:
+            print("\n  The originals are no longer used; 'python manage_stories.py gc' removes them.")
+        return True
     
-    return True
+    finally:
+        db.close()
 
 
 def show_instructions():
     print("""
 ============================================================
-YOUR PDFs ARE TOO LARGE FOR WEB DEPLOYMENT
+GHOSTSCRIPT IS NEEDED TO COMPRESS PDFs
 ============================================================
 
 Current sizes:
 """)
     
-    for filename in os.listdir(INPUT_DIR):
-        if filename.endswith('.pdf'):
-            size = os.path.getsize(os.path.join(INPUT_DIR, filename)) / (1024 * 1024)
-            print(f"  {filename}: {size:.0f} MB")
+    db = SessionLocal()
+    try:
+        for path, stories in find_pdfs(db).items():
+            size = os.path.getsize(path) / MB
+            print(f"  {stories[0].title}: {size:.0f} MB")
+    finally:
+        db.close()
     
     print("""
 ============================================================
 OPTIONS TO FIX THIS:
 ============================================================
 
-OPTION 1: Use an Online Compressor (Easiest)
-  1. Go to https://www.ilovepdf.com/compress_pdf
-  2. Upload each PDF and compress
-  3. Download compressed versions
-  4. Replace files in storage/pdfs/
-
-OPTION 2: Install Ghostscript (Best Quality)
-  1. Download from: https://ghostscript.com/releases/gsdnld.html
-  2. Install it
-  3. Run this script again
+OPTION 1: Install Ghostscript (Best Quality)
+  - Linux: apt install ghostscript (or your distribution's package)
+  - macOS: brew install ghostscript
+  - Windows: https://ghostscript.com/releases/gsdnld.html
+  Then run this script again
 
-OPTION 3: Use Adobe Acrobat or other PDF software
-  - Save as "Reduced Size PDF" or "Optimized PDF"
+OPTION 2: Use an Online Compressor or Adobe Acrobat
+  1. Compress each PDF (e.g. https://www.ilovepdf.com/compress_pdf)
+  2. Add the compressed versions with add_story.py
 
 TARGET: Each PDF should be under 10 MB for Cloudinary free tier
 ============================================================
 """)
 
 
-if __name__ == "__main__":
-    print("Checking for Ghostscript...")
+def main():
+    parser = argparse.ArgumentParser(description="Compress library PDFs with Ghostscript")
+    parser.add_argument("--target-mb", type=float, default=10, help="Target size per PDF in MB (default: 10)")
+    parser.add_argument("--presets", default=",".join(PRESETS), help="Ghostscript presets to try, best first")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Recompress files the manifest says are done")
+    args = parser.parse_args()
     
-    # Check if Ghostscript is available
-    try:
-        result = subprocess.run(['gswin64c', '--version'], capture_output=True)
-        print("Ghostscript found! Compressing...")
-        compress_with_ghostscript()
-    except FileNotFoundError:
-        show_instructions()
+    presets = [p.strip().lstrip("/") for p in args.presets.split(",") if p.strip()]
+    ok = compress_library(presets, args.target_mb, args.workers, args.force)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,7 @@ import urllib.parse
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app import models
-
-# Ensure storage directory exists
-COVERS_DIR = os.path.join(os.path.dirname(__file__), "storage", "covers")
-os.makedirs(COVERS_DIR, exist_ok=True)
+from app.services.blob_store import put_bytes
 
 # Theme-specific prompts for better cover generation
 THEME_PROMPTS = {
@@ -100,14 +97,8 @@ def generate_cover(db: Session, story_id: int, force: bool = False) -> bool:
             response = requests.get(service_url, timeout=90)
             
             if response.status_code == 200:
-                # Save image
-                safe_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in story.title)
-                safe_title = safe_title.replace(" ", "_").lower()
-                cover_filename = f"{story.id}_{safe_title}.png"
-                cover_path = os.path.join(COVERS_DIR, cover_filename)
-                
-                with open(cover_path, 'wb') as f:
-                    f.write(response.content)
+                # Save image (stories with the same picture share one file)
+                cover_path = put_bytes(response.content, ".png")
                 
                 # Update database
                 story.cover_image_url = cover_path
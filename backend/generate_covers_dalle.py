@@ -15,10 +15,7 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.config import get_settings
 from app import models
-
-# Ensure storage directory exists
-COVERS_DIR = os.path.join(os.path.dirname(__file__), "storage", "covers")
-os.makedirs(COVERS_DIR, exist_ok=True)
+from app.services.blob_store import put_bytes, blob_root
 
 # Initialize OpenAI client
 settings = get_settings()
@@ -101,14 +98,8 @@ def generate_cover(db: Session, story_id: int, force: bool = False) -> bool:
         img_response = requests.get(image_url, timeout=60)
         img_response.raise_for_status()
         
-        # Save image
-        safe_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in story.title)
-        safe_title = safe_title.replace(" ", "_").lower()
-        cover_filename = f"{story.id}_{safe_title}.png"
-        cover_path = os.path.join(COVERS_DIR, cover_filename)
-        
-        with open(cover_path, 'wb') as f:
-            f.write(img_response.content)
+        # Save image (stories with the same picture share one file)
+        cover_path = put_bytes(img_response.content, ".png")
         
         # Update database
         story.cover_image_url = cover_path
@@ -157,7 +148,7 @@ def generate_all_covers(db: Session, force: bool = False):
     print(f"  Errors: {error_count}")
     
     if success_count > 0:
-        print(f"\nCovers saved to: {COVERS_DIR}")
+        print(f"\nCovers saved to: {blob_root()}")
 
 
 def main():
@@ -7,6 +7,7 @@ Usage:
     python generate_covers_local.py --all        # Regenerate all covers
 """
 
+import io
 import os
 import sys
 import math
@@ -15,10 +16,7 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app import models
-
-# Ensure storage directory exists
-COVERS_DIR = os.path.join(os.path.dirname(__file__), "storage", "covers")
-os.makedirs(COVERS_DIR, exist_ok=True)
+from app.services.blob_store import put_bytes
 
 # Image dimensions
 WIDTH = 600
@@ -246,12 +244,9 @@ def generate_cover(db: Session, story_id: int, force: bool = False) -> bool:
     image = image.convert('RGB')
     
     # Save image
-    safe_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in story.title)
-    safe_title = safe_title.replace(" ", "_").lower()
-    cover_filename = f"{story.id}_{safe_title}.png"
-    cover_path = os.path.join(COVERS_DIR, cover_filename)
-    
-    image.save(cover_path, 'PNG', quality=95)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', quality=95)
+    cover_path = put_bytes(buffer.getvalue(), ".png")
     
     # Update database
     story.cover_image_url = cover_path
@@ -5,87 +5,32 @@ Just drop your PDFs into: backend/storage/
 Then run: python import_pdfs.py
 
 The script will:
-1. Scan the storage folder for PDFs
-2. Skip any already imported
-3. Add new ones to the database
+1. Scan the storage folder for PDFs new or changed since the last run
+2. Skip any already imported (same content, whatever the file is called)
+3. Store new ones in the blob store and add them to the database
+
+Usage:
+    python import_pdfs.py              # Import new PDFs
+    python import_pdfs.py --dry-run    # Only show what would be imported
+    python import_pdfs.py --list       # List the library
 """
 import os
 import sys
-from datetime import datetime
-from app.database import SessionLocal, engine, Base
+import time
+from app.database import SessionLocal, engine, Base, ensure_columns
 from app.models import Story
+from app.services.pdf_import import scan_pdfs, import_new_files, save_scan
 
 # Create tables if they don't exist
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 # Storage folder for PDFs
 STORAGE_FOLDER = "storage"
 
-# Available themes (will try to detect from filename)
-THEME_KEYWORDS = {
-    "adventure": ["adventure", "journey", "quest", "explore", "brave"],
-    "fantasy": ["magic", "wizard", "dragon", "fairy", "enchant", "spell"],
-    "animals": ["animal", "lion", "bear", "cat", "dog", "rabbit", "bunny", "tiger", "elephant", "roar", "paw"],
-    "friendship": ["friend", "together", "share", "help", "kind"],
-    "nature": ["garden", "tree", "forest", "flower", "nature", "plant"],
-    "space": ["space", "star", "moon", "rocket", "planet", "astronaut"],
-    "fairy-tales": ["princess", "prince", "castle", "kingdom", "queen", "king"],
-    "bedtime": ["sleep", "dream", "night", "bed", "moon", "sleepy", "goodnight"]
-}
 
-# Age group detection keywords
-AGE_KEYWORDS = {
-    "3-5": ["little", "baby", "tiny", "small", "first"],
-    "9-12": ["adventure", "mystery", "secret", "quest", "journey"],
-}
-
-
-def detect_theme(title: str) -> str:
-    """Try to detect theme from title."""
-    title_lower = title.lower()
-    for theme, keywords in THEME_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in title_lower:
-                return theme
-    return "adventure"  # default
-
-
-def detect_age_group(title: str) -> str:
-    """Try to detect age group from title."""
-    title_lower = title.lower()
-    for age, keywords in AGE_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in title_lower:
-                return age
-    return "6-8"  # default
-
-
-def count_pdf_pages(pdf_path: str) -> int:
-    """Count PDF pages."""
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except Exception:
-        return 10
-
-
-def get_existing_pdfs(db) -> set:
-    """Get set of already imported PDF filenames."""
-    stories = db.query(Story).all()
-    existing = set()
-    for story in stories:
-        if story.pdf_url:
-            # Get just the filename
-            filename = os.path.basename(story.pdf_url)
-            existing.add(filename.lower())
-            # Also add original-ish name
-            existing.add(story.pdf_url.lower())
-    return existing
-
-
-def import_pdfs():
-    """Scan storage folder and import new PDFs."""
+def import_pdfs(dry_run: bool = False):
+    """Scan storage folder and import new PDFs (only listing them with dry_run)."""
     print("\n" + "="*50)
     print("   IMPORTING PDFs FROM STORAGE")
     print("="*50 + "\n")
@@ -97,77 +42,37 @@ def import_pdfs():
     db = SessionLocal()
     
     try:
-        # Get already imported PDFs
-        existing = get_existing_pdfs(db)
+        # Only files that are new or changed since the last scan are looked at
+        started = time.time()
+        scan = scan_pdfs(db, STORAGE_FOLDER)
+        print(f"Scanned in {time.time() - started:.1f}s\n")
         
-        # Find all PDFs in storage folder (including subdirectories)
-        pdf_files = []
-        for root, dirs, files in os.walk(STORAGE_FOLDER):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    full_path = os.path.join(root, file)
-                    pdf_files.append(full_path)
+        if dry_run:
+            scan.print_diff()
+            print("\nDry run: nothing was imported")
+            return
         
-        if not pdf_files:
+        if not (scan.new or scan.duplicates or scan.unchanged):
             print("No PDF files found in storage folder.")
             print(f"Drop your PDFs into: {os.path.abspath(STORAGE_FOLDER)}")
             return
         
-        print(f"Found {len(pdf_files)} PDF file(s)\n")
+        for f in scan.duplicates:
+            print(f"  [SKIP] {os.path.basename(f.path)} ({f.duplicate_of})")
         
-        imported = 0
-        skipped = 0
+        import_new_files(db, scan)
         
-        for pdf_path in pdf_files:
-            filename = os.path.basename(pdf_path)
-            
-            # Check if already imported
-            if filename.lower() in existing or pdf_path.lower() in existing:
-                print(f"  [SKIP] {filename} (already imported)")
-                skipped += 1
-                continue
-            
-            # Extract title from filename
-            title = os.path.splitext(filename)[0]
-            # Clean up title (replace underscores with spaces)
-            title = title.replace("_", " ").replace("-", " ")
-            
-            # Detect theme and age group
-            theme = detect_theme(title)
-            age_group = detect_age_group(title)
-            
-            # Count pages
-            page_count = count_pdf_pages(pdf_path)
-            
-            # Create story entry
-            story = Story(
-                title=title,
-                author="StoryLand",
-                description=f"A wonderful {theme} story for children ages {age_group}.",
-                pdf_url=pdf_path,
-                page_count=page_count,
-                age_group=age_group,
-                theme=theme,
-                is_premium=False,
-                is_featured=True,
-                cover_image_url=f"/storage/covers/{theme}.jpg"
-            )
-            db.add(story)
-            db.commit()
-            
-            print(f"  [ADD] {title}")
-            print(f"        Theme: {theme}, Age: {age_group}, Pages: {page_count}")
-            
-            imported += 1
-            existing.add(filename.lower())
+        # All new stories and the manifest in one transaction
+        save_scan(db, scan)
+        db.commit()
         
         print("\n" + "-"*50)
-        print(f"Imported: {imported} | Skipped: {skipped}")
+        print(f"Imported: {len(scan.new)} | Skipped: {len(scan.duplicates)} | Unchanged: {scan.unchanged}")
         print("-"*50)
         
-        if imported > 0:
+        if scan.new:
             print("\nNew stories are now available in your library!")
-        
+    
     except Exception as e:
         print(f"Error: {e}")
         db.rollback()
@@ -197,6 +102,8 @@ def list_stories():
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--list":
         list_stories()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--dry-run":
+        import_pdfs(dry_run=True)
     else:
         import_pdfs()
         print("\n")
@@ -0,0 +1,106 @@
+"""
+Linearize ("fast web view") the PDFs already in the library.
+
+New imports are linearized by import_pdfs.py / add_story.py; run this
+once after upgrading to store linearized copies of the existing files
+in the blob store, point their stories at them and record the result on
+each story (Story.pdf_linearized). The old files are left for
+manage_stories.py gc. Files are processed in parallel, one per worker
+process.
+
+Needs pikepdf (pip install pikepdf) or the qpdf command line tool.
+
+Usage:
+    python linearize_pdfs.py               # Files not checked yet
+    python linearize_pdfs.py --all         # Every file, including already checked ones
+    python linearize_pdfs.py --workers 4   # Worker processes (default: one per CPU)
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.database import SessionLocal, engine, Base, ensure_columns
+from app.models import Story
+from app.services.pdf_linearize import store_linearized
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+ensure_columns()
+
+COMMIT_EVERY = 50
+
+
+def find_pdfs(db, recheck: bool) -> dict:
+    """{path: [stories using it]} for the local PDFs to process."""
+    paths = {}
+    for story in db.query(Story).filter(Story.pdf_url.isnot(None)):
+        if story.pdf_url.startswith("http") or not os.path.exists(story.pdf_url):
+            continue
+        if story.pdf_linearized is not None and not recheck:
+            continue
+        paths.setdefault(story.pdf_url, []).append(story)
+    return paths
+
+
+def linearize_all(recheck: bool = False, workers: int = None):
+    print("\n" + "="*50)
+    print("   LINEARIZING PDFs")
+    print("="*50 + "\n")
+    
+    db = SessionLocal()
+    
+    try:
+        paths = find_pdfs(db, recheck)
+        if not paths:
+            print("Nothing to do")
+            return
+        
+        print(f"Processing {len(paths)} PDF(s)...\n")
+        started = time.time()
+        done = linearized = failed = 0
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(store_linearized, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    stored_path, ok = future.result()
+                except Exception:
+                    stored_path, ok = path, False
+                for story in paths[path]:
+                    story.pdf_linearized = ok
+                    if ok:
+                        story.pdf_url = stored_path
+                
+                done += 1
+                if ok:
+                    linearized += 1
+                else:
+                    failed += 1
+                print(f"  [{'OK' if ok else 'FAILED'}] {path}")
+                
+                if done % COMMIT_EVERY == 0:
+                    db.commit()
+        
+        db.commit()
+        
+        print("\n" + "-"*50)
+        print(f"  Linearized: {linearized} | Failed: {failed} | {time.time() - started:.1f}s")
+        print("-"*50)
+        if failed:
+            print("\n  Failed files are served as they are. Is pikepdf or qpdf installed?")
+    
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Linearize library PDFs for fast web view")
+    parser.add_argument("--all", action="store_true", help="Re-check every PDF, not only unchecked ones")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    linearize_all(recheck=args.all, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
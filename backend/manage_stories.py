@@ -6,54 +6,27 @@ Usage:
     python manage_stories.py delete <id>   - Delete a story by ID
     python manage_stories.py cleanup       - Remove duplicate stories
     python manage_stories.py import        - Import PDFs from storage folder
+    python manage_stories.py import --dry-run - Only show what would be imported
+    python manage_stories.py reindex       - Rebuild the search index
+    python manage_stories.py pages         - Store page text for stories that have none
+    python manage_stories.py gc [--dry-run] - Delete stored files no story uses any more
 """
 import os
 import sys
-from app.database import SessionLocal, engine, Base
-from app.models import Story
+from app.database import SessionLocal, engine, Base, ensure_columns
+from app.models import Story, rebuild_blob_refs
+from app.services.blob_store import collect_garbage
+from app.services.pdf_import import (
+    scan_pdfs, save_scan, import_new_files, title_from_filename, DUPLICATE, SKIPPED
+)
+from app.services.search import remove_story, rebuild_search_index
+from app.services.story_pages import remove_pages, rebuild_story_pages
 
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 STORAGE_FOLDER = "storage"
 
-THEME_KEYWORDS = {
-    "adventure": ["adventure", "journey", "quest", "explore", "brave", "treasure", "pirate"],
-    "fantasy": ["magic", "wizard", "dragon", "fairy", "enchant", "spell", "pencil", "wand", "potion"],
-    "animals": ["animal", "lion", "bear", "cat", "dog", "rabbit", "bunny", "tiger", "elephant", "roar", "paw", "leo", "owl", "fox", "wolf"],
-    "friendship": ["friend", "together", "share", "help", "kind", "team"],
-    "nature": ["garden", "tree", "forest", "flower", "nature", "plant", "butterfly", "bee"],
-    "space": ["space", "star", "moon", "rocket", "planet", "astronaut", "alien", "galaxy"],
-    "fairy-tales": ["princess", "prince", "castle", "kingdom", "queen", "king", "knight"],
-    "bedtime": ["sleep", "dream", "night", "bed", "sleepy", "goodnight", "cloud", "lullaby"]
-}
-
-
-def detect_theme(title: str) -> str:
-    title_lower = title.lower()
-    for theme, keywords in THEME_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in title_lower:
-                return theme
-    return "adventure"
-
-
-def detect_age_group(title: str) -> str:
-    title_lower = title.lower()
-    if any(word in title_lower for word in ["little", "baby", "tiny", "small"]):
-        return "3-5"
-    if any(word in title_lower for word in ["adventure", "mystery", "secret", "quest"]):
-        return "9-12"
-    return "6-8"
-
-
-def count_pdf_pages(pdf_path: str) -> int:
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except:
-        return 10
-
 
 def list_stories():
     """List all stories."""
@@ -91,12 +64,23 @@ def delete_story(story_id: int):
         return
     
     print(f"Deleting: {story.title}")
+    remove_story(db, story.id)
+    remove_pages(db, story.id)
     db.delete(story)
     db.commit()
     print("Deleted!")
     db.close()
 
 
+def normalize_title(title: str) -> str:
+    """Lowercase title without a generated timestamp, for spotting duplicates."""
+    normalized = title.lower().strip()
+    for sep in ["_2026", " 2026"]:
+        if sep in normalized:
+            normalized = normalized.split(sep)[0]
+    return normalized
+
+
 def cleanup_duplicates():
     """Remove duplicate stories (keep the first one)."""
     db = SessionLocal()
@@ -107,11 +91,7 @@ def cleanup_duplicates():
     
     for story in stories:
         # Normalize title for comparison
-        normalized = story.title.lower().strip()
-        # Remove timestamps from title
-        for sep in ["_2026", " 2026"]:
-            if sep in normalized:
-                normalized = normalized.split(sep)[0]
+        normalized = normalize_title(story.title)
         
         if normalized in seen_titles:
             duplicates.append(story)
@@ -129,6 +109,8 @@ def cleanup_duplicates():
     
     if confirm == 'y':
         for story in duplicates:
+            remove_story(db, story.id)
+            remove_pages(db, story.id)
             db.delete(story)
         db.commit()
         print(f"Deleted {len(duplicates)} duplicate(s)")
@@ -152,8 +134,8 @@ def generate_cover_for_story(story):
         print(f"        Cover generation failed: {e}")
 
 
-def import_pdfs():
-    """Import new PDFs from storage folder."""
+def import_pdfs(dry_run: bool = False):
+    """Import new PDFs from storage folder (only listing them with dry_run)."""
     print("\n" + "="*50)
     print("   IMPORTING PDFs FROM STORAGE")
     print("="*50 + "\n")
@@ -163,75 +145,47 @@ def import_pdfs():
     db = SessionLocal()
     
     try:
-        # Get existing story titles (normalized)
+        # Only files that are new or changed since the last scan are looked at
+        scan = scan_pdfs(db, STORAGE_FOLDER)
+        
+        # Existing story titles (normalized), only when there's something to check
         existing_titles = set()
-        for story in db.query(Story).all():
-            normalized = story.title.lower().strip()
-            for sep in ["_2026", " 2026"]:
-                if sep in normalized:
-                    normalized = normalized.split(sep)[0]
-            existing_titles.add(normalized)
+        if scan.new:
+            existing_titles = {normalize_title(title) for (title,) in db.query(Story.title)}
         
-        # Find PDFs
-        pdf_files = []
-        for root, dirs, files in os.walk(STORAGE_FOLDER):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    # Skip files in pdfs subfolder that have timestamps
-                    if "_2026" in file:
-                        continue
-                    pdf_files.append(os.path.join(root, file))
+        candidates, scan.new = scan.new, []
+        for f in candidates:
+            filename = os.path.basename(f.path)
+            title_clean = title_from_filename(f.path)
+            # Skip files in pdfs subfolder that have timestamps
+            if "_2026" in filename:
+                f.duplicate_of, f.status = "generated PDF", SKIPPED
+            elif title_clean.lower() in existing_titles:
+                f.duplicate_of, f.status = "title already exists", DUPLICATE
+            else:
+                existing_titles.add(title_clean.lower())
+                scan.new.append(f)
+                continue
+            scan.duplicates.append(f)
         
-        if not pdf_files:
+        if dry_run:
+            scan.print_diff()
+            print("\nDry run: nothing was imported")
+            return
+        
+        if not (scan.new or scan.duplicates or scan.unchanged):
             print("No new PDF files found.")
             print(f"\nDrop your PDFs into: {os.path.abspath(STORAGE_FOLDER)}")
             return
         
-        print(f"Found {len(pdf_files)} PDF file(s)\n")
+        for f in scan.duplicates:
+            print(f"  [SKIP] {os.path.basename(f.path)} ({f.duplicate_of})")
         
-        imported = 0
-        skipped = 0
-        new_stories = []
+        new_stories = import_new_files(db, scan)
         
-        for pdf_path in pdf_files:
-            filename = os.path.basename(pdf_path)
-            title = os.path.splitext(filename)[0]
-            title_clean = title.replace("_", " ").replace("-", " ").strip()
-            
-            # Check if already exists
-            normalized = title_clean.lower()
-            if normalized in existing_titles:
-                print(f"  [SKIP] {title_clean} (already exists)")
-                skipped += 1
-                continue
-            
-            # Detect metadata
-            theme = detect_theme(title_clean)
-            age_group = detect_age_group(title_clean)
-            page_count = count_pdf_pages(pdf_path)
-            
-            # Add to database
-            story = Story(
-                title=title_clean,
-                author="StoryLand",
-                description=f"A wonderful {theme} story for children ages {age_group}.",
-                pdf_url=pdf_path,
-                page_count=page_count,
-                age_group=age_group,
-                theme=theme,
-                is_premium=False,
-                is_featured=True,
-            )
-            db.add(story)
-            db.commit()
-            db.refresh(story)
-            
-            print(f"  [ADD] {title_clean}")
-            print(f"        Theme: {theme} | Age: {age_group} | Pages: {page_count}")
-            
-            new_stories.append(story)
-            imported += 1
-            existing_titles.add(normalized)
+        # All new stories and the manifest in one transaction
+        save_scan(db, scan)
+        db.commit()
         
         # Generate covers for new stories
         if new_stories:
@@ -240,13 +194,48 @@ def import_pdfs():
                 generate_cover_for_story(story)
         
         print("\n" + "-"*50)
-        print(f"  Imported: {imported} | Skipped: {skipped}")
+        print(f"  Imported: {len(new_stories)} | Skipped: {len(scan.duplicates)} | Unchanged: {scan.unchanged}")
         print("-"*50)
         
     finally:
         db.close()
 
 
+def reindex():
+    """Rebuild the search index from every story (including PDF text)."""
+    db = SessionLocal()
+    try:
+        count = rebuild_search_index(db)
+        db.commit()
+        print(f"Indexed {count} stories")
+    finally:
+        db.close()
+
+
+def backfill_pages():
+    """Store reader page text for stories added before it was kept."""
+    db = SessionLocal()
+    try:
+        count = rebuild_story_pages(db)
+        db.commit()
+        print(f"Stored pages for {count} stories")
+    finally:
+        db.close()
+
+
+def garbage_collect(dry_run: bool = False):
+    """Delete stored PDFs and covers that no story has used for an hour."""
+    db = SessionLocal()
+    try:
+        rebuild_blob_refs(db)  # In case stories were removed with bulk deletes
+        db.commit()
+        removed, freed = collect_garbage(db, dry_run=dry_run)
+        verb = "Would delete" if dry_run else "Deleted"
+        print(f"{verb} {removed} file(s), {freed / (1024 * 1024):.1f} MB")
+    finally:
+        db.close()
+
+
 def main():
     if len(sys.argv) < 2:
         print(__doc__)
@@ -264,8 +253,16 @@ def main():
     elif command == "cleanup":
         cleanup_duplicates()
     elif command == "import":
-        import_pdfs()
-        list_stories()
+        dry_run = "--dry-run" in sys.argv[2:]
+        import_pdfs(dry_run=dry_run)
+        if not dry_run:
+            list_stories()
+    elif command == "reindex":
+        reindex()
+    elif command == "pages":
+        backfill_pages()
+    elif command == "gc":
+        garbage_collect(dry_run="--dry-run" in sys.argv[2:])
     else:
         print(f"Unknown command: {command}")
         print(__doc__)
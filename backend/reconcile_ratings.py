@@ -0,0 +1,80 @@
+"""
+Backfill and reconcile the denormalized rating aggregates on stories.
+
+Story.rating_count / Story.rating_sum are kept up to date by the rate
+endpoint. The API adds the columns at startup (see database.ensure_columns);
+run this once after upgrading to fill them from existing ratings, or any
+time the aggregates may have drifted.
+
+Usage:
+    python reconcile_ratings.py            # Fix any drifted stories
+    python reconcile_ratings.py --check    # Only report drift, change nothing
+"""
+import sys
+from sqlalchemy import func
+from app.database import SessionLocal, engine, Base, ensure_columns, missing_columns
+from app.models import Story, Rating
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+
+def reconcile(check_only: bool = False):
+    """Recompute aggregates from the ratings table in one GROUP BY."""
+    print("\n" + "="*50)
+    print("   RECONCILING RATING AGGREGATES")
+    print("="*50 + "\n")
+
+    if check_only:
+        # Story can't be queried until the columns are added
+        missing = [f"{table}.{name}" for table, name in missing_columns() if table == "stories"]
+        if missing:
+            print(f"  Columns missing: {', '.join(missing)}")
+            print("  Start the API or run without --check to add them")
+            return
+    else:
+        ensure_columns()
+
+    db = SessionLocal()
+
+    try:
+        actual = {
+            story_id: (count, total)
+            for story_id, count, total in db.query(
+                Rating.story_id,
+                func.count(Rating.id),
+                func.sum(Rating.rating)
+            ).group_by(Rating.story_id)
+        }
+
+        drifted = 0
+        for story in db.query(Story).order_by(Story.id):
+            count, total = actual.get(story.id, (0, 0.0))
+            total = float(total or 0.0)
+            if story.rating_count == count and abs((story.rating_sum or 0.0) - total) < 1e-9:
+                continue
+
+            drifted += 1
+            print(f"  [{story.id}] {story.title}: "
+                  f"{story.rating_count}/{story.rating_sum} -> {count}/{total}")
+            if not check_only:
+                story.rating_count = count
+                story.rating_sum = total
+
+        if not check_only:
+            db.commit()
+
+        print("\n" + "-"*50)
+        action = "Found" if check_only else "Fixed"
+        print(f"  {action} {drifted} drifted stor{'y' if drifted == 1 else 'ies'}")
+        print("-"*50)
+
+    except Exception as e:
+        print(f"Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reconcile(check_only="--check" in sys.argv[1:])
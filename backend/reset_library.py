@@ -2,52 +2,23 @@
 Reset the library and import only your real PDFs from storage/pdfs/
 """
 import os
-from app.database import SessionLocal, engine, Base
-from app.models import Story, User, Favorite, Rating
+from app.database import SessionLocal, engine, Base, ensure_columns
+from app.models import (
+    Story, StoryPage, ImportedFile, User, Favorite, Rating,
+    bump_catalog_version, rebuild_story_facets, rebuild_blob_refs
+)
 from app.auth import get_password_hash
+from app.services.blob_store import put_file
+from app.services.pdf_metadata import extract_many
+from app.services.search import rebuild_search_index
+from app.services.story_pages import index_pdf_story
+from app.services.taxonomy import classify_titles
 
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 STORAGE_FOLDER = "storage/pdfs"
 
-THEME_KEYWORDS = {
-    "adventure": ["adventure", "journey", "quest", "explore", "brave"],
-    "fantasy": ["magic", "wizard", "dragon", "fairy", "enchant", "spell", "pencil"],
-    "animals": ["animal", "lion", "bear", "cat", "dog", "rabbit", "bunny", "tiger", "elephant", "roar", "paw", "leo"],
-    "friendship": ["friend", "together", "share", "help", "kind"],
-    "nature": ["garden", "tree", "forest", "flower", "nature", "plant"],
-    "space": ["space", "star", "moon", "rocket", "planet", "astronaut"],
-    "fairy-tales": ["princess", "prince", "castle", "kingdom", "queen", "king"],
-    "bedtime": ["sleep", "dream", "night", "bed", "sleepy", "goodnight", "cloud"]
-}
-
-
-def detect_theme(title: str) -> str:
-    title_lower = title.lower()
-    for theme, keywords in THEME_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in title_lower:
-                return theme
-    return "adventure"
-
-
-def detect_age_group(title: str) -> str:
-    title_lower = title.lower()
-    if any(word in title_lower for word in ["little", "baby", "tiny", "small"]):
-        return "3-5"
-    if any(word in title_lower for word in ["mystery", "secret", "quest"]):
-        return "9-12"
-    return "6-8"
-
-
-def count_pdf_pages(pdf_path: str) -> int:
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except:
-        return 10
-
 
 def reset_and_import():
     print("\n" + "="*50)
@@ -60,7 +31,15 @@ def reset_and_import():
     count = db.query(Story).count()
     db.query(Favorite).delete()
     db.query(Rating).delete()
+    db.query(StoryPage).delete()
+    # The import manifest too, so import_pdfs.py / watch_storage.py
+    # import the files again instead of skipping them as already imported
+    db.query(ImportedFile).delete()
     db.query(Story).delete()
+    bump_catalog_version(db)
+    rebuild_story_facets(db)
+    rebuild_search_index(db)
+    rebuild_blob_refs(db)
     db.commit()
     print(f"Cleared {count} old stories")
     
@@ -75,19 +54,18 @@ def reset_and_import():
     
     print(f"\nFound {len(pdf_files)} PDF(s) to import:\n")
     
-    for pdf_path in pdf_files:
-        filename = os.path.basename(pdf_path)
-        title = os.path.splitext(filename)[0]
-        
-        theme = detect_theme(title)
-        age_group = detect_age_group(title)
-        page_count = count_pdf_pages(pdf_path)
+    titles = [os.path.splitext(os.path.basename(pdf_path))[0] for pdf_path in pdf_files]
+    metadata = extract_many(pdf_files, with_pages=True)
+    
+    for pdf_path, title, (theme, age_group) in zip(pdf_files, titles, classify_titles(titles)):
+        page_count = metadata[pdf_path]["page_count"] or 10
+        stored_path = put_file(pdf_path, ".pdf")
         
         story = Story(
             title=title,
             author="StoryLand",
             description=f"A wonderful {theme} story for children ages {age_group}.",
-            pdf_url=pdf_path,
+            pdf_url=stored_path,
             page_count=page_count,
             age_group=age_group,
             theme=theme,
@@ -96,9 +74,12 @@ def reset_and_import():
             cover_image_url=f"/storage/covers/{theme}.jpg"
         )
         db.add(story)
+        index_pdf_story(db, story, metadata[pdf_path]["pages"])
         db.commit()
         
         print(f"  + {title}")
+        if metadata[pdf_path]["error"]:
+            print(f"    Couldn't read the PDF's details ({metadata[pdf_path]['error']})")
         print(f"    Theme: {theme} | Age: {age_group} | Pages: {page_count}\n")
     
     # Ensure demo user exists
@@ -2,13 +2,14 @@
 Seed the database with sample stories for demonstration.
 Run: python seed_data.py
 """
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine, Base, ensure_columns
 from app.models import Story, User
 from app.auth import get_password_hash
-from app.services.pdf_generator import create_story_pdf
+from app.services.pdf_storage import store_story_pdfs
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 
 def seed_stories():
@@ -314,16 +315,17 @@ Sweet dreams, little one!
         }
     ]
     
-    for story_data in sample_stories:
-        content = story_data.pop("content")
-        
-        # Create PDF
-        pdf_path = create_story_pdf(story_data["title"], content)
-        
+    # Render every PDF at once, across all CPU cores
+    contents = [story_data.pop("content") for story_data in sample_stories]
+    pdf_urls = store_story_pdfs(
+        [(story_data["title"], content) for story_data, content in zip(sample_stories, contents)]
+    )
+    
+    for story_data, content, pdf_url in zip(sample_stories, contents, pdf_urls):
         # Create story record
         story = Story(
             **story_data,
-            pdf_url=pdf_path,
+            pdf_url=pdf_url,
             page_count=content.count("--- Page"),
             cover_image_url=f"/storage/covers/{story_data['theme']}.jpg"
         )
@@ -8,12 +8,13 @@ Usage:
 
 import json
 import os
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine, Base, ensure_columns
 from app.models import User, Story
 from app.auth import get_password_hash
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+ensure_columns()
 
 
 def seed_database():
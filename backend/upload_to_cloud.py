@@ -54,6 +54,16 @@ def upload_with_retry(file_path, resource_type, public_id, folder, max_retries=3
     return None
 
 
+def upload_once(uploaded, file_path, resource_type, public_id, folder):
+    """
+    upload_with_retry, once per local file: stories sharing a stored blob
+    (the same PDF or cover) get the same URL.
+    """
+    if file_path not in uploaded:
+        uploaded[file_path] = upload_with_retry(file_path, resource_type, public_id, folder)
+    return uploaded[file_path]
+
+
 def upload_all_files():
     """Upload all local files to Cloudinary"""
     
@@ -74,6 +84,7 @@ def upload_all_files():
     pdf_uploaded = 0
     cover_uploaded = 0
     errors = 0
+    uploaded = {}  # local path -> URL
     
     for story in stories:
         print(f"\n[{story.id}] {story.title}")
@@ -83,7 +94,8 @@ def upload_all_files():
         if story.cover_image_url and not story.cover_image_url.startswith("http"):
             if os.path.exists(story.cover_image_url):
                 print(f"  Uploading cover...")
-                url = upload_with_retry(
+                url = upload_once(
+                    uploaded,
                     story.cover_image_url,
                     "image",
                     f"story_{story.id}_cover",
@@ -104,7 +116,8 @@ def upload_all_files():
         if story.pdf_url and not story.pdf_url.startswith("http"):
             if os.path.exists(story.pdf_url):
                 print(f"  Uploading PDF...")
-                url = upload_with_retry(
+                url = upload_once(
+                    uploaded,
                     story.pdf_url,
                     "raw",
                     f"story_{story.id}_pdf",
@@ -0,0 +1,174 @@
+"""
+Watch the storage folder and import PDFs as they are dropped in.
+
+Leave it running instead of running import_pdfs.py after every copy:
+new books show up in the library a few seconds after they've finished
+copying (once their size hasn't changed for --settle seconds).
+
+Only the files reported by the watcher are looked at - inotify on Linux,
+a listing of the folder every --poll-seconds elsewhere - so the tree is
+only scanned once, at startup, to catch up on files dropped while the
+watcher wasn't running (and again if inotify loses events).
+
+Usage:
+    python watch_storage.py                    # Watch (inotify where available)
+    python watch_storage.py --poll             # Always poll, e.g. on a network share
+    python watch_storage.py --settle 5         # Wait longer for slow copies
+    python watch_storage.py --no-catch-up      # Skip the scan at startup
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from app.database import SessionLocal, engine, Base, ensure_columns
+from app.services.blob_store import blob_root
+from app.services.folder_watch import open_watcher, Debouncer
+from app.services.pdf_import import scan_pdfs, scan_files, import_new_files, save_scan, looks_complete
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+ensure_columns()
+
+# Storage folder for PDFs
+STORAGE_FOLDER = "storage"
+
+# Files imported together, in one transaction
+MAX_BATCH = 50
+
+# Seconds between checks for settled files
+TICK_SECONDS = 0.5
+
+# Seconds before a file (or the catch-up scan) that failed to import is tried again
+RETRY_SECONDS = 60
+
+
+def import_files(paths=None, workers: int = None) -> list:
+    """
+    Import the given PDFs, or everything new under the storage folder
+    when paths is None; returns the new stories' IDs. On failure nothing
+    is kept and the error is raised.
+    """
+    db = SessionLocal()
+    try:
+        if paths is None:
+            scan = scan_pdfs(db, STORAGE_FOLDER)
+        else:
+            scan = scan_files(db, paths)
+        for f in scan.duplicates:
+            print(f"  [SKIP] {os.path.basename(f.path)} ({f.duplicate_of})")
+        
+        stories = import_new_files(db, scan, workers=workers)
+        
+        # The new stories and the manifest in one transaction
+        save_scan(db, scan)
+        db.commit()
+        return [story.id for story in stories]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def generate_cover(story_id: int):
+    """Generate a cover image for a new story (in a cover worker thread)."""
+    try:
+        from generate_covers_local import generate_cover as gen_cover
+        db = SessionLocal()
+        try:
+            gen_cover(db, story_id, force=True)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"        Cover generation failed for story {story_id}: {e}")
+
+
+def watch(poll: bool = False, poll_seconds: float = 5.0, settle_seconds: float = 2.0,
+          workers: int = None, cover_workers: int = 2, catch_up: bool = True):
+    """Import PDFs as they appear in the storage folder, until interrupted."""
+    print("\n" + "="*50)
+    print("   WATCHING STORAGE FOR NEW PDFs")
+    print("="*50 + "\n")
+    
+    os.makedirs(STORAGE_FOLDER, exist_ok=True)
+    os.makedirs(os.path.join(STORAGE_FOLDER, "pdfs"), exist_ok=True)
+    
+    # Started before the catch-up scan, so nothing copied during it is missed
+    watcher = open_watcher(STORAGE_FOLDER, ".pdf", exclude=[blob_root()], poll=poll, poll_seconds=poll_seconds)
+    debouncer = Debouncer(settle_seconds, complete=looks_complete)
+    # Covers are drawn in the background, a few at a time, so they don't
+    # hold up the next import; stories show their theme's cover until then
+    covers = ThreadPoolExecutor(max_workers=cover_workers)
+    
+    print(f"Watching {os.path.abspath(STORAGE_FOLDER)} ({watcher.mode})")
+    print("Press Ctrl+C to stop\n")
+    
+    retries = {}  # path (None: the catch-up scan) -> when to try it again
+    
+    def run(paths=None):
+        try:
+            story_ids = import_files(paths, workers)
+        except Exception as e:
+            if paths and len(paths) > 1:
+                # One bad file mustn't hold back the rest of its batch
+                for path in paths:
+                    run([path])
+                return
+            print(f"  [FAILED] {paths[0] if paths else 'Scan'}: {e} (retrying in {RETRY_SECONDS}s)")
+            retries[paths[0] if paths else None] = time.monotonic() + RETRY_SECONDS
+            return
+        for story_id in story_ids:
+            covers.submit(generate_cover, story_id)
+    
+    try:
+        if catch_up:
+            run()
+        while True:
+            for path in watcher.wait(TICK_SECONDS):
+                debouncer.touch(path)
+            if watcher.overflowed:
+                # Events were lost: fall back to comparing the tree with the manifest
+                print("Watcher lost events; rescanning...")
+                watcher.overflowed = False
+                run()
+            now = time.monotonic()
+            for path in [path for path, due in retries.items() if due <= now]:
+                del retries[path]
+                if path is None:
+                    run()
+                else:
+                    debouncer.touch(path)
+            ready = debouncer.ready()
+            # Imports stay on this thread: metadata time limits use SIGALRM
+            for i in range(0, len(ready), MAX_BATCH):
+                run(ready[i:i + MAX_BATCH])
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        watcher.close()
+        covers.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import PDFs as they are dropped into the storage folder")
+    parser.add_argument("--poll", action="store_true", help="Poll the folder instead of using inotify")
+    parser.add_argument("--poll-seconds", type=float, default=5.0, help="Seconds between polls")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds a file must stay unchanged before import")
+    parser.add_argument("--workers", type=int, default=None, help="Metadata worker processes (default: config)")
+    parser.add_argument("--cover-workers", type=int, default=2, help="Covers generated at once")
+    parser.add_argument("--no-catch-up", action="store_true", help="Don't import files dropped while stopped")
+    
+    args = parser.parse_args()
+    
+    watch(
+        poll=args.poll,
+        poll_seconds=args.poll_seconds,
+        settle_seconds=args.settle,
+        workers=args.workers,
+        cover_workers=max(1, args.cover_workers),
+        catch_up=not args.no_catch_up
+    )
+
+
+if __name__ == "__main__":
+    main()
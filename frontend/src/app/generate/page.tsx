@@ -36,6 +36,7 @@ export default function GenerateStoryPage() {
   const [selectedAge, setSelectedAge] = useState('');
   const [pageCount, setPageCount] = useState(10);
   const [isGenerating, setIsGenerating] = useState(false);
+  const [pages, setPages] = useState<{ page: number; content: string }[]>([]);
 
   useEffect(() => {
     if (!isAuthenticated) {
@@ -62,12 +63,16 @@ export default function GenerateStoryPage() {
 
     setIsGenerating(true);
     try {
-      const story = await storiesAPI.generateStory({
-        title,
-        theme: selectedTheme,
-        ageGroup: selectedAge,
-        pageCount,
-      });
+      setPages([]);
+      const story = await storiesAPI.generateStoryStream(
+        {
+          title,
+          theme: selectedTheme,
+          ageGroup: selectedAge,
+          pageCount,
+        },
+        (page) => setPages((current) => [...current, page])
+      );
       toast.success('Story created successfully! 🎉');
       router.push(`/stories/${story.id}`);
     } catch (error: any) {
@@ -234,8 +239,20 @@ export default function GenerateStoryPage() {
                   Our AI is crafting a magical story just for you...
                 </p>
                 <p className="text-gray-400 text-sm mt-2">
-                  This may take up to a minute
+                  {pages.length > 0
+                    ? `${pages.length} of ${pageCount} pages written`
+                    : 'The first page is on its way'}
                 </p>
+                {pages.length > 0 && (
+                  <div className="mt-6 text-left space-y-4 max-h-96 overflow-y-auto">
+                    {pages.map((page) => (
+                      <div key={page.page} className="bg-white rounded-2xl p-4 shadow">
+                        <p className="text-candy-500 font-bold mb-2">~ {page.page} ~</p>
+                        <p className="text-gray-600 whitespace-pre-line">{page.content}</p>
+                      </div>
+                    ))}
+                  </div>
+                )}
               </motion.div>
             )}
           </motion.div>
@@ -3,7 +3,7 @@
 import { useEffect, useState } from 'react';
 import { useParams } from 'next/navigation';
 import Link from 'next/link';
-import { ArrowLeft, Download, Maximize2, Minimize2 } from 'lucide-react';
+import { ArrowLeft, ChevronLeft, ChevronRight, Download, FileText, Maximize2, Minimize2 } from 'lucide-react';
 import { storiesAPI } from '@/lib/api';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
@@ -13,6 +13,11 @@ export default function ReadStoryPage() {
   const storyId = Number(params.id);
   
   const [story, setStory] = useState<any>(null);
+  // Page text, loaded a chunk at a time; null falls back to the PDF viewer
+  const [pages, setPages] = useState<Record<number, any> | null>(null);
+  const [totalPages, setTotalPages] = useState(0);
+  const [pageNumber, setPageNumber] = useState(1);
+  const [showPdf, setShowPdf] = useState(false);
   const [isFullscreen, setIsFullscreen] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
@@ -28,9 +33,38 @@ export default function ReadStoryPage() {
         setIsLoading(false);
       }
     };
+    const loadFirstPages = async () => {
+      try {
+        const data = await storiesAPI.getStoryPages(storyId, 1);
+        addPages(data);
+      } catch (err) {
+        setShowPdf(true); // No stored page text for this story
+      }
+    };
     loadStory();
+    loadFirstPages();
   }, [storyId]);
 
+  const addPages = (data: any) => {
+    setTotalPages(data.total_pages);
+    setPages((loaded) => {
+      const next = { ...(loaded || {}) };
+      data.pages.forEach((page: any) => {
+        next[page.number] = page;
+      });
+      return next;
+    });
+  };
+
+  // Fetch the next chunk before the reader gets to it
+  useEffect(() => {
+    if (!pages || pageNumber + 2 > totalPages) return;
+    const ahead = pageNumber + 2;
+    if (!pages[ahead]) {
+      storiesAPI.getStoryPages(storyId, ahead).then(addPages).catch(() => {});
+    }
+  }, [pageNumber, pages, totalPages, storyId]);
+
   const toggleFullscreen = () => {
     if (!document.fullscreenElement) {
       document.documentElement.requestFullscreen();
@@ -89,6 +123,15 @@ export default function ReadStoryPage() {
         </div>
         
         <div className="flex items-center gap-2">
+          {pages && (
+            <button
+              onClick={() => setShowPdf(!showPdf)}
+              className="p-2 hover:bg-gray-700 rounded-lg transition-colors"
+              title={showPdf ? 'Show Text' : 'Show PDF'}
+            >
+              <FileText className="w-5 h-5" />
+            </button>
+          )}
           <button
             onClick={handleDownload}
             className="p-2 hover:bg-gray-700 rounded-lg transition-colors"
@@ -110,15 +153,63 @@ export default function ReadStoryPage() {
         </div>
       </header>
 
-      {/* PDF Viewer */}
-      <div className="flex-1 w-full">
-        <iframe
-          src={`${API_URL}/stories/${storyId}/view#toolbar=1&navpanes=0&scrollbar=1`}
-          className="w-full h-full min-h-[calc(100vh-60px)]"
-          title={story?.title}
-          style={{ border: 'none' }}
-        />
-      </div>
+      {showPdf || !pages ? (
+        /* PDF Viewer */
+        <div className="flex-1 w-full">
+          {showPdf && (
+            <iframe
+              src={`${API_URL}/stories/${storyId}/view#toolbar=1&navpanes=0&scrollbar=1`}
+              className="w-full h-full min-h-[calc(100vh-60px)]"
+              title={story?.title}
+              style={{ border: 'none' }}
+            />
+          )}
+        </div>
+      ) : (
+        /* Text Reader */
+        <div className="flex-1 flex flex-col items-center justify-center px-4 py-8">
+          <article className="bg-amber-50 text-gray-800 rounded-2xl shadow-xl max-w-2xl w-full p-8 min-h-[60vh]">
+            <p className="text-center text-pink-300 font-bold mb-6">~ {pageNumber} ~</p>
+            {pages[pageNumber] ? (
+              <>
+                {pages[pageNumber].text.split('\n\n').map((paragraph: string, i: number) => (
+                  <p key={i} className="text-lg leading-relaxed mb-4 whitespace-pre-line">
+                    {paragraph}
+                  </p>
+                ))}
+                {pages[pageNumber].illustrations.map((note: string, i: number) => (
+                  <p key={`i${i}`} className="text-sm italic text-green-700 mb-4">
+                    [{note}]
+                  </p>
+                ))}
+              </>
+            ) : (
+              <p className="text-center text-gray-400">Loading page...</p>
+            )}
+          </article>
+          <div className="flex items-center gap-6 mt-6 text-white">
+            <button
+              onClick={() => setPageNumber(pageNumber - 1)}
+              disabled={pageNumber <= 1}
+              className="p-2 hover:bg-gray-700 rounded-lg transition-colors disabled:opacity-30"
+              title="Previous Page"
+            >
+              <ChevronLeft className="w-6 h-6" />
+            </button>
+            <span>
+              {pageNumber} / {totalPages}
+            </span>
+            <button
+              onClick={() => setPageNumber(pageNumber + 1)}
+              disabled={pageNumber >= totalPages}
+              className="p-2 hover:bg-gray-700 rounded-lg transition-colors disabled:opacity-30"
+              title="Next Page"
+            >
+              <ChevronRight className="w-6 h-6" />
+            </button>
+          </div>
+        </div>
+      )}
     </div>
   );
 }
@@ -79,6 +79,7 @@ export const storiesAPI = {
     ageGroup?: string;
     theme?: string;
     featuredOnly?: boolean;
+    cursor?: string;
   }) => {
     const response = await api.get('/stories/', { params });
     return response.data;
@@ -94,6 +95,22 @@ export const storiesAPI = {
     return response.data;
   },
 
+  searchStories: async (params: {
+    q: string;
+    page?: number;
+    page_size?: number;
+    age_group?: string;
+    theme?: string;
+  }) => {
+    const response = await api.get('/stories/search', { params });
+    return response.data;
+  },
+
+  getFacets: async () => {
+    const response = await api.get('/stories/facets');
+    return response.data;
+  },
+
   getThemes: async () => {
     const response = await api.get('/stories/themes');
     return response.data;
@@ -113,6 +130,12 @@ export const storiesAPI = {
     return response.data;
   },
 
+  getStoryPages: async (storyId: number, from = 1, to?: number) => {
+    // Page text in small chunks: { total_pages, pages: [{ number, text, illustrations }], next_from }
+    const response = await api.get(`/stories/${storyId}/pages`, { params: { from, to } });
+    return response.data;
+  },
+
   getStoryRatings: async (storyId: number) => {
     const response = await api.get(`/stories/${storyId}/ratings`);
     return response.data;
@@ -124,12 +147,85 @@ export const storiesAPI = {
     theme: string;
     pageCount?: number;
   }) => {
+    // Generation runs as a background job; poll it until the story is ready
     const response = await api.post('/stories/generate', {
       title: data.title,
       age_group: data.ageGroup,
       theme: data.theme,
       page_count: data.pageCount || 10,
     });
+    let job = response.data;
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      job = await storiesAPI.getGenerationJob(job.id);
+    }
+    if (job.status === 'failed') {
+      throw { response: { data: { detail: job.error || 'Story generation failed' } } };
+    }
+    return job.story;
+  },
+
+  // Streamed generation: onPage gets each page as soon as it's written
+  generateStoryStream: async (
+    data: { title: string; ageGroup: string; theme: string; pageCount?: number },
+    onPage: (page: { page: number; content: string }) => void
+  ) => {
+    const response = await fetch(`${API_URL}/stories/generate/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${Cookies.get('token') || ''}`,
+      },
+      body: JSON.stringify({
+        title: data.title,
+        age_group: data.ageGroup,
+        theme: data.theme,
+        page_count: data.pageCount || 10,
+      }),
+    });
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}));
+      throw { response: { status: response.status, data: error } };
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let jobId = '';
+    try {
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          const event = block.match(/^event: (.*)$/m)?.[1];
+          const payload = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (event === 'job') jobId = payload.job_id;
+          if (event === 'page') onPage(payload);
+          if (event === 'done') return payload.story;
+          if (event === 'error') throw { response: { data: payload } };
+        }
+      }
+    } catch (error: any) {
+      if (error.response || !jobId) throw error;
+    }
+    // Connection dropped: the job carries on in the background
+    let job = await storiesAPI.getGenerationJob(jobId);
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      job = await storiesAPI.getGenerationJob(jobId);
+    }
+    if (job.status === 'failed') {
+      throw { response: { data: { detail: job.error || 'Story generation failed' } } };
+    }
+    return job.story;
+  },
+
+  getGenerationJob: async (jobId: string) => {
+    const response = await api.get(`/stories/jobs/${jobId}`);
     return response.data;
   },
 